@@ -1,27 +1,88 @@
 from datetime import datetime, timedelta
-from flask import Flask, jsonify, request, send_from_directory, session, send_file
+from flask import Flask, Response, g, jsonify, request, send_from_directory, session, send_file
 from flask_cors import CORS
 import requests
 import json
 import tempfile
 import os
-import duckdb
+import threading
 import traceback
 import logging
-import pandas as pd
 import io
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from column_stats import lookup_column_values
+from engine import CustomQueryError, EventEngine, validate_custom_query
+from facets import compute_facets
+from serialization import format_epoch_ns, iso_timestamp_expression, negotiate_response_format, rows_response
+from filters import FilterError, compile_filters, quote_identifier
+from result_cache import ResultCache, result_cache_key
+from single_flight import QueryCancelled, SingleFlight
+from pagination import CountCache, build_order_by, build_seek_condition, decode_cursor, encode_cursor
+from event_store import EventStore
+from file_cache import ParquetFileCache, cache_key_for_url
+from sessions import SESSION_COOKIE, SessionRegistry, session_id_for_request
+from jobs import INGEST_JOB_BATCH_FILES, JobCancelled, JobRegistry
+from governor import (
+    EXPORT_TIMEOUT_SECONDS, MAX_CHART_SERIES, MAX_EXPORT_ROWS, MAX_PAGE_ROWS, InvalidSizeError, ResourceLimitError,
+    ResultTooLarge, clamp
+)
+from upstream import SyncStatusCache, http, sync_status_key, sync_status_version
+from metrics import (
+    PROMETHEUS_MIMETYPE, ROWS_RETURNED, finish_request_trace, registry, span, start_request_trace
+)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='static', static_url_path='')
+
+# Base URL of the workspace audit API, defaults to the Domino host of each request
+AUDIT_API_BASE_URL = os.environ.get('AUDIT_API_BASE_URL', '')
 CORS(app)
 
+@app.before_request
+def begin_request_trace():
+    start_request_trace()
+
+@app.after_request
+def end_request_trace(response):
+    # Latency histograms, stage breakdown (Server-Timing header) and bytes served
+    return finish_request_trace(request, response)
+
+@app.after_request
+def set_session_cookie(response):
+    if g.get('new_session'):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite='Lax')
+    return response
+
+@app.teardown_request
+def release_session_dataset(error=None):
+    # Give back the dataset reference taken by current_session()
+    handle = g.pop('dataset_session', None)
+    if handle is not None:
+        sessions.checkin(handle)
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def audit_api_base_url():
+    """
+    Base URL of the workspace audit API.
+
+    The API is served by the Domino host the request came through, unless
+    AUDIT_API_BASE_URL points somewhere else (e.g. the benchmark stand-in server).
+    """
+    return AUDIT_API_BASE_URL or f"https://{request.headers.get('host', '')}"
+
+def audit_api_url(path, base_url=None):
+    """Build the URL of a workspace audit API path (base_url defaults to that of the request)"""
+    base_url = base_url or audit_api_base_url()
+    return f"{base_url.rstrip('/')}/api/workspace-audit/v1/{path}"
+
 def safe_api_request(url, headers=None, timeout=30, method='GET', **kwargs):
     """
     Make a safe API request with comprehensive error handling.
@@ -33,16 +94,15 @@ def safe_api_request(url, headers=None, timeout=30, method='GET', **kwargs):
         method: HTTP method (default GET)
         **kwargs: Additional arguments to pass to requests
 
+    Requests go through the pooled keep-alive session of upstream.py.
+
     Returns:
         tuple: (success: bool, data: dict|None, error_msg: str|None, status_code: int)
     """
     try:
-        if method.upper() == 'GET':
-            response = requests.get(url, headers=headers, timeout=timeout, **kwargs)
-        elif method.upper() == 'POST':
-            response = requests.post(url, headers=headers, timeout=timeout, **kwargs)
-        else:
+        if method.upper() not in ('GET', 'POST'):
             return False, None, f'Unsupported HTTP method: {method}', 400
+        response = http.request(method.upper(), url, headers=headers, timeout=timeout, **kwargs)
 
         # Check if response is successful
         if not response.ok:
@@ -78,39 +138,159 @@ def safe_api_request(url, headers=None, timeout=30, method='GET', **kwargs):
 # DATA MANAGEMENT
 # ============================================================================
 
-# Global cache for parquet data
-parquet_cache = {
-    'paths': [],  # List of parquet file paths
-    'start': None,
-    'end': None
-}
+# Persistent on-disk cache of downloaded parquet files, shared across date ranges
+file_cache = ParquetFileCache()
+
+# Downloaded events rewritten into sorted, zstd compressed day partitions
+event_store = EventStore()
+
+# Long-lived DuckDB database holding the loaded datasets, shared by all sessions
+engine = EventEngine()
+
+# Loaded range per browser session or user token
+sessions = SessionRegistry(engine)
+
+# Filtered totals per loaded dataset and filter set, reused while paging
+count_cache = CountCache()
+
+# Serialized /api/query and /api/filtered-columns responses of the loaded dataset
+result_cache = ResultCache()
+
+# Identical /api/query and /api/filtered-columns requests running at the same time
+query_flights = SingleFlight()
+
+# Background loads of date ranges, with their progress
+jobs = JobRegistry()
+
+# Serializes writes to the event store and refreshes of a dataset, so sessions sharing
+# a dataset never append the same files twice
+ingest_lock = threading.Lock()
+
+NO_DATA_ERROR = 'No data loaded. Please select a date range first.'
+
+@registry.register_collector
+def collect_cache_metrics():
+    """Hit/miss counters and hit ratios of the caches, and the size of the event store, at scrape time"""
+    engine_stats = engine.stats()
+    with engine.registry_lock:
+        regex_stats = [dataset.regex_engine.stats() for dataset in engine.datasets.values()]
+    caches = {
+        'result': result_cache.stats(),
+        'parquet_file': file_cache.stats(),
+        'sync_status': sync_status_cache.stats(),
+        'regex': {
+            'hits': sum(stats['hits'] for stats in regex_stats),
+            'misses': sum(stats['misses'] for stats in regex_stats)
+        }
+    }
+    hit_ratios = []
+    for cache, stats in caches.items():
+        lookups = stats['hits'] + stats['misses']
+        hit_ratios.append(({'cache': cache}, stats['hits'] / lookups if lookups else None))
+    store = event_store.stats()
+    return [
+        ('audit_cache_hits_total', 'counter', 'Cache hits',
+         [({'cache': cache}, stats['hits']) for cache, stats in caches.items()]),
+        ('audit_cache_misses_total', 'counter', 'Cache misses',
+         [({'cache': cache}, stats['misses']) for cache, stats in caches.items()]),
+        ('audit_cache_hit_ratio', 'gauge', 'Cache hits per lookup since start', hit_ratios),
+        ('audit_cache_bytes', 'gauge', 'Bytes held by a cache',
+         [({'cache': 'result'}, caches['result']['bytes']), ({'cache': 'parquet_file'}, caches['parquet_file']['bytes'])]),
+        ('audit_event_store_bytes', 'gauge', 'Bytes of the partitioned event store', [({}, store['bytes'])]),
+        ('audit_datasets', 'gauge', 'Loaded datasets', [({}, len(engine_stats['datasets']))]),
+        ('audit_dataset_bytes', 'gauge', 'Estimated bytes of the loaded datasets', [({}, engine_stats['bytes'])]),
+        ('audit_loaded_rows', 'gauge', 'Events in the loaded datasets',
+         [({}, sum(dataset['rows'] for dataset in engine_stats['datasets']))]),
+        ('audit_sessions', 'gauge', 'Sessions with a loaded range', [({}, sessions.stats()['sessions'])]),
+        ('audit_ingest_jobs_running', 'gauge', 'Ingest jobs queued or running', [({}, jobs.stats()['running'])]),
+    ]
 
-def build_parquet_read_query():
-    """Build a DuckDB query to read from all cached parquet files"""
-    if not parquet_cache['paths']:
-        raise ValueError('No parquet files loaded')
-    
-    if len(parquet_cache['paths']) == 1:
-        # Single file - simple query
-        return f"read_parquet('{parquet_cache['paths'][0]}')"
-    else:
-        # Multiple files - use list syntax to read and union all files
-        paths_str = ', '.join([f"'{path}'" for path in parquet_cache['paths']])
-        return f"read_parquet([{paths_str}])"
+# Sync status reported by /api/sync/status once new events can be downloaded
+SYNC_COMPLETED_STATUS = 'Completed'
+
+# Latest sync status per user, shared by all tabs polling /api/sync/status
+sync_status_cache = SyncStatusCache()
+
+def current_session_id():
+    """Return the session id of the request (a new one is set as cookie on the response)"""
+    if 'session_id' not in g:
+        g.session_id, g.new_session = session_id_for_request(request)
+    return g.session_id
+
+def current_session():
+    """
+    Return the loaded range of the request's session, or None if it has not loaded one.
+
+    The session's dataset is referenced until the request ends, so it is not evicted
+    (or swapped out by another request of the session) under a running query.
+    """
+    if g.get('dataset_session') is None:
+        g.dataset_session = sessions.checkout(current_session_id())
+    return g.dataset_session
+
+def cached_response(cache_key):
+    """Return the cached response for a key, or None on a miss"""
+    cached = result_cache.get(cache_key)
+    if cached is None:
+        return None
+    body, mimetype = cached
+    response = Response(body, mimetype=mimetype)
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+def coalesced_response(cache_key, endpoint, compute):
+    """
+    Compute the response for a cache key once for all concurrent requests of the key.
+
+    compute(flight) returns the response; the result cache keeps it for later requests.
+    Requests sharing another request's execution are marked X-Cache: COALESCED. A tab
+    sending X-Client-Id supersedes its previous request to the same endpoint, which
+    fails with QueryCancelled (see SingleFlight).
+    """
+    client_id = request.headers.get('X-Client-Id')
+    client = (current_session_id(), client_id, endpoint) if client_id else None
+
+    def compute_body(flight):
+        response = compute(flight)
+        result_cache.put(cache_key, response.get_data(), response.mimetype)
+        return response.get_data(), response.mimetype
+
+    (body, mimetype), shared = query_flights.run(cache_key, compute_body, client)
+    response = Response(body, mimetype=mimetype)
+    response.headers['X-Cache'] = 'COALESCED' if shared else 'MISS'
+    return response
+
+def range_ns(start, end):
+    """Return the (start_ns, end_ns) timestamp bounds of a date range"""
+    start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
+    end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
+    # Make end date inclusive by adding one day (end of the selected day)
+    end_date = end_date + timedelta(days=1)
+    return int(start_date.timestamp() * 1e9), int(end_date.timestamp() * 1e9)
+
+def compile_request_filters(dataset, filters, substring_filters, regex_filters):
+    """Compile the filter payloads of a request against the schema of a dataset"""
+    return compile_filters(
+        filters, substring_filters, regex_filters, dataset.column_types, dataset.ngram_indexes, dataset.regex_engine
+    )
 
 def download_parquet_data(start_date, end_date):
     """Download parquet files from Domino API for the given date range"""
-    start_timestamp = int(start_date.timestamp())
-    end_timestamp = int(end_date.timestamp())
+    return download_parquet_window(int(start_date.timestamp()) * 10**9, int(end_date.timestamp()) * 10**9)
 
-    token = request.headers.get('authorization', '')
-    host = request.headers.get('host', '')
-    headers = {"authorization": token}
+def list_download_urls(start_ns, end_ns, token, base_url=None):
+    """
+    Ask the Domino API for the download URLs of the parquet files holding the events
+    between two timestamps (ns).
 
-    url = f"https://{host}/api/workspace-audit/v1/events/download-urls?startTimestamp={start_timestamp}000000000&endTimestamp={end_timestamp}000000000"
+    Returns:
+        list: Download URLs, None if the request failed or returned none
+    """
+    url = audit_api_url(f"events/download-urls?startTimestamp={start_ns}&endTimestamp={end_ns}", base_url)
 
     # Use safe_api_request helper
-    success, data, error_msg, _ = safe_api_request(url, headers=headers)
+    with span('download'):
+        success, data, error_msg, _ = safe_api_request(url, headers={"authorization": token})
 
     if not success:
         logger.error(f"Failed to get download URLs: {error_msg}")
@@ -121,41 +301,151 @@ def download_parquet_data(start_date, end_date):
     if not data or not isinstance(data, list):
         logger.warning("No download URLs received from API")
         return None
+    return data
 
-    try:
-        temp_dir = tempfile.gettempdir()
-        parquet_dir = os.path.join(temp_dir, "workspace_audit_events")
-        os.makedirs(parquet_dir, exist_ok=True)
-
-        parquet_files = []
-        for idx, download_url in enumerate(data):
-            filename = f"events_{idx}.parquet"
-            local_path = os.path.join(parquet_dir, filename)
+def ingest_downloads(urls, **fetch_kwargs):
+    """
+    Download the parquet files not yet in the event store (not JSON, so we can't use
+    safe_api_request), reusing files already in the local cache, and ingest them.
 
-            logger.info(f"Downloading parquet file {idx} to {local_path}")
+    Args:
+        urls: Download URLs
+        **fetch_kwargs: Additional arguments to pass to the downloader (progress, cancelled)
 
-            # Download parquet file (not JSON, so we can't use safe_api_request)
-            try:
-                parquet_response = requests.get(download_url, timeout=60)
+    Returns:
+        int: Number of files downloaded or taken from the cache
+    """
+    pending = [url for url in urls if not event_store.has_source(cache_key_for_url(url))]
+    if not pending:
+        return 0
+    with span('download'):
+        parquet_files = file_cache.fetch(pending, **fetch_kwargs)
+    logger.info(f"Successfully fetched {sum(1 for path in parquet_files if path)} parquet files")
+    with ingest_lock, span('ingest'):
+        event_store.ingest([
+            (cache_key_for_url(url), path) for url, path in zip(pending, parquet_files) if path
+        ])
+        event_store.remove_retired(referenced_store_paths())
+    return sum(1 for path in parquet_files if path)
+
+def referenced_store_paths():
+    """Event store files that loaded datasets or session states still point at"""
+    with engine.registry_lock:
+        paths = {path for dataset in engine.datasets.values() for path in dataset.paths}
+    return paths | sessions.referenced_paths()
+
+def download_parquet_window(start_ns, end_ns):
+    """Download the parquet files of the events between two timestamps (ns) from Domino API"""
+    data = list_download_urls(start_ns, end_ns, request.headers.get('authorization', ''))
+    if not data:
+        return None
 
-                if parquet_response.status_code == 200:
-                    with open(local_path, 'wb') as f:
-                        f.write(parquet_response.content)
-                    logger.info(f"Successfully saved {local_path} ({len(parquet_response.content)} bytes)")
-                    parquet_files.append(local_path)
-                else:
-                    logger.error(f"Failed to download parquet file: {parquet_response.status_code}")
-            except Exception as download_error:
-                logger.error(f"Error downloading file {idx}: {download_error}")
+    try:
+        ingest_downloads(data)
 
-        logger.info(f"Successfully downloaded {len(parquet_files)} parquet files")
-        return parquet_files if parquet_files else None
+        # Read only the day partitions of the requested window
+        partition_paths = event_store.partition_paths(start_ns, end_ns)
+        logger.info(f"Window covers {len(partition_paths)} event store files")
+        return partition_paths if partition_paths else None
 
     except Exception as e:
-        logger.error(f"Error in download_parquet_data: {str(e)}")
+        logger.error(f"Error in download_parquet_window: {str(e)}")
         logger.error(traceback.format_exc())
         return None
 
+def dataset_summary(dataset, start, end):
+    """
+    Summarize a loaded dataset for the UI: row count, time bounds, per-file stats and
+    column metadata.
+    """
+    with engine.cursor() as conn:
+        total, min_timestamp, max_timestamp = conn.execute(
+            f"SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM {dataset.table}"
+        ).fetchone()
+        column_types = conn.execute(f"DESCRIBE {dataset.table}").fetchall()
+
+    # Stats recorded when the files were loaded, the files may be compacted away since
+    files = []
+    for path in dataset.paths:
+        if path not in dataset.file_stats:
+            continue
+        file_stats = dict(dataset.file_stats[path])
+        file_stats['minTimestamp'] = format_epoch_ns(file_stats['minTimestamp'])
+        file_stats['maxTimestamp'] = format_epoch_ns(file_stats['maxTimestamp'])
+        files.append(file_stats)
+
+    return {
+        'total': total,
+        'start': start,
+        'end': end,
+        'minTimestamp': format_epoch_ns(min_timestamp),
+        'maxTimestamp': format_epoch_ns(max_timestamp),
+        'files': files,
+        'columns': [
+            {
+                'name': row[0],
+                'type': row[1],
+                'label': COLUMN_NAME_MAPPING.get(row[0], row[0]),
+                'hidden': row[0] in HIDDEN_COLUMNS
+            }
+            for row in column_types
+        ]
+    }
+
+def run_ingest_job(job, token, base_url):
+    """
+    Load a session's date range in the background (see POST /api/jobs).
+
+    The download URLs are processed in batches of INGEST_JOB_BATCH_FILES: each batch is
+    downloaded and ingested into the event store, then the range's store files are
+    loaded. The first batch opens the session on a dataset of what is stored so far, so
+    the range can be queried while the following batches are appended to it (appends
+    are deduplicated, so events a compaction rewrote are not loaded twice).
+    """
+    start_ns, end_ns = range_ns(job.start, job.end)
+    jobs.report(job, status='listing')
+    urls = list_download_urls(start_ns, end_ns, token, base_url)
+    if not urls:
+        raise RuntimeError('No files to download for the selected range. Check server logs for details.')
+    jobs.report(job, filesTotal=len(urls))
+
+    dataset = None
+    for idx in range(0, len(urls), INGEST_JOB_BATCH_FILES):
+        batch = urls[idx:idx + INGEST_JOB_BATCH_FILES]
+        jobs.check_cancelled(job)
+        jobs.report(job, status='downloading')
+        ingest_downloads(batch, progress=jobs.progress_callback(job), cancelled=lambda: jobs.is_cancelled(job))
+        # Files cut off by a cancellation are not ingested
+        jobs.check_cancelled(job)
+        jobs.report(job, status='loading', filesDownloaded=idx + len(batch))
+
+        paths = event_store.partition_paths(start_ns, end_ns)
+        if not paths:
+            continue
+        if dataset is None:
+            dataset = sessions.open(job.session_id, job.start, job.end, paths, start_ns, end_ns).dataset
+        else:
+            handle = sessions.checkout(job.session_id)
+            try:
+                if handle is None or handle.dataset is not dataset:
+                    raise JobCancelled('The session loaded another range')
+                loaded_paths = set(dataset.paths)
+                new_paths = [path for path in paths if path not in loaded_paths]
+                if new_paths:
+                    with ingest_lock:
+                        dataset, _ = engine.append(dataset, new_paths)
+                        sessions.replace(handle, dataset)
+            finally:
+                if handle is not None:
+                    sessions.checkin(handle)
+        jobs.report(
+            job, filesLoaded=idx + len(batch), rowsLoaded=dataset.num_rows,
+            summary=dataset_summary(dataset, job.start, job.end)
+        )
+
+    if dataset is None:
+        raise RuntimeError('No events found in the selected range')
+
 @app.route('/')
 def index():
     """Serve the main UI"""
@@ -163,7 +453,15 @@ def index():
 
 @app.route('/api/data', methods=['GET'])
 def get_data():
-    """Get parquet data for the given date range and optional filters"""
+    """
+    Load the parquet data of the given date range and summarize it.
+
+    Rows are not returned; the UI reads them through the paginated and aggregated
+    endpoints.
+
+    Returns:
+        JSON with the row count, time bounds, per-file stats and column metadata
+    """
     try:
         # Parse date range
         start = request.args.get('start')
@@ -187,53 +485,233 @@ def get_data():
             return jsonify({'error': 'Failed to download data. Check server logs for details.'}), 500
         
         logger.info(f"Parquet data saved to {len(parquet_paths)} files: {parquet_paths}")
-        parquet_cache['paths'] = parquet_paths
-        parquet_cache['start'] = start
-        parquet_cache['end'] = end
+
+        # Point the session at the dataset of the range, materialized (timestamp filtered and
+        # sorted) unless another session already loaded the same files and range
+        with span('scan'):
+            sessions.open(current_session_id(), start, end, parquet_paths, *range_ns(start, end))
+        summary = dataset_summary(current_session().dataset, start, end)
+        logger.info(f"Loaded range holds {summary['total']} rows")
+
+        return jsonify(summary)
     
-        # Query data using DuckDB
-        conn = duckdb.connect(':memory:')
-        
-        # Base query - reads from all parquet files with timestamp filtering
-        parquet_read = build_parquet_read_query()
-        # Convert dates to nanoseconds (parquet stores timestamps in nanoseconds)
-        start_ns = int(start_date.timestamp() * 1e9)
-        end_ns = int(end_date.timestamp() * 1e9)
-        query = f"SELECT * FROM {parquet_read} WHERE timestamp >= {start_ns} AND timestamp <= {end_ns}"
-        logger.info(f"Executing query: {query}")
-        
-        # Execute query
-        result = conn.execute(query).fetchdf()
-        logger.info(f"Query returned {len(result)} rows")
-        
-        # Convert timestamp to readable format
-        if 'timestamp' in result.columns:
-            result['timestamp'] = (result['timestamp'] / 1e9).apply(
-                lambda x: datetime.fromtimestamp(x).isoformat()
-            )
-        
-        conn.close()
-        
+    except ResourceLimitError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    except Exception as e:
+        logger.error(f"Error in get_data: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+
+@app.route('/api/data/refresh', methods=['POST'])
+def refresh_data():
+    """
+    Append the events ingested since the loaded data to the loaded range.
+
+    Once the latest sync has completed, only the window from the high-water mark (the
+    latest loaded event) to the end of the range is requested from the download-urls
+    API. Files that are already loaded are skipped and the new events are appended to
+    the loaded table, deduplicated on deduplicationId.
+
+    Returns:
+        JSON with the fetched, appended and duplicate event counts, the new row count
+        and high-water mark
+    """
+    try:
+        handle = current_session()
+        if handle is None:
+            return jsonify({'error': NO_DATA_ERROR}), 400
+        dataset = handle.dataset
+
+        token = request.headers.get('authorization', '')
+        url = audit_api_url("process/latest")
+        success, sync_status, error_msg, status_code = safe_api_request(url, headers={"authorization": token})
+        if not success:
+            return jsonify({'error': error_msg, 'status': 'error'}), status_code
+        if sync_status.get('status') != SYNC_COMPLETED_STATUS:
+            return jsonify({
+                'error': 'The latest sync has not completed yet',
+                'status': sync_status.get('status')
+            }), 409
+
+        high_water_mark = dataset.high_water_mark
+        window_start = high_water_mark if high_water_mark is not None else dataset.start_ns
+
+        result = {'fetched': 0, 'appended': 0, 'duplicates': 0, 'files': 0}
+        if window_start < dataset.end_ns:
+            logger.info(f"Refreshing loaded data from high-water mark {format_epoch_ns(window_start)}")
+            parquet_paths = download_parquet_window(window_start, dataset.end_ns) or []
+            # The dataset is shared, another session may have appended some files meanwhile
+            with ingest_lock, span('scan'):
+                loaded_paths = set(dataset.paths)
+                new_paths = [path for path in parquet_paths if path not in loaded_paths]
+                if new_paths:
+                    # Cached results are keyed by the dataset generation, which the append bumps
+                    dataset, counts = engine.append(dataset, new_paths)
+                    sessions.replace(handle, dataset)
+                    result.update(counts)
+            result['files'] = len(new_paths)
+
+        with engine.cursor() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {dataset.table}").fetchone()[0]
+
         return jsonify({
-            'data': result.to_dict('records'),
-            'total': len(result)
+            **result,
+            'total': total,
+            'highWaterMark': format_epoch_ns(dataset.high_water_mark)
         })
-    
+
+    except ResourceLimitError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
-        logger.error(f"Error in get_data: {str(e)}")
+        logger.error(f"Error in refresh_data: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_ingest_job():
+    """
+    Start loading a date range in the background.
+
+    Downloads, ingests and loads the range like /api/data, in batches of files, on a
+    job thread; the session's dataset becomes queryable after the first batch. A
+    running job of the session is cancelled.
+
+    Request body (or query parameters):
+        start: Start date (YYYY-MM-DD)
+        end: End date (YYYY-MM-DD, inclusive)
+
+    Returns:
+        202 with the job's progress (see GET /api/jobs/<job_id>)
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        start = data.get('start') or request.args.get('start')
+        end = data.get('end') or request.args.get('end')
+        if not start or not end:
+            return jsonify({'error': 'start and end dates are required'}), 400
+        try:
+            range_ns(start, end)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date: {e}'}), 400
+
+        # The job thread has no request to take the token and API host from
+        token = request.headers.get('authorization', '')
+        base_url = audit_api_base_url()
+        job = jobs.submit(current_session_id(), start, end, lambda job: run_ingest_job(job, token, base_url))
+        logger.info(f"Submitted ingest job {job.job_id[:8]} for {start} to {end}")
+        return jsonify(job.snapshot()), 202
+
+    except Exception as e:
+        logger.error(f"Error in submit_ingest_job: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_ingest_job(job_id):
+    """
+    Progress of one of the session's ingest jobs.
+
+    Returns:
+        JSON with status (queued, listing, downloading, loading, completed, failed or
+        cancelled), the file, byte and row counters, etaSeconds, queryable and the
+        summary of the loaded part (as returned by /api/data)
+    """
+    job = jobs.get(job_id, current_session_id())
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_ingest_job(job_id):
+    """
+    Stream the progress of an ingest job as Server-Sent Events.
+
+    Sends a `progress` event with the job's state (see GET /api/jobs/<job_id>) on every
+    change, and a comment every 15 seconds without changes to keep proxies from closing
+    the connection. The stream ends once the job completed, failed or was cancelled.
+    """
+    session_id = current_session_id()
+    if jobs.get(job_id, session_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def events():
+        for snapshot in jobs.stream(job_id, session_id):
+            if snapshot is None:
+                yield ': keepalive\n\n'
+            else:
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keeps nginx style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_ingest_job(job_id):
+    """
+    Cancel one of the session's ingest jobs.
+
+    Transfers in progress stop at their next chunk; what the job already loaded stays
+    loaded and queryable.
+    """
+    if jobs.get(job_id, current_session_id()) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    cancelled = jobs.cancel(job_id, current_session_id())
+    return jsonify({'jobId': job_id, 'cancelled': cancelled})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get size and hit/miss/eviction counters of the file cache, result cache, event store and loaded datasets"""
+    return jsonify({
+        **file_cache.stats(),
+        'resultCache': result_cache.stats(),
+        'queryFlights': query_flights.stats(),
+        'eventStore': event_store.stats(),
+        'datasets': engine.stats(),
+        'sessions': sessions.stats(),
+        'jobs': jobs.stats(),
+        'syncStatus': sync_status_cache.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: latency histograms, rows scanned and returned, bytes served, cache and download counters"""
+    return Response(registry.render(), content_type=PROMETHEUS_MIMETYPE)
+
+@app.route('/api/metrics/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Get the most recent DuckDB statements above SLOW_QUERY_SECONDS, with their profiled plans if captured"""
+    return jsonify(engine.slow_queries.stats())
+
 @app.route('/api/sync/status', methods=['GET'])
 def get_sync_data():
+    """
+    Get the status of the latest sync.
+
+    The status is cached per user for SYNC_STATUS_TTL_SECONDS and concurrent requests
+    share one upstream call, so every open tab may poll it. With wait=<seconds> and
+    since=<version> (the X-Sync-Version of the previous response), the request is held
+    until the status changes or wait seconds passed (long-poll).
+    """
     token = request.headers.get('authorization', '')
-    host = request.headers.get('host', '')
     headers = {"authorization": token}
 
-    url = f"https://{host}/api/workspace-audit/v1/process/latest"
+    base_url = audit_api_base_url()
+    url = audit_api_url("process/latest", base_url)
+    key = sync_status_key(base_url, token)
 
-    # Use safe_api_request helper
-    success, data, error_msg, status_code = safe_api_request(url, headers=headers)
+    def fetch():
+        return safe_api_request(url, headers=headers)
+
+    since = request.args.get('since')
+    wait = request.args.get('wait', type=float)
+    if since is not None and wait:
+        success, data, error_msg, status_code, cached = sync_status_cache.wait_for_change(key, fetch, since, wait)
+    else:
+        success, data, error_msg, status_code, cached = sync_status_cache.get(key, fetch)
 
     if not success:
         return jsonify({
@@ -241,19 +719,25 @@ def get_sync_data():
             'status': 'error'
         }), status_code
 
-    return jsonify(data)
+    response = jsonify(data)
+    response.headers['X-Sync-Version'] = sync_status_version(data)
+    response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+    return response
 
 @app.route('/api/sync', methods=['POST'])
 def trigger_sync():
     token = request.headers.get('authorization', '')
-    host = request.headers.get('host', '')
     headers = {"authorization": token}
 
-    url = f"https://{host}/api/workspace-audit/v1/process"
+    base_url = audit_api_base_url()
+    url = audit_api_url("process", base_url)
 
     # Use safe_api_request helper
     success, data, error_msg, status_code = safe_api_request(url, headers=headers, method='POST')
 
+    # The next status poll reports the started sync
+    sync_status_cache.invalidate(sync_status_key(base_url, token))
+
     if not success:
         return jsonify({
             'error': error_msg,
@@ -262,6 +746,28 @@ def trigger_sync():
 
     return jsonify(data)
 
+def custom_page_queries(conn, sql_query, sort_column, sort_order, page, page_size):
+    """
+    Validate a custom SQL query on its sandbox cursor and build its count and page queries.
+
+    The page is sorted by sort_column only if the query returns such a column (else by
+    timestamp if it does), so the column name never reaches the SQL unchecked.
+
+    Returns:
+        tuple: (count query, page query)
+
+    Raises:
+        CustomQueryError: If the query is not a single SELECT statement
+    """
+    query = validate_custom_query(conn, sql_query)
+    columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM ({query}) AS custom_query").fetchall()]
+    if sort_column not in columns:
+        sort_column = 'timestamp' if 'timestamp' in columns else None
+    order_by_clause = f" ORDER BY {quote_identifier(sort_column)} {sort_order}" if sort_column else ""
+    offset = (page - 1) * page_size
+    return query, f"SELECT * FROM ({query}) AS custom_query{order_by_clause} LIMIT {page_size} OFFSET {offset}"
+
+
 @app.route('/api/query', methods=['POST'])
 def query_data():
     """Execute a SQL query on the cached parquet data"""
@@ -276,174 +782,293 @@ def query_data():
         sort_column = data.get('sortColumn', 'timestamp')  # Default to timestamp
         sort_order = data.get('sortOrder', 'DESC')  # Default to descending (latest first)
         
-        if not parquet_cache['paths']:
-            return jsonify({'error': 'No data loaded. Please select a date range first.'}), 400
-        
-        conn = duckdb.connect(':memory:')
-        
-        # Get the parquet read expression for all files
-        parquet_read = build_parquet_read_query()
-        
-        # Get timestamp range from cache for filtering
-        start_date = datetime.fromisoformat(parquet_cache['start'].replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(parquet_cache['end'].replace('Z', '+00:00'))
-        # Make end date inclusive by adding one day (end of the selected day)
-        end_date = end_date + timedelta(days=1)
-        start_ns = int(start_date.timestamp() * 1e9)
-        end_ns = int(end_date.timestamp() * 1e9)
+        handle = current_session()
+        if handle is None:
+            return jsonify({'error': NO_DATA_ERROR}), 400
+
+        # Get the table holding the session's loaded range (already timestamp filtered)
+        dataset = handle.dataset
+        table = dataset.table
 
-        # Start with base query
+        # Validate sort_order is valid
+        valid_sort_orders = ['ASC', 'DESC']
+        sort_order = sort_order.upper() if sort_order.upper() in valid_sort_orders else 'DESC'
+        
+        page = clamp(page, 0, name='page')
+        # Pages are materialized and serialized in memory, so their size is capped
+        page_size = clamp(page_size, MAX_PAGE_ROWS, name='pageSize')
+        filter_params = []
+        page_params = []
+        cursor = None
         if sql_query:
-            # User provided custom SQL
-            query = sql_query.replace('events', parquet_read)
+            # User provided custom SQL, validated and paged on a sandbox (see custom_page_queries())
+            query = sql_query
+            filter_signature = None
+            count_key = None
         else:
-            # Build query from filters
-            query = f"SELECT * FROM {parquet_read}"
-            
-            conditions = []
-            
-            # Always add timestamp filtering
-            conditions.append(f"timestamp >= {start_ns} AND timestamp <= {end_ns}")
-
-            # Get all columns that have filters (exact, substring, or regex)
-            all_filtered_columns = set()
-            if filters:
-                all_filtered_columns.update(filters.keys())
-            if substring_filters:
-                all_filtered_columns.update(substring_filters.keys())
-            if regex_filters:
-                all_filtered_columns.update(regex_filters.keys())
-
-            # For each column, combine exact, substring, and regex filters with OR
-            for column in all_filtered_columns:
-                column_conditions = []
-
-                # Add exact match conditions for this column
-                if filters and column in filters and filters[column]:
-                    values = filters[column]
-                    escaped_values = [f"'{v.replace(chr(39), chr(39)+chr(39))}'" for v in values]
-                    column_conditions.append(f"{column} IN ({','.join(escaped_values)})")
-
-                # Add substring (LIKE) conditions for this column
-                if substring_filters and column in substring_filters and substring_filters[column]:
-                    search_terms = substring_filters[column]
-                    for term in search_terms:
-                        # Escape special characters for LIKE and escape single quotes
-                        escaped_term = term.replace(chr(39), chr(39)+chr(39))
-                        column_conditions.append(f"{column} LIKE '%{escaped_term}%'")
-
-                # Add regex conditions for this column
-                if regex_filters and column in regex_filters and regex_filters[column]:
-                    regex_patterns = regex_filters[column]
-                    for pattern in regex_patterns:
-                        # Extract the regex pattern (remove leading /)
-                        if pattern.startswith('/'):
-                            regex_pattern = pattern[1:]
-                        else:
-                            regex_pattern = pattern
-                        # Escape single quotes in the pattern
-                        escaped_pattern = regex_pattern.replace(chr(39), chr(39)+chr(39))
-                        # Use DuckDB's regexp_matches function
-                        column_conditions.append(f"regexp_matches({column}, '{escaped_pattern}')")
-
-                # Combine conditions for this column with OR, then wrap in parentheses
-                if column_conditions:
-                    if len(column_conditions) == 1:
-                        conditions.append(column_conditions[0])
-                    else:
-                        conditions.append(f"({' OR '.join(column_conditions)})")
-            
+            if sort_column not in dataset.columns:
+                sort_column = 'timestamp'
+
+            # Compile the filters into conditions with bound parameters
+            filter_tree = compile_request_filters(dataset, filters, substring_filters, regex_filters)
+            conditions, filter_params = filter_tree.conditions()
+            query = f"SELECT * FROM {table}"
             if conditions:
                 query += " WHERE " + " AND ".join(conditions)
-        
-        # Add ORDER BY clause
-        # Validate sort_column exists and sort_order is valid
-        valid_sort_orders = ['ASC', 'DESC']
-        if sort_order.upper() not in valid_sort_orders:
-            sort_order = 'DESC'
-        
-        # For timestamp sorting, we need to sort by the numeric value before conversion
-        order_by_clause = f" ORDER BY {sort_column} {sort_order.upper()}"
-        query += order_by_clause
-        
+
+            # Filtered totals are cached per loaded dataset and filter set, so paging doesn't recount
+            filter_signature = filter_tree.signature
+            count_key = (dataset.generation, filter_signature)
+
+            # Seek past the cursor row instead of skipping rows with OFFSET when paging by one
+            cursor = decode_cursor(data.get('cursor'), sort_column, sort_order)
+            page_params = list(filter_params)
+            if cursor:
+                seek_condition, seek_params = build_seek_condition(sort_column, sort_order, cursor)
+                conditions.append(seek_condition)
+                page_params += seek_params
+            order_by_clause = " " + build_order_by(sort_column, sort_order, reverse=bool(cursor) and cursor['direction'] == 'prev')
+
+        # Flipping back to a previous view is served from the result cache
+        response_format = negotiate_response_format(request)
+        cache_key = result_cache_key(
+            'query', dataset.generation, handle.start, handle.end, sql_query,
+            filter_signature, sort_column, sort_order, page, page_size, data.get('cursor'), response_format
+        )
+        response = cached_response(cache_key)
+        if response is not None:
+            return response
+
         logger.info(f"Query with sorting: {query[:200]}...")
-        logger.info(f"Sort params: column={sort_column}, order={sort_order}, page={page}, page_size={page_size}")
-        
-        # Get total count
-        count_query = f"SELECT COUNT(*) as total FROM ({query.replace(order_by_clause, '')}) as subquery"
-        total = conn.execute(count_query).fetchone()[0]
-        
-        # Get ALL filtered data for chart (without pagination, but sorted)
-        all_filtered_result = conn.execute(query).fetchdf()
+        logger.info(f"Sort params: column={sort_column}, order={sort_order}, page={page}, page_size={page_size}, cursor={cursor}")
         
-        # Add pagination for table data
-        offset = (page - 1) * page_size
-        paginated_query = query + f" LIMIT {page_size} OFFSET {offset}"
-        
-        logger.info(f"Paginated query: {paginated_query[:200]}... OFFSET {offset}")
-        
-        # Execute paginated query for table
-        result = conn.execute(paginated_query).fetchdf()
-        
-        logger.info(f"Query results: total={total}, chart_rows={len(all_filtered_result)}, table_rows={len(result)}")
-        
-        # Convert timestamp to readable format for both datasets
-        if 'timestamp' in result.columns:
-            result['timestamp'] = (result['timestamp'] / 1e9).apply(
-                lambda x: datetime.fromtimestamp(x).isoformat()
-            )
-        
-        if 'timestamp' in all_filtered_result.columns:
-            all_filtered_result['timestamp'] = (all_filtered_result['timestamp'] / 1e9).apply(
-                lambda x: datetime.fromtimestamp(x).isoformat()
-            )
-        
-        conn.close()
+        if sql_query:
+            # Built once the sandbox knows the columns of the custom SQL result
+            paginated_query = None
+        elif cursor:
+            # Keyset page: conditions already include the seek condition
+            paginated_query = f"SELECT * FROM {table} WHERE {' AND '.join(conditions)}{order_by_clause} LIMIT ?"
+            page_params.append(page_size)
+        else:
+            # Add pagination for table data
+            paginated_query = query + order_by_clause + " LIMIT ? OFFSET ?"
+            page_params += [page_size, (page - 1) * page_size]
         
-        return jsonify({
-            'data': result.to_dict('records'),
-            'chartData': all_filtered_result.to_dict('records'),  # All filtered data for chart
-            'total': total,
-            'page': page,
-            'pageSize': page_size
-        })
+        if paginated_query:
+            logger.info(f"Paginated query: {paginated_query[:200]}...")
+
+        def execute_page(flight):
+            # Custom SQL never gets a cursor on the shared datasets
+            with engine.sandbox(dataset) if sql_query else engine.cursor() as conn:
+                flight.attach(conn.cursor)
+                count_query, page_query = query, paginated_query
+                if sql_query:
+                    count_query, page_query = custom_page_queries(
+                        conn, sql_query, sort_column, sort_order, page, page_size
+                    )
+
+                # Get total count
+                total = count_cache.get(count_key) if count_key else None
+                if total is None:
+                    with span('count'):
+                        total = conn.execute(f"SELECT COUNT(*) as total FROM ({count_query}) as subquery", filter_params).fetchone()[0]
+                    if count_key:
+                        count_cache.put(count_key, total)
+
+                # Execute paginated query for table
+                with span('fetch'):
+                    result = conn.execute(page_query, page_params).arrow()
+                ROWS_RETURNED.inc(result.num_rows, endpoint='/api/query')
+
+                if cursor and cursor['direction'] == 'prev':
+                    # Rows before the cursor were read in reverse order
+                    result = result.take(pa.array(range(result.num_rows - 1, -1, -1)))
+
+                # Cursors pointing at the first and last row of this page, for seeking to the neighbouring pages
+                next_cursor = prev_cursor = None
+                if not sql_query and result.num_rows > 0 and 'uuid' in result.column_names:
+                    sort_values = result.column(sort_column)
+                    uuids = result.column('uuid')
+                    if page > 1:
+                        prev_cursor = encode_cursor(sort_column, sort_order, sort_values[0].as_py(), uuids[0].as_py(), 'prev')
+                    if page * page_size < total:
+                        next_cursor = encode_cursor(sort_column, sort_order, sort_values[-1].as_py(), uuids[-1].as_py(), 'next')
+
+                logger.info(f"Query results: total={total}, table_rows={result.num_rows}")
+
+                # Serialize the page in the requested format, timestamps formatted in DuckDB
+                return rows_response(
+                    conn,
+                    result,
+                    response_format,
+                    total=total,
+                    page=page,
+                    pageSize=page_size,
+                    nextCursor=next_cursor,
+                    prevCursor=prev_cursor
+                )
+
+        return coalesced_response(cache_key, 'query', execute_page)
     
+    except (FilterError, InvalidSizeError, CustomQueryError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    except (ResourceLimitError, QueryCancelled) as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
         logger.error(f"Error in query_data: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
 
+# Time bucket key expressions, matching bucketTimestamp() in static/utils/chartHelpers.js.
+# Weeks start on Sunday (dayjs default locale), DuckDB's date_trunc('week') starts on Monday.
+TIME_BUCKET_EXPRESSIONS = {
+    'hour': "strftime({ts}, '%Y-%m-%d %H:00')",
+    'day': "strftime({ts}, '%Y-%m-%d')",
+    'week': "strftime(date_trunc('week', {ts} + INTERVAL 1 DAY) - INTERVAL 1 DAY, '%Y-%m-%d')",
+    'month': "strftime({ts}, '%Y-%m')",
+}
+
+def determine_time_bucket(start, end):
+    """Pick the chart bucket size for a date range (mirrors determineTimeBucket in chartHelpers.js)"""
+    start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
+    end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
+    days = (end_date - start_date).days
+
+    if days <= 1:
+        return 'hour'
+    if days <= 60:
+        return 'day'
+    if days <= 365:
+        return 'week'
+    return 'month'
+
+def build_chart_query(source, where_clause, bucket_expr, breakdown_field=None, top_n=10):
+    """
+    Build the query counting events per time bucket, per value of breakdown_field if given.
+
+    Returns:
+        str: Query returning (bucket, series, series_rank, events) rows
+    """
+    if not breakdown_field:
+        return f"""
+            SELECT {bucket_expr} AS bucket, 'Events' AS series, 1 AS series_rank, COUNT(*) AS events
+            FROM {source}{where_clause}
+            GROUP BY ALL
+            ORDER BY bucket
+        """
+
+    # Rank breakdown values by total count, everything past the top N is grouped as "Other"
+    value_expr = f"""COALESCE(NULLIF(CAST({quote_identifier(breakdown_field)} AS VARCHAR), ''), 'Unknown')"""
+    return f"""
+        WITH grouped AS (
+            SELECT {bucket_expr} AS bucket, {value_expr} AS value, COUNT(*) AS events
+            FROM {source}{where_clause}
+            GROUP BY ALL
+        ),
+        ranked AS (
+            SELECT value, ROW_NUMBER() OVER (ORDER BY SUM(events) DESC, value) AS value_rank
+            FROM grouped
+            GROUP BY value
+        )
+        SELECT grouped.bucket,
+               CASE WHEN ranked.value_rank <= {top_n} THEN grouped.value ELSE 'Other' END AS series,
+               MIN(ranked.value_rank) AS series_rank,
+               SUM(grouped.events) AS events
+        FROM grouped JOIN ranked USING (value)
+        GROUP BY ALL
+        ORDER BY series_rank, grouped.bucket
+    """
+
+
+@app.route('/api/chart', methods=['POST'])
+def chart_data():
+    """Get event counts per time bucket, optionally broken down by the top N values of a field"""
+    try:
+        data = request.get_json()
+        sql_query = data.get('query', '')
+        filters = data.get('filters', {})
+        substring_filters = data.get('substringFilters', {})
+        regex_filters = data.get('regexFilters', {})
+        breakdown_field = data.get('breakdownField')
+        top_n = clamp(data.get('topN', 10), MAX_CHART_SERIES, name='topN')
+        bucket = data.get('bucket')
+
+        handle = current_session()
+        if handle is None:
+            return jsonify({'error': NO_DATA_ERROR}), 400
+
+        if bucket not in TIME_BUCKET_EXPRESSIONS:
+            bucket = determine_time_bucket(handle.start, handle.end)
+
+        # Get the table holding the session's loaded range (already timestamp filtered)
+        table = handle.dataset.table
+
+        if not sql_query:
+            where_clause, params = compile_request_filters(
+                handle.dataset, filters, substring_filters, regex_filters
+            ).where_clause()
+
+        # Parquet stores timestamps as epoch nanoseconds
+        bucket_expr = TIME_BUCKET_EXPRESSIONS[bucket].format(ts="epoch_ms(timestamp // 1000000)")
+
+        # Custom SQL never gets a cursor on the shared datasets
+        with engine.sandbox(handle.dataset) if sql_query else engine.cursor() as conn:
+            if sql_query:
+                # Aggregate over the result of the user provided custom SQL
+                source = f"({validate_custom_query(conn, sql_query)}) AS custom_query"
+                where_clause, params = "", []
+            else:
+                source = table
+
+            if breakdown_field:
+                available_columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+                if breakdown_field not in available_columns:
+                    return jsonify({'error': f'Unknown breakdown field: {breakdown_field}'}), 400
+
+            query = build_chart_query(source, where_clause, bucket_expr, breakdown_field, top_n)
+            logger.info(f"Chart query: {' '.join(query.split())[:200]}...")
+            rows = conn.execute(query, params).fetchall()
+
+        # Group bucket counts by series, keeping the rank order of the series
+        series = {}
+        total = 0
+        for bucket_key, series_name, _, events in rows:
+            series.setdefault(series_name, {})[bucket_key] = int(events)
+            total += int(events)
+
+        return jsonify({
+            'bucket': bucket,
+            'series': [{'name': name, 'data': counts} for name, counts in series.items()],
+            'total': total
+        })
+
+    except (FilterError, InvalidSizeError, CustomQueryError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    except ResourceLimitError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    except Exception as e:
+        logger.error(f"Error in chart_data: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+
 @app.route('/api/columns', methods=['GET'])
 def get_columns():
-    """Get column names and unique values for filters"""
+    """Get column statistics and values for filters (computed once when the data is loaded)"""
     try:
-        if not parquet_cache['paths']:
-            return jsonify({'error': 'No data loaded. Please select a date range first.'}), 400
+        handle = current_session()
+        if handle is None:
+            return jsonify({'error': NO_DATA_ERROR}), 400
 
-        conn = duckdb.connect(':memory:')
+        columns = {
+            col: {key: value for key, value in stats.items() if key != 'valueTable'}
+            for col, stats in handle.dataset.column_stats.items()
+            if col != 'timestamp'  # Exclude timestamp from filters
+        }
 
-        # Get all data from all parquet files with timestamp filtering
-        parquet_read = build_parquet_read_query()
-        start_date = datetime.fromisoformat(parquet_cache['start'].replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(parquet_cache['end'].replace('Z', '+00:00'))
-        # Make end date inclusive by adding one day (end of the selected day) - same as /api/data
-        end_date = end_date + timedelta(days=1)
-        start_ns = int(start_date.timestamp() * 1e9)
-        end_ns = int(end_date.timestamp() * 1e9)
-        result = conn.execute(f"SELECT * FROM {parquet_read} WHERE timestamp >= {start_ns} AND timestamp <= {end_ns}").fetchdf()
-        
-        # Build column metadata
-        columns = {}
-        for col in result.columns:
-            if col != 'timestamp':  # Exclude timestamp from filters
-                unique_values = result[col].dropna().unique().tolist()
-                columns[col] = {
-                    'type': str(result[col].dtype),
-                    'values': sorted(unique_values)[:1000]  # Limit to 1000 unique values
-                }
-        
-        conn.close()
-        
         return jsonify({
             'columns': columns,
             'columnLabels': COLUMN_NAME_MAPPING
@@ -454,124 +1079,77 @@ def get_columns():
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
 
+@app.route('/api/columns/<column>/values', methods=['GET'])
+def get_column_values(column):
+    """Page through the distinct values of a column, optionally filtered by a search term"""
+    try:
+        handle = current_session()
+        if handle is None:
+            return jsonify({'error': NO_DATA_ERROR}), 400
+
+        table = handle.dataset.table
+        stats = handle.dataset.column_stats.get(column)
+        if stats is None:
+            return jsonify({'error': f"Unknown column: {column}"}), 400
+
+        search = request.args.get('search', '')
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', 100, type=int)
+
+        with engine.cursor() as conn:
+            result = lookup_column_values(conn, table, column, stats['valueTable'], search, offset, limit)
+
+        return jsonify({'column': column, 'search': search, **result})
+
+    except ResourceLimitError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    except Exception as e:
+        logger.error(f"Error in get_column_values: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+
 @app.route('/api/filtered-columns', methods=['POST'])
 def get_filtered_columns():
     """Get available column values based on current filters (for cascading filters)"""
     try:
-        if not parquet_cache['paths']:
-            return jsonify({'error': 'No data loaded. Please select a date range first.'}), 400
-        
+        handle = current_session()
+        if handle is None:
+            return jsonify({'error': NO_DATA_ERROR}), 400
+
         data = request.get_json()
         filters = data.get('filters', {})
         substring_filters = data.get('substringFilters', {})
         regex_filters = data.get('regexFilters', {})
         exclude_column = data.get('excludeColumn')  # Column to exclude from filtering
         
-        conn = duckdb.connect(':memory:')
-        
-        # Get the parquet read expression for all files
-        parquet_read = build_parquet_read_query()
-        
-        # Get timestamp range from cache for filtering
-        start_date = datetime.fromisoformat(parquet_cache['start'].replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(parquet_cache['end'].replace('Z', '+00:00'))
-        # Make end date inclusive by adding one day (end of the selected day)
-        end_date = end_date + timedelta(days=1)
-        start_ns = int(start_date.timestamp() * 1e9)
-        end_ns = int(end_date.timestamp() * 1e9)
-
-        # For each column, we'll calculate available values by applying all OTHER filters
-        all_columns = []
-        result = conn.execute(f"SELECT * FROM {parquet_read} LIMIT 1").fetchdf()
-        all_columns = [col for col in result.columns if col != 'timestamp']
-        
-        columns = {}
-        
-        for target_column in all_columns:
-            # Build query excluding the target column's own filters
-            query = f"SELECT DISTINCT {target_column} FROM {parquet_read}"
-            
-            conditions = []
-            
-            # Always add timestamp filtering
-            conditions.append(f"timestamp >= {start_ns} AND timestamp <= {end_ns}")
-
-            # Get all columns that have filters (exact, substring, or regex)
-            all_filtered_columns = set()
-            if filters:
-                all_filtered_columns.update(filters.keys())
-            if substring_filters:
-                all_filtered_columns.update(substring_filters.keys())
-            if regex_filters:
-                all_filtered_columns.update(regex_filters.keys())
-
-            # For each column EXCEPT the target column, add its filters
-            for column in all_filtered_columns:
-                # Skip the target column - we want to see all possible values for it
-                if column == target_column:
-                    continue
-
-                column_conditions = []
-
-                # Add exact match conditions for this column
-                if filters and column in filters and filters[column]:
-                    values = filters[column]
-                    escaped_values = [f"'{v.replace(chr(39), chr(39)+chr(39))}'" for v in values]
-                    column_conditions.append(f"{column} IN ({','.join(escaped_values)})")
-
-                # Add substring (LIKE) conditions for this column
-                if substring_filters and column in substring_filters and substring_filters[column]:
-                    search_terms = substring_filters[column]
-                    for term in search_terms:
-                        escaped_term = term.replace(chr(39), chr(39)+chr(39))
-                        column_conditions.append(f"{column} LIKE '%{escaped_term}%'")
-
-                # Add regex conditions for this column
-                if regex_filters and column in regex_filters and regex_filters[column]:
-                    regex_patterns = regex_filters[column]
-                    for pattern in regex_patterns:
-                        # Extract the regex pattern (remove leading /)
-                        if pattern.startswith('/'):
-                            regex_pattern = pattern[1:]
-                        else:
-                            regex_pattern = pattern
-                        # Escape single quotes in the pattern
-                        escaped_pattern = regex_pattern.replace(chr(39), chr(39)+chr(39))
-                        # Use DuckDB's regexp_matches function
-                        column_conditions.append(f"regexp_matches({column}, '{escaped_pattern}')")
-
-                # Combine conditions for this column with OR
-                if column_conditions:
-                    if len(column_conditions) == 1:
-                        conditions.append(column_conditions[0])
-                    else:
-                        conditions.append(f"({' OR '.join(column_conditions)})")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            query += f" ORDER BY {target_column}"
-            
-            # Get available values for this column
-            try:
-                col_result = conn.execute(query).fetchdf()
-                unique_values = col_result[target_column].dropna().unique().tolist()
-                columns[target_column] = {
-                    'type': str(col_result[target_column].dtype),
-                    'values': sorted(unique_values)[:1000]  # Limit to 1000 unique values
-                }
-            except Exception as e:
-                logger.error(f"Error getting values for column {target_column}: {str(e)}")
-                # If there's an error, use empty list
-                columns[target_column] = {
-                    'type': 'object',
-                    'values': []
-                }
-        
-        conn.close()
-        
-        return jsonify({'columns': columns})
+        # Get the table holding the session's loaded range (already timestamp filtered)
+        dataset = handle.dataset
+        table = dataset.table
+
+        # Compute the values of every column, each ignoring its own filter, in one scan
+        filter_tree = compile_request_filters(dataset, filters, substring_filters, regex_filters)
+        cache_key = result_cache_key('facets', dataset.generation, handle.start, handle.end, filter_tree.signature)
+        response = cached_response(cache_key)
+        if response is not None:
+            return response
+
+        column_conditions, params = filter_tree.column_conditions()
+
+        def execute_facets(flight):
+            with engine.cursor() as conn:
+                flight.attach(conn.cursor)
+                columns = compute_facets(conn, table, column_conditions, params, exclude_columns=['timestamp'])
+            return jsonify({'columns': columns})
+
+        return coalesced_response(cache_key, 'facets', execute_facets)
     
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except (ResourceLimitError, QueryCancelled) as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
         logger.error(f"Error in get_filtered_columns: {str(e)}")
         logger.error(traceback.format_exc())
@@ -595,127 +1173,99 @@ COLUMN_NAME_MAPPING = {
     'deduplicationId': 'Deduplication ID'
 }
 
-def get_filtered_data_for_download(filters, substring_filters, regex_filters):
-    """Get all filtered data (not paginated) for download"""
-    if not parquet_cache['paths']:
-        raise ValueError('No data loaded. Please select a date range first.')
-
-    conn = duckdb.connect(':memory:')
+# Columns hidden from downloads (matching UI hiddenTableColumns)
+HIDDEN_COLUMNS = ['userId', 'uuid', 'deduplicationId']
+
+# Download column order (matching UI tableColumnOrder)
+TABLE_COLUMN_ORDER = [
+    'timestamp',
+    'username',
+    'action',
+    'filename',
+    'projectName',
+    'projectId',
+    'workspaceName',
+    'workspaceId',
+    'environmentName',
+    'environmentRevisionNumber',
+    'hardwareTierId',
+]
+
+# Rows per Arrow record batch when streaming exports
+EXPORT_BATCH_ROWS = int(os.environ.get('EXPORT_BATCH_ROWS', '100000'))
+
+def build_download_query(filters, substring_filters, regex_filters):
+    """
+    Build the query for all filtered data (not paginated) for download.
 
-    # Get the parquet read expression for all files
-    parquet_read = build_parquet_read_query()
+    Columns are reordered to match the UI table, hidden columns are dropped, columns
+    are renamed to their human-readable labels and timestamps are formatted as ISO
+    strings (UTC) inside DuckDB, so the result can be streamed without pandas.
 
-    # Get timestamp range from cache for filtering
-    start_date = datetime.fromisoformat(parquet_cache['start'].replace('Z', '+00:00'))
-    end_date = datetime.fromisoformat(parquet_cache['end'].replace('Z', '+00:00'))
-    # Make end date inclusive by adding one day (end of the selected day)
-    end_date = end_date + timedelta(days=1)
-    start_ns = int(start_date.timestamp() * 1e9)
-    end_ns = int(end_date.timestamp() * 1e9)
+    Returns:
+        tuple: (query SQL with ? placeholders, list of parameters)
+    """
+    handle = current_session()
+    if handle is None:
+        raise ValueError(NO_DATA_ERROR)
+
+    # Get the table holding the session's loaded range (already timestamp filtered)
+    dataset = handle.dataset
+    table = dataset.table
+
+    # Reorder columns to match UI table, then add any remaining columns not in the order list
+    columns = [col for col in dataset.columns if col not in HIDDEN_COLUMNS]
+    ordered_columns = [col for col in TABLE_COLUMN_ORDER if col in columns]
+    remaining_columns = [col for col in columns if col not in TABLE_COLUMN_ORDER]
+
+    select_list = []
+    for col in ordered_columns + remaining_columns:
+        label = COLUMN_NAME_MAPPING.get(col, col).replace('"', '""')
+        if col == 'timestamp':
+            expr = iso_timestamp_expression()
+        else:
+            expr = f'"{col}"'
+        select_list.append(f'{expr} AS "{label}"')
 
     # Build query from filters (similar to query_data but without pagination)
-    query = f"SELECT * FROM {parquet_read}"
-
-    conditions = []
-
-    # Always add timestamp filtering
-    conditions.append(f"timestamp >= {start_ns} AND timestamp <= {end_ns}")
-
-    # Get all columns that have filters (exact, substring, or regex)
-    all_filtered_columns = set()
-    if filters:
-        all_filtered_columns.update(filters.keys())
-    if substring_filters:
-        all_filtered_columns.update(substring_filters.keys())
-    if regex_filters:
-        all_filtered_columns.update(regex_filters.keys())
-
-    # For each column, combine exact, substring, and regex filters with OR
-    for column in all_filtered_columns:
-        column_conditions = []
-
-        # Add exact match conditions for this column
-        if filters and column in filters and filters[column]:
-            values = filters[column]
-            escaped_values = [f"'{v.replace(chr(39), chr(39)+chr(39))}'" for v in values]
-            column_conditions.append(f"{column} IN ({','.join(escaped_values)})")
-
-        # Add substring (LIKE) conditions for this column
-        if substring_filters and column in substring_filters and substring_filters[column]:
-            search_terms = substring_filters[column]
-            for term in search_terms:
-                # Escape special characters for LIKE and escape single quotes
-                escaped_term = term.replace(chr(39), chr(39)+chr(39))
-                column_conditions.append(f"{column} LIKE '%{escaped_term}%'")
-
-        # Add regex conditions for this column
-        if regex_filters and column in regex_filters and regex_filters[column]:
-            regex_patterns = regex_filters[column]
-            for pattern in regex_patterns:
-                # Extract the regex pattern (remove leading /)
-                if pattern.startswith('/'):
-                    regex_pattern = pattern[1:]
-                else:
-                    regex_pattern = pattern
-                # Escape single quotes in the pattern
-                escaped_pattern = regex_pattern.replace(chr(39), chr(39)+chr(39))
-                # Use DuckDB's regexp_matches function
-                column_conditions.append(f"regexp_matches({column}, '{escaped_pattern}')")
-
-        # Combine conditions for this column with OR, then wrap in parentheses
-        if column_conditions:
-            if len(column_conditions) == 1:
-                conditions.append(column_conditions[0])
-            else:
-                conditions.append(f"({' OR '.join(column_conditions)})")
-    
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-    
-    # Execute query to get all filtered data
-    result = conn.execute(query).fetchdf()
-
-    # Convert timestamp to readable format
-    if 'timestamp' in result.columns:
-        result['timestamp'] = (result['timestamp'] / 1e9).apply(
-            lambda x: datetime.fromtimestamp(x).isoformat()
+    query = f"SELECT {', '.join(select_list)} FROM {table}"
+
+    where_clause, params = compile_request_filters(dataset, filters, substring_filters, regex_filters).where_clause()
+    query += where_clause
+
+    # Appended events (refreshes, job batches) follow the rows loaded before them, so the
+    # table is only sorted by timestamp within each load
+    query += ' ORDER BY "timestamp"'
+    return query, params
+
+def check_export_size(query, params):
+    """Raise ResultTooLarge if an export would hold more than MAX_EXPORT_ROWS rows"""
+    if not MAX_EXPORT_ROWS:
+        return
+    with engine.cursor() as conn:
+        num_rows = conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+    if num_rows > MAX_EXPORT_ROWS:
+        raise ResultTooLarge(
+            f"The export would hold {num_rows} rows, more than the limit of {MAX_EXPORT_ROWS}. "
+            f"Narrow the date range or add filters."
         )
 
-    conn.close()
-
-    # Define columns to hide (matching UI hiddenTableColumns)
-    HIDDEN_COLUMNS = ['userId', 'uuid', 'deduplicationId']
-
-    # Remove hidden columns
-    result = result.drop(columns=[col for col in HIDDEN_COLUMNS if col in result.columns], errors='ignore')
-
-    # Define UI table column order (matching UI tableColumnOrder)
-    TABLE_COLUMN_ORDER = [
-        'timestamp',
-        'username',
-        'action',
-        'filename',
-        'projectName',
-        'projectId',
-        'workspaceName',
-        'workspaceId',
-        'environmentName',
-        'environmentRevisionNumber',
-        'hardwareTierId',
-    ]
-
-    # Reorder columns to match UI table
-    ordered_columns = [col for col in TABLE_COLUMN_ORDER if col in result.columns]
-    # Add any remaining columns not in the order list
-    remaining_columns = [col for col in result.columns if col not in TABLE_COLUMN_ORDER]
-    final_column_order = ordered_columns + remaining_columns
-    result = result[final_column_order]
-
-    # Rename columns to human-readable names
-    rename_mapping = {col: COLUMN_NAME_MAPPING.get(col, col) for col in result.columns}
-    result = result.rename(columns=rename_mapping)
-
-    return result
+def stream_csv(query, params):
+    """Yield the query result as CSV chunks, one Arrow record batch at a time"""
+    with engine.cursor(timeout=EXPORT_TIMEOUT_SECONDS) as conn:
+        reader = conn.execute(query, params).fetch_record_batch(EXPORT_BATCH_ROWS)
+        include_header = True
+        for batch in reader:
+            output = io.BytesIO()
+            pa_csv.write_csv(batch, output, pa_csv.WriteOptions(include_header=include_header))
+            include_header = False
+            yield output.getvalue()
+
+        if include_header:
+            # No rows matched - still send the header line
+            output = io.BytesIO()
+            pa_csv.write_csv(reader.schema.empty_table(), output)
+            yield output.getvalue()
 
 @app.route('/api/download/csv', methods=['POST'])
 def download_csv():
@@ -726,24 +1276,31 @@ def download_csv():
         substring_filters = data.get('substringFilters', {})
         regex_filters = data.get('regexFilters', {})
 
-        # Get filtered data
-        df = get_filtered_data_for_download(filters, substring_filters, regex_filters)
-
-        # Convert to CSV
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
+        # Build the query up front so errors are still reported as JSON
+        query, params = build_download_query(filters, substring_filters, regex_filters)
+        check_export_size(query, params)
 
         # Generate filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'workspace_audit_events_{timestamp}.csv'
 
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
+        # Stream the CSV as a chunked response, memory stays flat whatever the export size
+        response = Response(
+            stream_csv(query, params),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=filename
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
+        # The stream outlives the request, it keeps the dataset referenced until it is closed
+        dataset = current_session().dataset
+        engine.retain(dataset)
+        response.call_on_close(lambda: engine.release(dataset))
+        return response
+
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except ResourceLimitError as e:
+        return jsonify({'error': str(e)}), e.status_code
 
     except Exception as e:
         logger.error(f"Error in download_csv: {str(e)}")
@@ -759,25 +1316,37 @@ def download_parquet():
         substring_filters = data.get('substringFilters', {})
         regex_filters = data.get('regexFilters', {})
 
-        # Get filtered data
-        df = get_filtered_data_for_download(filters, substring_filters, regex_filters)
-        
-        # Convert to Parquet
-        output = io.BytesIO()
-        df.to_parquet(output, index=False, engine='pyarrow')
-        output.seek(0)
+        query, params = build_download_query(filters, substring_filters, regex_filters)
+        check_export_size(query, params)
+
+        # Let DuckDB write the Parquet file directly to a temp file
+        fd, export_path = tempfile.mkstemp(prefix='workspace_audit_export_', suffix='.parquet')
+        os.close(fd)
+        try:
+            with engine.cursor(timeout=EXPORT_TIMEOUT_SECONDS) as conn:
+                conn.execute(f"COPY ({query}) TO '{export_path}' (FORMAT PARQUET)", params)
+            # Unlink right away, the open handle keeps the file readable until the response is sent
+            export_file = open(export_path, 'rb')
+        finally:
+            os.remove(export_path)
         
         # Generate filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'workspace_audit_events_{timestamp}.parquet'
         
         return send_file(
-            output,
+            export_file,
             mimetype='application/octet-stream',
             as_attachment=True,
             download_name=filename
         )
     
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except ResourceLimitError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
         logger.error(f"Error in download_parquet: {str(e)}")
         logger.error(traceback.format_exc())
@@ -0,0 +1 @@
+"""Benchmarks for the Workspace File Audit backend"""
@@ -0,0 +1,178 @@
+"""
+Synthetic workspace audit events for benchmarks.
+
+Writes parquet chunks shaped like the files behind the download-urls API
+(events_{idx}.parquet, schema of schema_info.md). Each chunk covers a
+consecutive slice of the time span. Users, projects, files, actions, hardware
+tiers and environments follow skewed distributions: a few users and projects
+produce most events, most accesses are reads and a small set of hot files
+dominates every project.
+
+Rows are generated inside DuckDB one chunk at a time, so 10^8 rows only need
+the memory of a single chunk.
+
+Usage:
+    python -m benchmarks.generate_events --out DIR [--rows 1000000] [--days 30] [--end YYYY-MM-DD]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import duckdb
+
+# Event counts per chunk file (the last chunk takes the remainder)
+DEFAULT_ROWS_PER_FILE = 2_000_000
+
+# Exponent of the power-law skew: index = floor(n * random() ^ SKEW), so low indexes dominate
+DEFAULT_SKEW = 3.0
+
+ACTIONS = [('Read', 0.85), ('Write', 0.15)]
+HARDWARE_TIERS = [('small-k8s', 0.7), ('medium-k8s', 0.2), ('large-k8s', 0.08), ('gpu-k8s', 0.02)]
+ENVIRONMENTS = [
+    ('DominoStandardEnvironmentPy3.10R4.5', 0.55),
+    ('DominoStandardEnvironmentPy3.9R4.3', 0.2),
+    ('Spark3.5Environment', 0.1),
+    ('RapidsGPUEnvironment', 0.08),
+    ('JupyterLabMinimal', 0.05),
+    ('VSCodeEnvironment', 0.02),
+]
+DIRECTORIES = ['data', 'data/raw', 'data/processed', 'models', 'notebooks', 'outputs', 'reports', 'src']
+EXTENSIONS = ['csv', 'parquet', 'json', 'ipynb', 'py', 'pkl', 'txt', 'png']
+
+
+def sql_list(values):
+    """Render strings as a DuckDB list literal"""
+    return '[' + ', '.join("'{}'".format(value.replace("'", "''")) for value in values) + ']'
+
+
+def weighted_choice(weights, random_column):
+    """SQL picking a value of a [(value, weight)] list with a uniform random column"""
+    cases = []
+    cumulative = 0.0
+    for value, weight in weights[:-1]:
+        cumulative += weight
+        cases.append(f"WHEN {random_column} < {cumulative} THEN '{value}'")
+    return f"CASE {' '.join(cases)} ELSE '{weights[-1][0]}' END"
+
+
+def events_query(first_row, num_rows, start_ns, step_ns, users, projects, files_per_project, skew):
+    """
+    Build the query generating rows [first_row, first_row + num_rows) of the event stream.
+
+    Event i gets a timestamp in [start_ns + i * step_ns, start_ns + (i + 1) * step_ns), so
+    the stream is ordered by time and consecutive chunks cover consecutive time slices.
+    Distinct events never share a deduplicationId, which includes the timestamp.
+    """
+    return f"""
+        SELECT
+            gen_random_uuid()::VARCHAR AS uuid,
+            action || '-' || filename || '-' || userId || '-' || pid || '-' || timestamp AS deduplicationId,
+            timestamp,
+            filename,
+            projectId,
+            projectName,
+            userId,
+            username,
+            hardwareTierId,
+            environmentName,
+            workspaceName,
+            action
+        FROM (
+            SELECT
+                timestamp,
+                '/domino/datasets/local/project-' || p || '/'
+                    || list_extract({sql_list(DIRECTORIES)}, (f % {len(DIRECTORIES)}) + 1)
+                    || '/file' || f || '.'
+                    || list_extract({sql_list(EXTENSIONS)}, (f % {len(EXTENSIONS)}) + 1) AS filename,
+                substring(md5('project' || p), 1, 24) AS projectId,
+                'project-' || p AS projectName,
+                substring(md5('user' || u), 1, 24) AS userId,
+                'user-' || u AS username,
+                {weighted_choice(HARDWARE_TIERS, 'r_tier')} AS hardwareTierId,
+                {weighted_choice(ENVIRONMENTS, 'r_env')} AS environmentName,
+                'workspace-' || p || '-' || w AS workspaceName,
+                {weighted_choice(ACTIONS, 'r_action')} AS action,
+                pid
+            FROM (
+                SELECT
+                    {start_ns} + i * {step_ns} + floor(random() * {step_ns})::BIGINT AS timestamp,
+                    floor({users} * pow(random(), {skew}))::INTEGER AS u,
+                    floor({projects} * pow(random(), {skew}))::INTEGER AS p,
+                    floor({files_per_project} * pow(random(), {skew}))::INTEGER AS f,
+                    floor(4 * pow(random(), 2))::INTEGER AS w,
+                    floor(random() * 100000)::INTEGER AS pid,
+                    random() AS r_action,
+                    random() AS r_tier,
+                    random() AS r_env
+                FROM range({first_row}, {first_row + num_rows}) t(i)
+            )
+        )
+    """
+
+
+def generate_events(out_dir, rows, days=30, end=None, rows_per_file=DEFAULT_ROWS_PER_FILE, users=500,
+                    projects=200, files_per_project=5000, skew=DEFAULT_SKEW, first_file=0):
+    """
+    Write synthetic events as parquet chunks.
+
+    Args:
+        out_dir: Output directory
+        rows: Number of events
+        days: Length of the time span, ending at `end`
+        end: End of the span (datetime, UTC); defaults to the start of tomorrow so a
+            range ending today covers every event
+        rows_per_file: Events per chunk file
+        users: Number of distinct users
+        projects: Number of distinct projects
+        files_per_project: Number of distinct file paths per project
+        skew: Power-law exponent of the user, project and file distributions
+        first_file: Index of the first chunk (to add chunks to an existing directory)
+
+    Returns:
+        list: Paths of the written files
+    """
+    if end is None:
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    end_ns = int(end.timestamp()) * 10**9
+    start_ns = end_ns - int(days * 86400 * 10**9)
+    step_ns = max(1, (end_ns - start_ns) // rows)
+
+    os.makedirs(out_dir, exist_ok=True)
+    conn = duckdb.connect()
+    paths = []
+    for file_idx, first_row in enumerate(range(0, rows, rows_per_file), start=first_file):
+        num_rows = min(rows_per_file, rows - first_row)
+        path = os.path.join(out_dir, f"events_{file_idx}.parquet")
+        started = time.monotonic()
+        query = events_query(first_row, num_rows, start_ns, step_ns, users, projects, files_per_project, skew)
+        conn.execute(f"COPY ({query}) TO '{path}' (FORMAT PARQUET, COMPRESSION SNAPPY)")
+        paths.append(path)
+        print(f"Wrote {num_rows} events to {path} in {time.monotonic() - started:.1f}s")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--end', help='End date (YYYY-MM-DD, exclusive); defaults to tomorrow')
+    parser.add_argument('--rows-per-file', type=int, default=DEFAULT_ROWS_PER_FILE)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--files-per-project', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=DEFAULT_SKEW)
+    args = parser.parse_args()
+
+    end = datetime.fromisoformat(args.end).replace(tzinfo=timezone.utc) if args.end else None
+    started = time.monotonic()
+    paths = generate_events(
+        args.out, args.rows, args.days, end, args.rows_per_file, args.users, args.projects,
+        args.files_per_project, args.skew
+    )
+    print(f"{args.rows} events in {len(paths)} files written in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Substring filter on filename: LIKE scan vs n-gram index.
+
+Builds a synthetic events table, indexes its filename column and times the
+filtered count and the first table page for a few search terms with both the
+LIKE '%term%' scan and the index (candidate values from the trigram posting
+lists, checked against the term, events selected by row id).
+
+Usage:
+    python -m benchmarks.ngram_benchmark [--rows 3000000] [--files 250000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import duckdb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ngram_index import NgramIndex  # noqa: E402
+
+DEFAULT_TERMS = ['file123457.csv', 'proj17/dir2', 'dir42/', 'report', '/file_', 'proj1']
+
+
+def create_events(conn, rows, files):
+    """Create an events table whose filename column has about `files` distinct paths"""
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE events AS
+        SELECT
+            1760000000000000000 + i * 345679000 AS timestamp,
+            '/domino/datasets/local/proj' || (f % 200) || '/dir' || (f // 200 % 300) || '/'
+                || CASE WHEN f % 50 = 0 THEN 'report' ELSE 'file' END || f || '.csv' AS filename
+        FROM (SELECT i, (hash(i) >> 1)::BIGINT % {files} AS f FROM range({rows}) t(i))
+        ORDER BY timestamp
+    """)
+
+
+def best_time(func, repeat):
+    """Return the best wall time of func over repeat runs and its last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=3000000)
+    parser.add_argument('--files', type=int, default=250000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('terms', nargs='*', default=DEFAULT_TERMS)
+    args = parser.parse_args()
+
+    conn = duckdb.connect()
+    create_events(conn, args.rows, args.files)
+    build_seconds, index = best_time(lambda: NgramIndex.build(conn, 'events', 'filename'), 1)
+    print(f"{args.rows} rows, {len(index.values)} distinct filenames, index built in {build_seconds:.2f}s\n")
+
+    page = "SELECT * FROM events WHERE {condition} ORDER BY timestamp DESC LIMIT 100"
+    count = "SELECT COUNT(*) FROM events WHERE {condition}"
+    like = "filename LIKE ?"
+
+    print(f"{'term':<16} {'rows':>9} {'like count':>11} {'index count':>12} {'like page':>10} {'index page':>11}")
+    for term in args.terms:
+        search_seconds, value_ids = best_time(lambda: index.search(term), args.repeat)
+        like_count, rows = best_time(
+            lambda: conn.execute(count.format(condition=like), [f'%{term}%']).fetchone()[0], args.repeat
+        )
+        like_page, _ = best_time(lambda: conn.execute(page.format(condition=like), [f'%{term}%']).fetchall(), args.repeat)
+        if value_ids is None:
+            # Too unselective (or wildcards), the compiler keeps the LIKE scan
+            index_count = index_page = None
+        else:
+            index_count, _ = best_time(
+                lambda: conn.execute(count.format(condition=index.condition()), [value_ids]).fetchone()[0],
+                args.repeat
+            )
+            index_page, _ = best_time(
+                lambda: conn.execute(page.format(condition=index.condition()), [value_ids]).fetchall(),
+                args.repeat
+            )
+            index_count += search_seconds
+            index_page += search_seconds
+
+        def fmt(seconds):
+            return f"{seconds:.3f}s" if seconds is not None else 'scan'
+
+        print(
+            f"{term:<16} {rows:>9} {fmt(like_count):>11} {fmt(index_count):>12} "
+            f"{fmt(like_page):>10} {fmt(index_page):>11}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+End-to-end benchmark of the app against the local stand-in audit API.
+
+Starts benchmarks.stub_server over a directory of synthetic chunks (generated
+with benchmarks.generate_events if it is empty) and the app itself, pointed at
+the stand-in through AUDIT_API_BASE_URL with a fresh parquet cache and event
+store. Then times every scenario over HTTP: /api/data (cold and warm),
+/api/columns, /api/query with different pages, sorts, filters and formats,
+/api/filtered-columns, /api/chart and both downloads.
+
+Per scenario it records latency percentiles, response bytes and the app's peak
+RSS (VmHWM) after the scenario. Results are printed as a table and optionally
+written as JSON to compare runs.
+
+Usage:
+    python -m benchmarks.run_benchmark --data-dir DIR [--rows 1000000] [--repeat 5] [--json results.json]
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.generate_events import generate_events  # noqa: E402
+from file_cache import read_timestamp_span  # noqa: E402
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_bytes(pid):
+    """Peak resident set size (VmHWM) of a process, or None where /proc is not available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def wait_for(url, process, timeout=60):
+    """Wait until a server answers on url"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before answering {url}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def data_range(data_dir):
+    """(start, end) dates (YYYY-MM-DD, UTC) spanning every chunk of the data directory"""
+    spans = [read_timestamp_span(path) for path in glob.glob(os.path.join(data_dir, 'events_*.parquet'))]
+    span_min = min(span[0] for span in spans)
+    span_max = max(span[1] for span in spans)
+
+    def to_date(ns):
+        return datetime.fromtimestamp(ns // 10**9, timezone.utc).strftime('%Y-%m-%d')
+
+    return to_date(span_min), to_date(span_max)
+
+
+def build_scenarios(session, app_url, start, end):
+    """
+    List the timed requests as (name, method, path, json body, repeatable).
+
+    Filter values are taken from /api/columns so they match the generated data.
+    Non-repeatable scenarios change server state and are timed once.
+    """
+    columns = session.get(f"{app_url}/api/columns").json()['columns']
+    top_user = columns['username']['topValues'][0]['value']
+    top_project = columns['projectName']['topValues'][0]['value']
+    rare_user = columns['username']['topValues'][-1]['value']
+
+    filtered = {'filters': {'action': ['Write'], 'username': [top_user]}}
+    substring = {'substringFilters': {'filename': ['file12']}}
+    regex = {'regexFilters': {'filename': ['/\\.(csv|parquet)$']}}
+
+    return [
+        ('data (warm)', 'GET', f"/api/data?start={start}&end={end}", None, True),
+        ('columns', 'GET', '/api/columns', None, True),
+        ('column values search', 'GET', '/api/columns/filename/values?search=file1&limit=100', None, True),
+        ('query page 1', 'POST', '/api/query', {'page': 1}, True),
+        ('query page 1 json', 'POST', '/api/query?format=json', {'page': 1}, True),
+        ('query page 1 columnar', 'POST', '/api/query?format=columnar', {'page': 1}, True),
+        ('query page 1 arrow', 'POST', '/api/query?format=arrow', {'page': 1}, True),
+        ('query page 500', 'POST', '/api/query', {'page': 500}, True),
+        ('query sort username', 'POST', '/api/query', {'sortColumn': 'username', 'sortOrder': 'ASC'}, True),
+        ('query page size 1000', 'POST', '/api/query', {'pageSize': 1000}, True),
+        ('query exact filters', 'POST', '/api/query', filtered, True),
+        ('query rare user', 'POST', '/api/query', {'filters': {'username': [rare_user]}}, True),
+        ('query substring', 'POST', '/api/query', substring, True),
+        ('query regex', 'POST', '/api/query', regex, True),
+        ('query project + substring', 'POST', '/api/query',
+         {'filters': {'projectName': [top_project]}, **substring}, True),
+        ('filtered-columns', 'POST', '/api/filtered-columns', {}, True),
+        ('filtered-columns filtered', 'POST', '/api/filtered-columns', {**filtered, **substring}, True),
+        ('chart', 'POST', '/api/chart', {'bucket': 'day', 'breakdownField': 'action'}, True),
+        ('chart filtered', 'POST', '/api/chart', {**filtered, 'bucket': 'hour', 'breakdownField': 'projectName'},
+         True),
+        ('download csv', 'POST', '/api/download/csv', filtered, True),
+        ('download parquet', 'POST', '/api/download/parquet', filtered, True),
+        ('data (last day)', 'GET', f"/api/data?start={end}&end={end}", None, False),
+    ]
+
+
+def run_scenario(session, app_url, app_pid, method, path, body, repeat):
+    """Time a request repeat times and return its latency, size and memory statistics"""
+    latencies = []
+    sizes = []
+    statuses = set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = session.request(method, f"{app_url}{path}", json=body, stream=True)
+        size = sum(len(chunk) for chunk in response.iter_content(chunk_size=1024 * 1024))
+        latencies.append(time.perf_counter() - started)
+        sizes.append(size)
+        statuses.add(response.status_code)
+
+    ordered = sorted(latencies)
+    return {
+        'runs': repeat,
+        'status': sorted(statuses),
+        'first': latencies[0],
+        **{f"p{pct}": percentile(ordered, pct) for pct in PERCENTILES},
+        'max': ordered[-1],
+        'bytes': max(sizes),
+        'peakRss': peak_rss_bytes(app_pid)
+    }
+
+
+def start_servers(args, work_dir):
+    """Start the stand-in API and the app, returning both processes"""
+    log = open(os.path.join(work_dir, 'servers.log'), 'w')
+    stub = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.stub_server', '--data-dir', args.data_dir,
+         '--port', str(args.stub_port), '--sync-seconds', '0'],
+        cwd=ROOT_DIR, stdout=log, stderr=subprocess.STDOUT
+    )
+    env = {
+        **os.environ,
+        'AUDIT_API_BASE_URL': f"http://127.0.0.1:{args.stub_port}",
+        'PARQUET_CACHE_DIR': os.path.join(work_dir, 'cache'),
+        'EVENT_STORE_DIR': os.path.join(work_dir, 'store'),
+    }
+    if args.disable_result_cache:
+        env['RESULT_CACHE_MAX_BYTES'] = '0'
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(args.app_port), '--no-reload'],
+        cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    wait_for(f"http://127.0.0.1:{args.stub_port}/api/workspace-audit/v1/process/latest", stub)
+    wait_for(f"http://127.0.0.1:{args.app_port}/", app)
+    return stub, app
+
+
+def print_results(results):
+    header = f"{'scenario':<28} {'status':>7} {'first':>8} " + ' '.join(f"{'p' + str(p):>8}" for p in PERCENTILES)
+    print(f"{header} {'bytes':>12} {'peak RSS':>10}")
+    for name, result in results.items():
+        latencies = ' '.join(f"{result['p' + str(p)] * 1000:>6.0f}ms" for p in PERCENTILES)
+        rss = f"{result['peakRss'] / 1024 ** 2:>8.0f}MB" if result['peakRss'] else f"{'n/a':>10}"
+        status = ','.join(str(code) for code in result['status'])
+        print(
+            f"{name:<28} {status:>7} {result['first'] * 1000:>6.0f}ms {latencies} {result['bytes']:>12} {rss}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', required=True, help='Directory of events_*.parquet chunks')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Events to generate if the directory is empty')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--app-port', type=int, default=8899)
+    parser.add_argument('--stub-port', type=int, default=8898)
+    parser.add_argument('--disable-result-cache', action='store_true',
+                        help='Run the app with RESULT_CACHE_MAX_BYTES=0 so repeats measure query execution')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    if not glob.glob(os.path.join(args.data_dir, 'events_*.parquet')):
+        generate_events(args.data_dir, args.rows, args.days)
+    start, end = data_range(args.data_dir)
+
+    work_dir = tempfile.mkdtemp(prefix='audit-benchmark-')
+    stub, app = start_servers(args, work_dir)
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    session = requests.Session()
+    try:
+        results = {}
+        # The first load downloads, ingests and materializes the range
+        results['data (cold)'] = run_scenario(
+            session, app_url, app.pid, 'GET', f"/api/data?start={start}&end={end}", None, 1
+        )
+        for name, method, path, body, repeatable in build_scenarios(session, app_url, start, end):
+            results[name] = run_scenario(
+                session, app_url, app.pid, method, path, body, args.repeat if repeatable else 1
+            )
+
+        print(f"\n{start} to {end}, {args.repeat} runs per scenario (logs in {work_dir})\n")
+        print_results(results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'start': start, 'end': end, 'repeat': args.repeat, 'results': results}, f, indent=2)
+    finally:
+        app.terminate()
+        stub.terminate()
+        app.wait()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Per-row cost of turning query results into JSON.
+
+Compares the previous path (fetchdf, per-row datetime.fromtimestamp, to_dict,
+jsonify) with DuckDB-side ISO timestamp formatting and to_json() serialization
+read in Arrow record batches, and with the columnar JSON and Arrow IPC response
+formats. Payload sizes and client-side JSON parse times are reported as well.
+
+Usage:
+    python -m benchmarks.serialization_benchmark [--rows 200000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import duckdb
+import pyarrow.ipc as ipc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import arrow_ipc_stream, columnar_json, iter_json_records  # noqa: E402
+
+ACTIONS = ['Read', 'Write', 'Delete', 'Rename', 'Create']
+
+
+def create_events(conn, rows):
+    """Create a synthetic events table following the audit event schema"""
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE events AS
+        SELECT
+            uuid()::VARCHAR AS uuid,
+            'dedup-' || i AS deduplicationId,
+            1760000000000000000 + i * 345679000 AS timestamp,
+            '/domino/datasets/local/proj' || (i % 20) || '/dir' || (i % 50) || '/file' || (i % 1000) || '.csv' AS filename,
+            'pid' || (i % 20) AS projectId,
+            'project-' || (i % 20) AS projectName,
+            'uid' || (i % 40) AS userId,
+            'user-' || (i % 40) AS username,
+            'small-k8s' AS hardwareTierId,
+            'Env' || (i % 5) AS environmentName,
+            'ws' || (i % 100) AS workspaceName,
+            list_extract({ACTIONS!r}, 1 + CAST(i % {len(ACTIONS)} AS INTEGER)) AS action
+        FROM range({rows}) t(i)
+        ORDER BY timestamp
+    """)
+
+
+def serialize_pandas(conn):
+    """Previous path: DataFrame, per-row timestamp apply, list of dicts, json.dumps"""
+    result = conn.execute("SELECT * FROM events").fetchdf()
+    result['timestamp'] = (result['timestamp'] / 1e9).apply(
+        lambda x: datetime.fromtimestamp(x).isoformat()
+    )
+    return json.dumps({'data': result.to_dict('records'), 'total': len(result)})
+
+
+def serialize_duckdb(conn):
+    """Current path: ISO formatting and to_json() in DuckDB, read in record batches"""
+    return '{"data":' + ''.join(iter_json_records(conn, "SELECT * FROM events")) + ',"total":0}'
+
+
+def serialize_columnar(conn):
+    """Columnar JSON: one array per column, dictionary-encoded low-cardinality columns"""
+    table = conn.execute("SELECT * FROM events").arrow()
+    return '{"data":' + columnar_json(conn, table) + ',"total":0}'
+
+
+def serialize_arrow(conn):
+    """Arrow IPC stream"""
+    return arrow_ipc_stream(conn.execute("SELECT * FROM events").arrow(), {'total': 0})
+
+
+def best_time(func, repeat):
+    """Return the best wall time of func over repeat runs and its last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    conn = duckdb.connect()
+    create_events(conn, args.rows)
+
+    paths = (
+        ('pandas', serialize_pandas),
+        ('duckdb', serialize_duckdb),
+        ('columnar', serialize_columnar),
+        ('arrow', serialize_arrow),
+    )
+    print(f"{'path':<10} {'seconds':>9} {'us/row':>9} {'MB':>8} {'parse s':>9}")
+    for name, func in paths:
+        seconds, payload = best_time(lambda: func(conn), args.repeat)
+        size = len(payload) if isinstance(payload, bytes) else len(payload.encode('utf-8'))
+        if isinstance(payload, bytes):
+            parse_seconds, _ = best_time(lambda: ipc.open_stream(payload).read_all(), args.repeat)
+        else:
+            parse_seconds, _ = best_time(lambda: json.loads(payload), args.repeat)
+        print(
+            f"{name:<10} {seconds:>9.3f} {seconds / args.rows * 1e6:>9.2f} "
+            f"{size / 1e6:>8.1f} {parse_seconds:>9.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
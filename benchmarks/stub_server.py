@@ -0,0 +1,151 @@
+"""
+Local stand-in for the workspace audit API of a Domino host.
+
+Serves the endpoints the app calls, over the parquet chunks of a directory
+(see benchmarks.generate_events):
+
+    GET  /api/workspace-audit/v1/events/download-urls   URLs of the chunks overlapping the window
+    GET  /files/<name>                                  the chunk itself (the "presigned" URL)
+    POST /api/workspace-audit/v1/process                start a sync
+    GET  /api/workspace-audit/v1/process/latest         status of the latest sync
+
+A sync stays InProgress for --sync-seconds. When it completes, --sync-rows new
+events after the latest one are written as a new chunk, so incremental
+refreshes have something to fetch (the chunk stays in the data directory).
+
+Point the app at it with AUDIT_API_BASE_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python -m benchmarks.stub_server --data-dir DIR [--port 8898] [--sync-seconds 5] [--sync-rows 10000]
+"""
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import Flask, abort, jsonify, request, send_from_directory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate_events import generate_events  # noqa: E402
+from file_cache import read_timestamp_span  # noqa: E402
+
+
+def iso_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class StubAuditApi:
+    """Chunk catalog and sync state of the stand-in server"""
+
+    def __init__(self, data_dir, sync_seconds, sync_rows):
+        self.data_dir = os.path.abspath(data_dir)
+        self.sync_seconds = sync_seconds
+        self.sync_rows = sync_rows
+        self.lock = threading.Lock()
+        self.chunks = {}
+        self.sync = {'status': 'Completed', 'updatedAt': iso_now(), 'started': None}
+        self.scan()
+
+    def scan(self):
+        """Read the timestamp span of every chunk from its parquet footer"""
+        for path in glob.glob(os.path.join(self.data_dir, 'events_*.parquet')):
+            name = os.path.basename(path)
+            if name not in self.chunks:
+                span_min, span_max, _ = read_timestamp_span(path)
+                self.chunks[name] = (span_min, span_max)
+
+    def chunks_between(self, start_ns, end_ns):
+        """Names of the chunks holding events between two timestamps"""
+        with self.lock:
+            return sorted(
+                name for name, (span_min, span_max) in self.chunks.items()
+                if span_min is not None and span_min <= end_ns and span_max >= start_ns
+            )
+
+    def start_sync(self):
+        with self.lock:
+            self.sync = {'status': 'InProgress', 'updatedAt': iso_now(), 'started': time.monotonic()}
+            return {'status': 'InProgress', 'updatedAt': self.sync['updatedAt']}
+
+    def latest_sync(self):
+        """Status of the latest sync, completing it (and writing its events) once it is due"""
+        with self.lock:
+            sync = self.sync
+            if sync['status'] == 'InProgress' and time.monotonic() - sync['started'] >= self.sync_seconds:
+                if self.sync_rows:
+                    self._write_sync_chunk()
+                self.sync = {'status': 'Completed', 'updatedAt': iso_now(), 'started': None}
+            return {'status': self.sync['status'], 'updatedAt': self.sync['updatedAt']}
+
+    def _write_sync_chunk(self):
+        """Write sync_rows events after the latest event (up to now, at least a minute) as a new chunk"""
+        latest = max((span_max for _, span_max in self.chunks.values() if span_max is not None), default=None)
+        start_ns = latest + 10**9 if latest else int(time.time()) * 10**9
+        end_ns = max(int(time.time()) * 10**9, start_ns + 60 * 10**9)
+        next_idx = 1 + max(
+            (int(name[len('events_'):-len('.parquet')]) for name in self.chunks
+             if name[len('events_'):-len('.parquet')].isdigit()),
+            default=-1
+        )
+        paths = generate_events(
+            self.data_dir, self.sync_rows, days=(end_ns - start_ns) / (86400 * 10**9),
+            end=datetime.fromtimestamp(end_ns // 10**9, timezone.utc), rows_per_file=self.sync_rows,
+            first_file=next_idx
+        )
+        for path in paths:
+            span_min, span_max, _ = read_timestamp_span(path)
+            self.chunks[os.path.basename(path)] = (span_min, span_max)
+
+
+def create_app(api):
+    app = Flask(__name__)
+
+    @app.route('/api/workspace-audit/v1/events/download-urls')
+    def download_urls():
+        start_ns = request.args.get('startTimestamp', 0, type=int)
+        end_ns = request.args.get('endTimestamp', 2**63 - 1, type=int)
+        # A fresh signature per call, like presigned URLs
+        signature = uuid.uuid4().hex
+        return jsonify([
+            f"{request.host_url}files/{name}?signature={signature}"
+            for name in api.chunks_between(start_ns, end_ns)
+        ])
+
+    @app.route('/files/<name>')
+    def download_file(name):
+        if name not in api.chunks:
+            abort(404)
+        return send_from_directory(api.data_dir, name, mimetype='application/octet-stream')
+
+    @app.route('/api/workspace-audit/v1/process', methods=['POST'])
+    def process():
+        return jsonify(api.start_sync())
+
+    @app.route('/api/workspace-audit/v1/process/latest')
+    def process_latest():
+        return jsonify(api.latest_sync())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', required=True)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8898)
+    parser.add_argument('--sync-seconds', type=float, default=5.0)
+    parser.add_argument('--sync-rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    api = StubAuditApi(args.data_dir, args.sync_seconds, args.sync_rows)
+    print(f"Serving {len(api.chunks)} chunks from {api.data_dir}")
+    create_app(api).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
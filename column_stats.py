@@ -0,0 +1,264 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Most frequent values kept per column
+COLUMN_STATS_TOP_K = int(os.environ.get('COLUMN_STATS_TOP_K', '20'))
+
+# Columns with up to this many distinct values list all of them in /api/columns,
+# larger ones only the first page (the rest is paged through the value lookup)
+COLUMN_VALUES_INLINE_LIMIT = 1000
+
+# Maximum page size of the value lookup
+COLUMN_VALUES_MAX_PAGE_SIZE = 1000
+
+# Columns whose (approximate) distinct count exceeds this fraction of the rows are treated as
+# identifiers (uuid, timestamp): no value table, the distinct count stays a HyperLogLog estimate
+IDENTIFIER_DISTINCT_FRACTION = 0.5
+
+# ============================================================================
+# COLUMN STATISTICS
+# ============================================================================
+
+def quote_identifier(column):
+    """Quote a column name for SQL"""
+    return '"{}"'.format(column.replace('"', '""'))
+
+
+def value_table_name(table, column):
+    """Name of the (value, events) table of a column"""
+    return f"{table}__values_{column}"
+
+
+def to_json_scalar(value):
+    """Convert a DuckDB scalar to a JSON serializable value"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def pandas_dtypes(conn, table):
+    """Pandas dtype name of every column of a table (the 'type' vocabulary of the column endpoints)"""
+    dtypes = conn.execute(f"SELECT * FROM {table} LIMIT 0").fetchdf().dtypes
+    return {column: str(dtype) for column, dtype in dtypes.items()}
+
+
+def scan_column_aggregates(conn, table, columns):
+    """
+    Compute the null count, min, max and HyperLogLog distinct count of every column in one scan.
+
+    Returns:
+        tuple: (number of rows, dict of column name -> (nulls, min, max, approximate distinct count))
+    """
+    aggregates = []
+    for column in columns:
+        col = quote_identifier(column)
+        aggregates += [f"COUNT(*) - COUNT({col})", f"MIN({col})", f"MAX({col})", f"approx_count_distinct({col})"]
+    row = conn.execute(f"SELECT COUNT(*), {', '.join(aggregates)} FROM {table}").fetchone()
+    return row[0], {column: row[1 + 4 * idx:5 + 4 * idx] for idx, column in enumerate(columns)}
+
+
+def value_counts_query(table, column):
+    """
+    Query returning the (native, value, events) counts of a column's non-NULL values,
+    where value is the VARCHAR form and native the column's own value to sort by
+    """
+    col = quote_identifier(column)
+    return (
+        f"SELECT {col} AS native, CAST({col} AS VARCHAR) AS value, COUNT(*) AS events "
+        f"FROM {table} WHERE {col} IS NOT NULL GROUP BY ALL"
+    )
+
+
+def first_values_query(source, column, limit=COLUMN_VALUES_INLINE_LIMIT):
+    """Query returning the first distinct non-NULL values of a column, in the column's own order, as VARCHAR"""
+    col = quote_identifier(column)
+    return (
+        f"SELECT CAST(native AS VARCHAR) FROM (SELECT DISTINCT {col} AS native FROM {source} "
+        f"WHERE {col} IS NOT NULL) ORDER BY native LIMIT {limit}"
+    )
+
+
+def summarize_value_table(conn, values_table, top_k):
+    """Read the exact distinct count, top-K values and first page of values from a value table"""
+    distinct_count = conn.execute(f"SELECT COUNT(*) FROM {values_table}").fetchone()[0]
+    top_values = conn.execute(
+        f"SELECT value, events FROM {values_table} ORDER BY events DESC, native LIMIT {top_k}"
+    ).fetchall()
+    values = [value for (value,) in conn.execute(
+        f"SELECT value FROM {values_table} ORDER BY native LIMIT {COLUMN_VALUES_INLINE_LIMIT}"
+    ).fetchall()]
+    return {
+        'distinctCount': distinct_count,
+        'distinctCountExact': True,
+        'topValues': [{'value': value, 'count': events} for value, events in top_values],
+        'values': values,
+        'complete': distinct_count <= COLUMN_VALUES_INLINE_LIMIT,
+        'valueTable': values_table
+    }
+
+
+def compute_column_stats(conn, table, column_types, top_k=COLUMN_STATS_TOP_K):
+    """
+    Compute per-column statistics of a freshly loaded events table.
+
+    Null counts, min/max and a HyperLogLog distinct count are computed for all columns
+    in one scan. Every column except identifier-like ones then gets a value table
+    holding its distinct non-NULL values (as VARCHAR) with their event counts, sorted
+    by the column's own values (numbers numerically). It gives the exact distinct count
+    and the top-K values, and backs the paged value lookup. Identifier-like columns only
+    list their first COLUMN_VALUES_INLINE_LIMIT values. Column types are reported
+    as pandas dtype names (int64, object, ...).
+
+    Args:
+        conn: DuckDB connection holding the table
+        table: Events table
+        column_types: Dict of column name -> DuckDB type
+        top_k: Number of most frequent values kept per column
+
+    Returns:
+        dict: Column name -> {'type', 'rows', 'nullCount', 'distinctCount', 'distinctCountExact',
+        'min', 'max', 'topValues', 'values', 'complete', 'valueTable'}
+    """
+    started = time.monotonic()
+    num_rows, aggregates = scan_column_aggregates(conn, table, list(column_types))
+    dtypes = pandas_dtypes(conn, table)
+
+    stats = {}
+    for column, (null_count, min_value, max_value, approx_distinct) in aggregates.items():
+        column_stats = {
+            'type': dtypes[column],
+            'rows': num_rows,
+            'nullCount': null_count,
+            'distinctCount': approx_distinct,
+            'distinctCountExact': False,
+            'min': to_json_scalar(min_value),
+            'max': to_json_scalar(max_value),
+            'topValues': [],
+            'values': [],
+            'complete': False,
+            'valueTable': None
+        }
+        stats[column] = column_stats
+        if approx_distinct > max(num_rows * IDENTIFIER_DISTINCT_FRACTION, COLUMN_VALUES_INLINE_LIMIT):
+            column_stats['values'] = [value for (value,) in conn.execute(first_values_query(table, column)).fetchall()]
+            continue
+
+        values_table = value_table_name(table, column)
+        conn.execute(f"CREATE OR REPLACE TABLE {values_table} AS {value_counts_query(table, column)} ORDER BY native")
+        column_stats.update(summarize_value_table(conn, values_table, top_k))
+
+    logger.info(f"Computed statistics of {len(stats)} columns of {table} in {time.monotonic() - started:.2f}s")
+    return stats
+
+
+def merge_column_stats(conn, delta_table, stats, top_k=COLUMN_STATS_TOP_K):
+    """
+    Fold the events of an appended delta into the statistics of the loaded table.
+
+    Null counts and min/max are merged from one scan of the delta. The value tables
+    get the delta's value counts added (new values are inserted), and their summary is
+    re-read. Estimated distinct counts of identifier-like columns grow by the delta's
+    estimate, and their first values are merged with the delta's.
+
+    Args:
+        conn: DuckDB connection holding the tables
+        delta_table: Table holding only the appended events
+        stats: Current statistics (see compute_column_stats), not modified
+        top_k: Number of most frequent values kept per column
+
+    Returns:
+        dict: Updated statistics
+    """
+    started = time.monotonic()
+    num_rows, aggregates = scan_column_aggregates(conn, delta_table, list(stats))
+    delta_types = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {delta_table}").fetchall()}
+
+    merged = {}
+    for column, (null_count, min_value, max_value, approx_distinct) in aggregates.items():
+        column_stats = dict(stats[column])
+        column_stats['rows'] += num_rows
+        column_stats['nullCount'] += null_count
+        for key, value, pick in (('min', min_value, min), ('max', max_value, max)):
+            value = to_json_scalar(value)
+            if value is not None:
+                column_stats[key] = value if column_stats[key] is None else pick(column_stats[key], value)
+
+        values_table = column_stats['valueTable']
+        if values_table:
+            delta_counts = value_counts_query(delta_table, column)
+            conn.execute(f"""
+                UPDATE {values_table} SET events = {values_table}.events + delta.events
+                FROM ({delta_counts}) AS delta
+                WHERE {values_table}.value = delta.value
+            """)
+            conn.execute(f"""
+                INSERT INTO {values_table}
+                SELECT * FROM ({delta_counts}) AS delta
+                WHERE NOT EXISTS (SELECT 1 FROM {values_table} AS v WHERE v.value = delta.value)
+            """)
+            column_stats.update(summarize_value_table(conn, values_table, top_k))
+        else:
+            column_stats['distinctCount'] += approx_distinct
+            # Listed values are cast back to the column type, so the merged page keeps its order
+            col = quote_identifier(column)
+            merged_values = (
+                f"(SELECT {col} FROM {delta_table} UNION ALL "
+                f"SELECT CAST(unnest(?::VARCHAR[]) AS {delta_types[column]}) AS {col}) AS merged"
+            )
+            rows = conn.execute(first_values_query(merged_values, column), [column_stats['values']]).fetchall()
+            column_stats['values'] = [value for (value,) in rows]
+        merged[column] = column_stats
+
+    logger.info(f"Merged {num_rows} appended events into the column statistics in {time.monotonic() - started:.2f}s")
+    return merged
+
+
+def drop_column_stats(conn, stats):
+    """Drop the value tables of a table's column statistics"""
+    for column_stats in stats.values():
+        if column_stats['valueTable']:
+            conn.execute(f"DROP TABLE IF EXISTS {column_stats['valueTable']}")
+
+
+def lookup_column_values(conn, table, column, value_table=None, search=None, offset=0, limit=100):
+    """
+    Page through the distinct values of a column, optionally those containing a search term.
+
+    Args:
+        conn: Pooled engine cursor (see engine.TimedCursor)
+        table: Events table
+        column: Column name
+        value_table: Value table of the column, or None to aggregate the events table
+        search: Case-insensitive substring the values must contain
+        offset: Number of values to skip
+        limit: Page size (capped at COLUMN_VALUES_MAX_PAGE_SIZE)
+
+    Returns:
+        dict: {'values', 'counts', 'total', 'offset', 'limit'}
+    """
+    limit = max(1, min(int(limit), COLUMN_VALUES_MAX_PAGE_SIZE))
+    offset = max(0, int(offset))
+    if value_table:
+        values_table = value_table
+    else:
+        values_table = f"({value_counts_query(table, column)}) AS column_values"
+
+    where_clause, params = "", []
+    if search:
+        where_clause, params = " WHERE contains(lower(value), ?)", [search.lower()]
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {values_table}{where_clause}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT value, events FROM {values_table}{where_clause} ORDER BY native LIMIT ? OFFSET ?",
+        params + [limit, offset]
+    ).fetchall()
+    return {
+        'values': [value for value, _ in rows],
+        'counts': [events for _, events in rows],
+        'total': total,
+        'offset': offset,
+        'limit': limit
+    }
@@ -0,0 +1,200 @@
+import logging
+import os
+import random
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from metrics import DOWNLOAD_SECONDS, DOWNLOADED_BYTES, DOWNLOADED_FILES
+from upstream import http
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# DOWNLOAD SETTINGS
+# ============================================================================
+
+# Number of files transferred in parallel
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', '8'))
+# Size of the chunks streamed from the response body to disk
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', str(1024 * 1024)))
+# Retries per file after the first attempt, with exponential backoff between them
+DOWNLOAD_MAX_RETRIES = int(os.environ.get('DOWNLOAD_MAX_RETRIES', '3'))
+DOWNLOAD_BACKOFF_SECONDS = float(os.environ.get('DOWNLOAD_BACKOFF_SECONDS', '1.0'))
+DOWNLOAD_TIMEOUT = int(os.environ.get('DOWNLOAD_TIMEOUT', '60'))
+
+# Status codes worth retrying; anything else (e.g. an expired presigned URL) fails immediately
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """Raised when a file could not be downloaded"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# ============================================================================
+# DOWNLOADS
+# ============================================================================
+
+def format_throughput(num_bytes, seconds):
+    """Format a transfer rate as MB/s"""
+    if seconds <= 0:
+        return 'n/a'
+    return f"{num_bytes / seconds / (1024 * 1024):.2f} MB/s"
+
+
+def _stream_to_file(url, local_path, chunk_size, timeout, progress=None, cancelled=None):
+    """
+    Stream a single response body to local_path through a temp file in the same directory.
+
+    The temp file is renamed over local_path only once the body is complete, so readers
+    never see a partially written parquet file. Connections to the object store are
+    reused across files through the pooled session of upstream.py.
+
+    Returns:
+        int: Number of bytes written
+    """
+    with http.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise DownloadError(
+                f'Download returned status {response.status_code}',
+                retryable=response.status_code in RETRYABLE_STATUS_CODES
+            )
+        if progress:
+            progress(0, int(response.headers.get('content-length') or 0))
+
+        directory = os.path.dirname(local_path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.download-', suffix='.part')
+        num_bytes = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if cancelled and cancelled():
+                        raise DownloadError('Download cancelled', retryable=False)
+                    if chunk:
+                        f.write(chunk)
+                        num_bytes += len(chunk)
+                        if progress:
+                            progress(len(chunk))
+            os.replace(temp_path, local_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    return num_bytes
+
+
+def download_file(url, local_path, chunk_size=None, max_retries=None, backoff_seconds=None, timeout=None,
+                  progress=None, cancelled=None):
+    """
+    Download one file with retries and exponential backoff.
+
+    Args:
+        url: The URL to download
+        local_path: Destination path
+        chunk_size: Streaming chunk size in bytes (default DOWNLOAD_CHUNK_SIZE)
+        max_retries: Retries after the first attempt (default DOWNLOAD_MAX_RETRIES)
+        backoff_seconds: Base delay between attempts (default DOWNLOAD_BACKOFF_SECONDS)
+        timeout: Request timeout in seconds (default DOWNLOAD_TIMEOUT)
+        progress: Optional function called with the size of every received chunk, and
+            with (0, Content-Length) when a transfer starts
+        cancelled: Optional function returning True once the download should stop
+
+    Returns:
+        dict: Transfer stats with path, bytes, seconds, attempts and throughput
+
+    Raises:
+        DownloadError: If every attempt failed
+    """
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    max_retries = DOWNLOAD_MAX_RETRIES if max_retries is None else max_retries
+    backoff_seconds = DOWNLOAD_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+    timeout = timeout or DOWNLOAD_TIMEOUT
+
+    attempt = 0
+    started = time.monotonic()
+    while True:
+        attempt += 1
+        try:
+            num_bytes = _stream_to_file(url, local_path, chunk_size, timeout, progress, cancelled)
+            seconds = time.monotonic() - started
+            return {
+                'path': local_path,
+                'bytes': num_bytes,
+                'seconds': seconds,
+                'attempts': attempt,
+                'throughput': format_throughput(num_bytes, seconds)
+            }
+        except (DownloadError, requests.exceptions.RequestException) as e:
+            retryable = getattr(e, 'retryable', True)
+            if not retryable or attempt > max_retries:
+                raise DownloadError(f'{e} (after {attempt} attempt(s))', retryable=False) from e
+
+            # Exponential backoff with jitter so parallel retries don't line up
+            delay = backoff_seconds * (2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.warning(f"Download of {local_path} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def download_files(downloads, concurrency=None, **kwargs):
+    """
+    Download files in parallel with a bounded worker pool.
+
+    Args:
+        downloads: List of (url, local_path) tuples
+        concurrency: Maximum parallel transfers (default DOWNLOAD_CONCURRENCY)
+        **kwargs: Additional arguments to pass to download_file
+
+    Returns:
+        tuple: (results: list of stats dicts in input order, None for failed files,
+                summary: dict with files, failed, bytes, seconds and throughput)
+    """
+    concurrency = max(1, concurrency or DOWNLOAD_CONCURRENCY)
+    results = [None] * len(downloads)
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, max(1, len(downloads)))) as executor:
+        futures = {
+            executor.submit(download_file, url, local_path, **kwargs): idx
+            for idx, (url, local_path) in enumerate(downloads)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            local_path = downloads[idx][1]
+            try:
+                stats = future.result()
+                results[idx] = stats
+                logger.info(
+                    f"Downloaded {local_path} ({stats['bytes']} bytes in {stats['seconds']:.2f}s, "
+                    f"{stats['throughput']}, {stats['attempts']} attempt(s))"
+                )
+            except Exception as e:
+                logger.error(f"Error downloading file {idx}: {e}")
+                logger.debug(traceback.format_exc())
+
+    seconds = time.monotonic() - started
+    completed = [stats for stats in results if stats]
+    total_bytes = sum(stats['bytes'] for stats in completed)
+    DOWNLOADED_FILES.inc(len(completed), outcome='completed')
+    DOWNLOADED_FILES.inc(len(downloads) - len(completed), outcome='failed')
+    DOWNLOADED_BYTES.inc(total_bytes)
+    DOWNLOAD_SECONDS.inc(seconds)
+    summary = {
+        'files': len(completed),
+        'failed': len(downloads) - len(completed),
+        'bytes': total_bytes,
+        'seconds': seconds,
+        'throughput': format_throughput(total_bytes, seconds)
+    }
+    logger.info(
+        f"Downloaded {summary['files']}/{len(downloads)} files, {total_bytes} bytes in "
+        f"{seconds:.2f}s ({summary['throughput']}, concurrency {concurrency})"
+    )
+    return results, summary
@@ -0,0 +1,762 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import duckdb
+
+from column_stats import compute_column_stats, drop_column_stats, merge_column_stats
+from file_cache import read_timestamp_span
+from file_lock import file_lock, hold_shared_lock, is_unused, release_lock
+from governor import QUERY_TIMEOUT_SECONDS, configure_connection, watchdog
+from metrics import QUERY_SECONDS, ROWS_SCANNED, SlowQueryLog
+from ngram_index import NGRAM_INDEX_COLUMNS, NgramIndex
+from regex_engine import RegexEngine
+
+logger = logging.getLogger(__name__)
+
+# Idle cursors kept for reuse between requests
+CURSOR_POOL_SIZE = int(os.environ.get('CURSOR_POOL_SIZE', '8'))
+
+# Unreferenced datasets are dropped after this many idle seconds
+DATASET_TTL_SECONDS = int(os.environ.get('DATASET_TTL_SECONDS', '900'))
+# Estimated size of all datasets above which unreferenced ones are dropped, least recently used first
+DATASET_MEMORY_BUDGET_BYTES = int(os.environ.get('DATASET_MEMORY_BUDGET_BYTES', str(4 * 1024 ** 3)))
+
+# Directory of dataset database files shared by worker processes (empty keeps datasets in memory)
+ENGINE_DATABASE_DIR = os.environ.get('ENGINE_DATABASE_DIR', '')
+
+DATASET_METADATA_TABLE = 'dataset_metadata'
+# Part of the dataset file names, bumped when their tables change layout so older files are not attached
+DATASET_FORMAT_VERSION = 2
+
+# Column identifying an event across re-deliveries, appended events are deduplicated on it
+DEDUPLICATION_COLUMN = 'deduplicationId'
+# Identifies events without a DEDUPLICATION_COLUMN value, together with their timestamp
+FALLBACK_DEDUPLICATION_COLUMN = 'uuid'
+
+# ============================================================================
+# EVENT ENGINE
+# ============================================================================
+
+def parquet_read_expression(paths):
+    """Build a DuckDB read_parquet() expression over the given parquet files"""
+    if not paths:
+        raise ValueError('No parquet files loaded')
+
+    # Store files sit in date=YYYY-MM-DD directories, the partition is not a column
+    if len(paths) == 1:
+        # Single file - simple query
+        return f"read_parquet('{paths[0]}', hive_partitioning = false)"
+    # Multiple files - use list syntax to read and union all files
+    paths_str = ', '.join([f"'{path}'" for path in paths])
+    return f"read_parquet([{paths_str}], hive_partitioning = false)"
+
+
+def parquet_file_stats(paths):
+    """
+    Read the size, row count and timestamp span of parquet files from their footers.
+
+    Returns:
+        dict: Path to {'file', 'bytes', 'rows', 'minTimestamp', 'maxTimestamp'}
+    """
+    files = {}
+    for path in paths:
+        span_min, span_max, num_rows = read_timestamp_span(path)
+        files[path] = {
+            'file': os.path.basename(path),
+            'bytes': os.path.getsize(path),
+            'rows': num_rows,
+            'minTimestamp': span_min,
+            'maxTimestamp': span_max
+        }
+    return files
+
+
+class TimedCursor:
+    """
+    DuckDB cursor that times its statements.
+
+    Parameters are bound through DuckDB (lists as LIST values), never rendered into
+    the SQL text. Statements slower than the slow query log's threshold are recorded
+    there, optionally with their profiled plan. Everything else is passed through to
+    the underlying cursor.
+    """
+
+    def __init__(self, conn, slow_queries=None):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.slow_queries = slow_queries
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def _observe(self, kind, query, params, seconds):
+        """Record a statement's duration and log it if it was slow"""
+        QUERY_SECONDS.observe(seconds, kind=kind)
+        if self.slow_queries is None or seconds < self.slow_queries.threshold:
+            return
+        plan = None
+        # Only read queries are re-run for profiling
+        if self.slow_queries.explain and query.lstrip().upper().startswith(('SELECT', 'WITH')):
+            plan = self.explain_analyze(query, params)
+        self.slow_queries.record(query, seconds, plan)
+
+    def explain_analyze(self, query, params=None):
+        """
+        Profile a query and return the plan with per-operator timings and row counts.
+
+        EXPLAIN ANALYZE takes no bound parameters, so the query is re-run with DuckDB's
+        profiler writing its plan tree to a temp file. Runs on a separate cursor, so the
+        pending result of this cursor stays readable.
+        """
+        profiler = self.conn.cursor()
+        fd, profile_path = tempfile.mkstemp(prefix='duckdb-profile-', suffix='.txt')
+        os.close(fd)
+        try:
+            profiler.execute("PRAGMA enable_profiling = 'query_tree'")
+            profiler.execute("PRAGMA profile_output = '{}'".format(profile_path.replace("'", "''")))
+            (profiler.execute(query, params) if params else profiler.execute(query)).fetchall()
+            with open(profile_path) as f:
+                return f.read()
+        except Exception as e:
+            logger.warning(f"Could not profile slow query: {e}")
+            return None
+        finally:
+            profiler.close()
+            os.remove(profile_path)
+
+    def execute(self, query, params=None):
+        """Run a query with its ? placeholders bound to params, timing it"""
+        started = time.perf_counter()
+        result = self.cursor.execute(query, params) if params else self.cursor.execute(query)
+        self._observe('bound' if params else 'direct', query, params, time.perf_counter() - started)
+        return result
+
+
+class CustomQueryError(ValueError):
+    """A custom SQL query that is not a single SELECT statement"""
+
+
+def validate_custom_query(conn, query):
+    """
+    Check with DuckDB's parser that a custom SQL query is one SELECT statement.
+
+    Returns:
+        str: The query without trailing semicolons, safe to wrap as a subquery
+
+    Raises:
+        CustomQueryError: For several statements, anything but SELECT, or a syntax error
+    """
+    query = query.strip().rstrip(';').strip()
+    parsed = json.loads(conn.execute("SELECT json_serialize_sql(?::VARCHAR)", [query]).fetchone()[0])
+    if parsed['error']:
+        raise CustomQueryError(f"Custom queries must be a single SELECT statement: {parsed['error_message']}")
+    if len(parsed['statements']) != 1:
+        raise CustomQueryError('Custom queries must be a single SELECT statement')
+    return query
+
+
+def estimate_table_bytes(conn, table, column_types):
+    """
+    Estimate the memory held by a table's values.
+
+    Fixed-width columns count their width per row, text columns their total UTF-8
+    length plus a 16 byte string header per value, read in one aggregate scan.
+    """
+    widths = {'BOOLEAN': 1, 'TINYINT': 1, 'SMALLINT': 2, 'INTEGER': 4, 'DATE': 4, 'FLOAT': 4}
+    aggregates = ['COUNT(*)']
+    fixed_width = 0
+    for column, column_type in column_types.items():
+        if column_type == 'VARCHAR':
+            aggregates.append('COALESCE(SUM(strlen("{}")), 0)'.format(column.replace('"', '""')))
+        else:
+            fixed_width += widths.get(column_type, 8)
+    row = conn.execute(f"SELECT {', '.join(aggregates)} FROM {table}").fetchone()
+    num_rows, text_bytes = row[0], sum(row[1:])
+    num_text_columns = len(aggregates) - 1
+    return num_rows * (fixed_width + 16 * num_text_columns) + text_bytes
+
+
+class Dataset:
+    """
+    Materialized events of one set of parquet files and time range.
+
+    A dataset is shared by every session that loaded the same files and range. refs
+    counts the sessions and in-flight requests holding it; only datasets nobody holds
+    are evicted. generation is unique across the datasets of the process and changes
+    on every append, so cached counts and responses keyed by it never mix datasets or
+    versions. Datasets of a shared database directory live in their own DuckDB file,
+    attached read-only under database (their table names are qualified with it).
+    """
+
+    def __init__(self, key, table, generation, paths, start_ns, end_ns):
+        self.key = key
+        self.table = table
+        self.generation = generation
+        self.paths = list(paths)
+        # Footer stats of the files, read when they were loaded (the event store may
+        # compact them away later)
+        self.file_stats = {}
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.columns = []
+        self.column_types = {}
+        self.column_stats = {}
+        self.ngram_indexes = {}
+        self.regex_engine = None
+        self.bytes = 0
+        self.database = None
+        self.file_path = None
+        # Shared lock on the file's readers lock while it is attached
+        self.reader_lock = None
+        self.append_counts = None
+        self.refs = 0
+        self.last_access = time.monotonic()
+
+    @property
+    def high_water_mark(self):
+        """Latest event timestamp (ns) of the dataset, or None if it is empty"""
+        return self.column_stats.get('timestamp', {}).get('max')
+
+    @property
+    def num_rows(self):
+        return self.column_stats.get('timestamp', {}).get('rows', 0)
+
+    def drop(self, conn):
+        """Drop the table, value tables and indexes of the dataset"""
+        conn.execute(f"DROP TABLE IF EXISTS {self.table}")
+        for index in self.ngram_indexes.values():
+            index.drop(conn)
+        drop_column_stats(conn, self.column_stats)
+
+    def stats(self):
+        return {
+            'table': self.table,
+            'generation': self.generation,
+            'files': len(self.paths),
+            'rows': self.num_rows,
+            'bytes': self.bytes,
+            'refs': self.refs,
+            'idleSeconds': round(time.monotonic() - self.last_access, 1)
+        }
+
+
+def materialize_events(conn, dataset):
+    """
+    Read the events of a dataset's parquet files and time range into its table, sorted
+    by timestamp, and compute its column statistics and n-gram indexes.
+    """
+    table = dataset.table
+    started = time.monotonic()
+    conn.execute(f"""
+        CREATE TABLE {table} AS
+        SELECT * FROM {parquet_read_expression(dataset.paths)}
+        WHERE timestamp >= {dataset.start_ns} AND timestamp <= {dataset.end_ns}
+        ORDER BY timestamp
+    """)
+    num_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    ROWS_SCANNED.inc(num_rows, operation='load')
+    column_types = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {table}").fetchall()}
+    logger.info(
+        f"Loaded {num_rows} events from {len(dataset.paths)} parquet files into {table} "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+
+    dataset.columns = list(column_types)
+    dataset.column_types = column_types
+    dataset.file_stats = parquet_file_stats(dataset.paths)
+    dataset.bytes = estimate_table_bytes(conn, table, column_types)
+
+    # Null counts, distinct counts, top values and value tables for /api/columns
+    dataset.column_stats = compute_column_stats(conn, table, column_types)
+
+    # Substring search indexes over the high-cardinality text columns
+    dataset.ngram_indexes = {
+        column: NgramIndex.build(conn, table, column)
+        for column in NGRAM_INDEX_COLUMNS if column_types.get(column) == 'VARCHAR'
+    }
+
+
+def deduplication_key(column_types, alias):
+    """
+    SQL expression identifying an event of a table across re-deliveries, or None if the
+    table has no identifying columns.
+
+    Events are identified by DEDUPLICATION_COLUMN; events where it is NULL by
+    FALLBACK_DEDUPLICATION_COLUMN and their timestamp. The key is NULL only for events
+    lacking both.
+    """
+    parts = []
+    if DEDUPLICATION_COLUMN in column_types:
+        parts.append(f'CAST({alias}."{DEDUPLICATION_COLUMN}" AS VARCHAR)')
+    if FALLBACK_DEDUPLICATION_COLUMN in column_types:
+        parts.append(
+            f"'{FALLBACK_DEDUPLICATION_COLUMN}:' || CAST({alias}.\"{FALLBACK_DEDUPLICATION_COLUMN}\" AS VARCHAR) "
+            f"|| '@' || CAST({alias}.timestamp AS VARCHAR)"
+        )
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else f"COALESCE({', '.join(parts)})"
+
+
+def append_events(conn, dataset, paths):
+    """
+    Append the events of newly fetched parquet files to a dataset's table.
+
+    The new events are staged in a temp table, deduplicated (see deduplication_key())
+    among themselves and against the loaded events from the staged time window on
+    (a re-delivered event keeps its timestamp), and inserted in timestamp order.
+    Column statistics and n-gram indexes are updated from the staged events only,
+    so the cost follows the size of the delta rather than of the loaded range.
+
+    The appended events go after the loaded ones, so the table is no longer sorted by
+    timestamp as a whole: consumers needing timestamp order must ORDER BY it.
+
+    Returns:
+        dict: {'fetched', 'appended', 'duplicates'} event counts
+    """
+    table = dataset.table
+    start_ns, end_ns = dataset.start_ns, dataset.end_ns
+    # Temp tables cannot be qualified with the dataset's database
+    staging_name = table.split('.')[-1]
+    candidates_table = f"{staging_name}__delta_candidates"
+    delta_table = f"{staging_name}__delta"
+    started = time.monotonic()
+
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {candidates_table} AS
+        SELECT * FROM {parquet_read_expression(list(paths))}
+        WHERE timestamp >= {start_ns} AND timestamp <= {end_ns}
+    """)
+    fetched, window_start = conn.execute(
+        f"SELECT COUNT(*), MIN(timestamp) FROM {candidates_table}"
+    ).fetchone()
+    ROWS_SCANNED.inc(fetched, operation='append')
+    dataset.file_stats.update(parquet_file_stats(paths))
+
+    num_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    deduplicate = ""
+    delta_key = deduplication_key(dataset.column_types, 'd')
+    if delta_key and fetched:
+        deduplicate = (
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} AS e "
+            f"WHERE e.timestamp >= {window_start} AND {deduplication_key(dataset.column_types, 'e')} = {delta_key}) "
+            f"QUALIFY {delta_key} IS NULL "
+            f"OR row_number() OVER (PARTITION BY {delta_key} ORDER BY timestamp) = 1"
+        )
+    # Row ids of the appended events in the loaded table (rows are never deleted, so ids are dense)
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {delta_table} AS
+        SELECT *, {num_rows} + row_number() OVER (ORDER BY timestamp) - 1 AS row_id
+        FROM (SELECT * FROM {candidates_table} AS d {deduplicate})
+    """)
+    conn.execute(f"DROP TABLE {candidates_table}")
+    appended = conn.execute(f"SELECT COUNT(*) FROM {delta_table}").fetchone()[0]
+
+    if appended:
+        conn.execute(
+            f"INSERT INTO {table} BY NAME SELECT * EXCLUDE (row_id) FROM {delta_table} ORDER BY row_id"
+        )
+        dataset.bytes += estimate_table_bytes(
+            conn, f"(SELECT * EXCLUDE (row_id) FROM {delta_table})", dataset.column_types
+        )
+        dataset.column_stats = merge_column_stats(conn, delta_table, dataset.column_stats)
+        dataset.ngram_indexes = {
+            column: index.extend(conn, delta_table)
+            for column, index in dataset.ngram_indexes.items()
+        }
+    conn.execute(f"DROP TABLE {delta_table}")
+
+    dataset.paths = sorted(set(dataset.paths) | set(paths))
+    dataset.key = EventEngine.dataset_key(dataset.paths, start_ns, end_ns)
+    logger.info(
+        f"Appended {appended} of {fetched} events from {len(paths)} parquet files to {table} "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return {'fetched': fetched, 'appended': appended, 'duplicates': fetched - appended}
+
+
+def save_dataset(conn, dataset):
+    """Store what open_dataset() needs to restore a dataset (besides its tables) in a metadata table"""
+    metadata = {
+        'paths': dataset.paths,
+        'fileStats': dataset.file_stats,
+        'startNs': dataset.start_ns,
+        'endNs': dataset.end_ns,
+        'columnTypes': dataset.column_types,
+        'columnStats': dataset.column_stats,
+        'ngramIndexes': {column: index.rows_table for column, index in dataset.ngram_indexes.items()},
+        'bytes': dataset.bytes,
+        'appendCounts': dataset.append_counts
+    }
+    for index in dataset.ngram_indexes.values():
+        index.save(conn)
+    conn.execute(f"CREATE OR REPLACE TABLE {DATASET_METADATA_TABLE} (metadata VARCHAR)")
+    conn.execute(f"INSERT INTO {DATASET_METADATA_TABLE} VALUES (?)", [json.dumps(metadata, default=str)])
+
+
+def open_dataset(conn, database=None):
+    """
+    Restore a dataset stored with save_dataset().
+
+    Args:
+        conn: Connection the dataset's database is attached to (or opened with)
+        database: Name the database is attached under, None for the connection's own
+
+    Returns:
+        Dataset: With table, value table and index names qualified with the database
+    """
+    prefix = f"{database}." if database else ''
+    metadata = json.loads(conn.execute(f"SELECT metadata FROM {prefix}{DATASET_METADATA_TABLE}").fetchone()[0])
+    key = EventEngine.dataset_key(metadata['paths'], metadata['startNs'], metadata['endNs'])
+    dataset = Dataset(key, f"{prefix}events", 0, metadata['paths'], metadata['startNs'], metadata['endNs'])
+    dataset.database = database
+    # Files written before stats were recorded have none
+    dataset.file_stats = metadata.get('fileStats', {})
+    dataset.column_types = metadata['columnTypes']
+    dataset.columns = list(dataset.column_types)
+    dataset.column_stats = {
+        column: {**stats, 'valueTable': f"{prefix}{stats['valueTable']}" if stats['valueTable'] else None}
+        for column, stats in metadata['columnStats'].items()
+    }
+    dataset.ngram_indexes = {
+        column: NgramIndex.open(conn, column, f"{prefix}{rows_table}")
+        for column, rows_table in metadata['ngramIndexes'].items()
+    }
+    dataset.bytes = metadata['bytes']
+    dataset.append_counts = metadata['appendCounts']
+    return dataset
+
+
+class EventEngine:
+    """
+    Long-lived DuckDB database holding loaded events as native tables.
+
+    Every distinct set of parquet files and time range is read once into a dataset
+    table sorted by timestamp, shared by all sessions that load it. Requests query it
+    through their own cursor, so worker threads can run concurrently against the
+    shared database. Datasets are reference counted; unreferenced ones are dropped
+    once idle for ttl_seconds, or least recently used first while the datasets
+    together exceed memory_budget bytes.
+
+    With a database_dir, datasets are shared between worker processes instead: each
+    one is built once (under a file lock) into its own DuckDB file, which every worker
+    attaches read-only. Appending events writes a new file for the extended file list,
+    so files are never modified while other workers read them.
+    """
+
+    def __init__(self, database=':memory:', ttl_seconds=DATASET_TTL_SECONDS,
+                 memory_budget=DATASET_MEMORY_BUDGET_BYTES, database_dir=ENGINE_DATABASE_DIR):
+        self.conn = configure_connection(duckdb.connect(database))
+        # Serializes loads and appends (writes on self.conn)
+        self.lock = threading.RLock()
+        # Guards the dataset registry and reference counts
+        self.registry_lock = threading.RLock()
+        self.ttl_seconds = ttl_seconds
+        self.memory_budget = memory_budget
+        self.database_dir = database_dir or None
+        if self.database_dir:
+            os.makedirs(self.database_dir, exist_ok=True)
+        self.generation = 0
+        # Datasets by table name
+        self.datasets = {}
+        self.cursor_pool = []
+        self.pool_lock = threading.Lock()
+        self.slow_queries = SlowQueryLog()
+        self.metrics = {'loads': 0, 'reuses': 0, 'evictions': 0}
+
+    @staticmethod
+    def dataset_key(paths, start_ns, end_ns):
+        return (tuple(sorted(paths)), start_ns, end_ns)
+
+    def acquire(self, paths, start_ns, end_ns):
+        """
+        Return the dataset of the given parquet files and time range, holding a reference.
+
+        The events are materialized the first time the files and range are requested;
+        later requests (from any session) reuse the same dataset. Release the reference
+        with release().
+
+        Returns:
+            Dataset: The dataset, with refs incremented
+        """
+        key = self.dataset_key(paths, start_ns, end_ns)
+        dataset = self._retain_key(key)
+        if dataset is None:
+            # Loads are serialized, so concurrent sessions requesting the same range load it once
+            with self.lock:
+                dataset = self._retain_key(key)
+                if dataset is None:
+                    if self.database_dir:
+                        dataset = self._attach(key, lambda conn, dataset: materialize_events(conn, dataset))
+                    else:
+                        self.generation += 1
+                        dataset = Dataset(key, f"events_{self.generation}", 0, key[0], start_ns, end_ns)
+                        materialize_events(self.conn, dataset)
+                    self._register(dataset)
+        self.evict()
+        return dataset
+
+    def _retain_key(self, key):
+        """Take a reference to the loaded dataset with this key, or return None"""
+        with self.registry_lock:
+            dataset = next((dataset for dataset in self.datasets.values() if dataset.key == key), None)
+            if dataset is not None:
+                self.metrics['reuses'] += 1
+                self.retain(dataset)
+            return dataset
+
+    def _register(self, dataset):
+        """Add a new dataset to the registry, holding a reference"""
+        self.generation += 1
+        dataset.generation = self.generation
+        # Regex matches are cached per dataset, indexed columns already know their distinct values
+        dataset.regex_engine = RegexEngine(
+            self.conn, dataset.table, {column: index.values for column, index in dataset.ngram_indexes.items()}
+        )
+        with self.registry_lock:
+            self.datasets[dataset.table] = dataset
+            self.metrics['loads'] += 1
+            self.retain(dataset)
+
+    def dataset_path(self, key):
+        """DuckDB file of a dataset in the shared database directory"""
+        digest = hashlib.sha256(json.dumps([DATASET_FORMAT_VERSION, key]).encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.database_dir, f"dataset-{digest}.duckdb")
+
+    def _attach(self, key, build, source=None):
+        """
+        Attach the shared database file of a dataset read-only, building it first if no
+        worker has yet.
+
+        Args:
+            key: Dataset key
+            build: Function (conn, dataset) filling the dataset's tables on a connection to
+                the new file
+            source: File of an existing dataset to start from (copied, then built upon)
+
+        Returns:
+            Dataset
+        """
+        path = self.dataset_path(key)
+        with file_lock(f"{path}.lock"):
+            if not os.path.exists(path):
+                temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                try:
+                    if source:
+                        shutil.copyfile(source, temp_path)
+                    conn = configure_connection(duckdb.connect(temp_path))
+                    try:
+                        if source:
+                            dataset = open_dataset(conn)
+                        else:
+                            dataset = Dataset(key, 'events', 0, key[0], key[1], key[2])
+                        build(conn, dataset)
+                        save_dataset(conn, dataset)
+                    finally:
+                        conn.close()
+                    os.replace(temp_path, path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+
+            # A fresh name per attach, so cursors never resolve tables of a detached file
+            self.generation += 1
+            database = f"dataset_{self.generation}"
+            reader_lock = hold_shared_lock(f"{path}.readers")
+            try:
+                self.conn.execute(f"ATTACH '{path}' AS {database} (READ_ONLY)")
+                dataset = open_dataset(self.conn, database)
+            except BaseException:
+                release_lock(reader_lock)
+                raise
+        dataset.file_path = path
+        dataset.reader_lock = reader_lock
+        logger.info(f"Attached dataset {path} as {database} ({dataset.num_rows} events)")
+        return dataset
+
+    def _remove_unused(self, path):
+        """Delete a shared dataset file unless a worker has it attached"""
+        with file_lock(f"{path}.lock"):
+            # Readers take their lock under the file lock, so none can appear meanwhile
+            if not is_unused(f"{path}.readers"):
+                return
+            for name in (path, f"{path}.readers"):
+                if os.path.exists(name):
+                    os.remove(name)
+        logger.info(f"Deleted unused dataset file {path}")
+
+    def retain(self, dataset):
+        """Take another reference to a dataset"""
+        with self.registry_lock:
+            dataset.refs += 1
+            dataset.last_access = time.monotonic()
+
+    def release(self, dataset):
+        """Drop a reference to a dataset, evicting datasets that are no longer needed"""
+        with self.registry_lock:
+            dataset.refs -= 1
+            dataset.last_access = time.monotonic()
+        self.evict()
+
+    def evict(self):
+        """
+        Drop unreferenced datasets that were idle for ttl_seconds, then the least
+        recently used unreferenced ones while all datasets exceed the memory budget.
+
+        Shared dataset files are detached, and deleted once no worker has them attached.
+        """
+        evicted = []
+        with self.registry_lock:
+            now = time.monotonic()
+            idle = sorted(
+                (dataset for dataset in self.datasets.values() if dataset.refs <= 0),
+                key=lambda dataset: dataset.last_access
+            )
+            total_bytes = sum(dataset.bytes for dataset in self.datasets.values())
+            for dataset in idle:
+                expired = now - dataset.last_access >= self.ttl_seconds
+                if not expired and total_bytes <= self.memory_budget:
+                    continue
+                # Unreferenced and out of the registry, nobody can take a reference anymore
+                del self.datasets[dataset.table]
+                total_bytes -= dataset.bytes
+                self.metrics['evictions'] += 1
+                evicted.append((dataset, 'idle' if expired else 'over memory budget'))
+            if total_bytes > self.memory_budget:
+                logger.warning(
+                    f"Datasets in use hold {total_bytes} bytes, above the {self.memory_budget} byte budget"
+                )
+
+        # Dropped on a cursor of their own, without waiting for a load in progress
+        for dataset, reason in evicted:
+            with self.cursor() as conn:
+                if dataset.database:
+                    conn.execute(f"DETACH {dataset.database}")
+                    release_lock(dataset.reader_lock)
+                    self._remove_unused(dataset.file_path)
+                else:
+                    dataset.drop(conn)
+            logger.info(f"Evicted dataset {dataset.table} ({dataset.bytes} bytes, {reason})")
+
+    def append(self, dataset, paths):
+        """
+        Append the events of newly fetched parquet files to a dataset (see append_events()).
+
+        In memory the dataset is extended in place, so every session holding it sees the
+        new events. A shared dataset file is never modified: the extended dataset is
+        written to the file of the extended file list (or attached if another worker
+        already wrote it) and returned as a new dataset.
+
+        Args:
+            dataset: Dataset to extend
+            paths: Parquet files holding the new events (files already loaded are excluded by the caller)
+
+        Returns:
+            tuple: (dataset holding the events, with a reference taken for the caller;
+                {'fetched', 'appended', 'duplicates'} event counts)
+        """
+        with self.lock:
+            if not dataset.database:
+                counts = append_events(self.conn, dataset, paths)
+                if counts['appended']:
+                    # Cached results and counts are keyed by generation, the table keeps its name
+                    self.generation += 1
+                    dataset.generation = self.generation
+                    dataset.regex_engine = RegexEngine(
+                        self.conn, dataset.table,
+                        {column: index.values for column, index in dataset.ngram_indexes.items()}
+                    )
+                self.retain(dataset)
+                return dataset, counts
+
+            key = self.dataset_key(sorted(set(dataset.paths) | set(paths)), dataset.start_ns, dataset.end_ns)
+            extended = self._retain_key(key)
+            if extended is None:
+                def build(conn, extended):
+                    extended.append_counts = append_events(conn, extended, paths)
+                extended = self._attach(key, build, source=dataset.file_path)
+                self._register(extended)
+            return extended, extended.append_counts
+
+    @contextmanager
+    def cursor(self, timeout=QUERY_TIMEOUT_SECONDS):
+        """
+        Yield a cursor on the shared database.
+
+        Cursors are pooled and returned to the pool when the block exits (closed if the
+        pool is full). Statements still running timeout seconds after the block started
+        are interrupted and raise QueryTimeout; the deadline covers the whole block,
+        since rows are computed as they are fetched.
+        """
+        with self.pool_lock:
+            cursor = self.cursor_pool.pop() if self.cursor_pool else None
+        if cursor is None:
+            cursor = TimedCursor(self.conn, slow_queries=self.slow_queries)
+
+        failed = False
+        try:
+            with watchdog.deadline(cursor.cursor, timeout):
+                yield cursor
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self.pool_lock:
+                pooled = not failed and len(self.cursor_pool) < CURSOR_POOL_SIZE
+                if pooled:
+                    self.cursor_pool.append(cursor)
+            if not pooled:
+                cursor.close()
+
+    @contextmanager
+    def sandbox(self, dataset, timeout=QUERY_TIMEOUT_SECONDS):
+        """
+        Yield a cursor for custom SQL on a throwaway connection where a dataset is the
+        table events.
+
+        Custom SQL never runs on the engine's connection, which holds the tables every
+        session shares. A shared dataset file is attached read-only; an in-memory
+        dataset is copied in (custom queries pay for a copy of the loaded range).
+        External access is then disabled and the configuration locked, so the query
+        can't read files or attach databases either. The timeout works as in cursor().
+        """
+        conn = configure_connection(duckdb.connect(':memory:'))
+        try:
+            if dataset.database:
+                conn.execute("ATTACH '{}' AS dataset (READ_ONLY)".format(dataset.file_path.replace("'", "''")))
+                conn.execute("CREATE VIEW events AS SELECT * FROM dataset.events")
+            else:
+                with self.cursor(timeout) as source:
+                    events = source.execute(f"SELECT * FROM {dataset.table}").arrow()
+                conn.register('dataset_events', events)
+                conn.execute("CREATE TABLE events AS SELECT * FROM dataset_events")
+                conn.unregister('dataset_events')
+                del events
+            conn.execute("SET enable_external_access = false")
+            conn.execute("SET lock_configuration = true")
+            cursor = TimedCursor(conn, slow_queries=self.slow_queries)
+            with watchdog.deadline(cursor.cursor, timeout):
+                yield cursor
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Return load/reuse/eviction counters and the size and references of every dataset"""
+        with self.registry_lock:
+            datasets = [dataset.stats() for dataset in self.datasets.values()]
+            return {
+                **self.metrics,
+                'datasets': datasets,
+                'bytes': sum(dataset['bytes'] for dataset in datasets),
+                'memoryBudget': self.memory_budget,
+                'ttlSeconds': self.ttl_seconds,
+                'databaseDir': self.database_dir
+            }
@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import duckdb
+
+from governor import configure_connection
+from file_lock import file_lock
+from metrics import ROWS_SCANNED
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# STORE SETTINGS
+# ============================================================================
+
+EVENT_STORE_DIR = os.environ.get(
+    'EVENT_STORE_DIR',
+    os.path.join(tempfile.gettempdir(), 'workspace_audit_events', 'store')
+)
+# Rows per parquet row group; smaller groups let timestamp filters skip more of a day
+EVENT_STORE_ROW_GROUP_SIZE = int(os.environ.get('EVENT_STORE_ROW_GROUP_SIZE', '65536'))
+# Partitions holding more files than this are rewritten into a single sorted file
+EVENT_STORE_COMPACT_FILES = int(os.environ.get('EVENT_STORE_COMPACT_FILES', '8'))
+# Downloaded files staged in memory per ingest batch
+EVENT_STORE_INGEST_BATCH_FILES = int(os.environ.get('EVENT_STORE_INGEST_BATCH_FILES', '16'))
+# Seconds compacted files are kept at least, so loads that listed them before the
+# compaction can still read them
+EVENT_STORE_RETIRED_GRACE_SECONDS = int(os.environ.get('EVENT_STORE_RETIRED_GRACE_SECONDS', '3600'))
+
+EVENT_STORE_COMPRESSION = 'zstd'
+MANIFEST_FILENAME = 'manifest.json'
+LOCK_FILENAME = '.lock'
+PARTITION_PREFIX = 'date='
+# Marker next to a file a compaction replaced (part-x.parquet.retired)
+RETIRED_SUFFIX = '.retired'
+
+# Partition date of an epoch-nanosecond timestamp column (UTC)
+PARTITION_DATE_SQL = "strftime(epoch_ms(timestamp // 1000000), '%Y-%m-%d')"
+
+
+# ============================================================================
+# PARTITIONED EVENT STORE
+# ============================================================================
+
+def partition_date(timestamp_ns):
+    """Return the partition date (YYYY-MM-DD, UTC) of an epoch-nanosecond timestamp"""
+    moment = datetime(1970, 1, 1) + timedelta(seconds=int(timestamp_ns) // 1_000_000_000)
+    return moment.strftime('%Y-%m-%d')
+
+
+def sql_path_list(paths):
+    """Render file paths as a DuckDB list literal"""
+    return '[' + ', '.join("'{}'".format(path.replace("'", "''")) for path in paths) + ']'
+
+
+class EventStore:
+    """
+    Local event store partitioned by day, Hive style (date=YYYY-MM-DD/part-*.parquet).
+
+    Downloaded files are ingested once: their events are split by UTC day and written
+    sorted by timestamp, zstd compressed and in row groups of row_group_size, so the
+    per-row-group timestamp statistics let DuckDB skip most of a day for narrow ranges.
+    A manifest records which downloaded objects were ingested. Partitions that collect
+    more than compact_files files are rewritten into one. Readers only list the
+    partitions inside the requested range.
+
+    Datasets and session states keep the paths of the files they were loaded from, so a
+    compaction does not delete the files it replaced: it marks them retired, which
+    hides them from the listings. remove_retired() deletes them once nothing
+    references them anymore.
+
+    Worker processes share the store: ingests and compactions hold an exclusive lock on
+    the store's lock file (re-reading the manifest under it, so a file another worker
+    ingested meanwhile is skipped), readers listing partitions a shared one.
+    """
+
+    def __init__(self, root=EVENT_STORE_DIR, row_group_size=EVENT_STORE_ROW_GROUP_SIZE,
+                 compact_files=EVENT_STORE_COMPACT_FILES):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.compact_files = compact_files
+        self.manifest_path = os.path.join(root, MANIFEST_FILENAME)
+        self.lock_path = os.path.join(root, LOCK_FILENAME)
+        self.conn = configure_connection(duckdb.connect())
+        self.lock = threading.RLock()
+        self.metrics = {
+            'sourcesIngested': 0,
+            'rowsIngested': 0,
+            'filesWritten': 0,
+            'compactions': 0,
+            'retiredRemoved': 0
+        }
+        os.makedirs(root, exist_ok=True)
+        self.sources = self._load_manifest()
+
+    def _load_manifest(self):
+        """Load the manifest of ingested source objects"""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable event store manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self):
+        """Write the manifest atomically through a temp file and rename"""
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix='.manifest-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.sources, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def partition_dir(self, date):
+        return os.path.join(self.root, f"{PARTITION_PREFIX}{date}")
+
+    def partition_files(self, date, retired=False):
+        """Data files of a partition, sorted by name (the retired ones instead if retired)"""
+        try:
+            names = set(os.listdir(self.partition_dir(date)))
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.partition_dir(date), name)
+            for name in sorted(names)
+            if name.startswith('part-') and name.endswith('.parquet')
+            and (name + RETIRED_SUFFIX in names) == retired
+        ]
+
+    def partitions(self):
+        """Dates of all partitions, sorted"""
+        return sorted(
+            name[len(PARTITION_PREFIX):] for name in os.listdir(self.root)
+            if name.startswith(PARTITION_PREFIX)
+        )
+
+    def has_source(self, key):
+        """Whether the downloaded object with this cache key was already ingested"""
+        with self.lock:
+            return key in self.sources
+
+    def ingest(self, sources):
+        """
+        Rewrite downloaded parquet files into the day partitions.
+
+        Args:
+            sources: List of (object key, local path) of downloaded files; objects that
+                were already ingested are skipped
+
+        Returns:
+            list: Dates of the partitions that received events
+        """
+        with self.lock, file_lock(self.lock_path):
+            self.sources = self._load_manifest()
+            pending = [(key, path) for key, path in sources if key not in self.sources]
+            touched = set()
+            for idx in range(0, len(pending), EVENT_STORE_INGEST_BATCH_FILES):
+                batch = pending[idx:idx + EVENT_STORE_INGEST_BATCH_FILES]
+                touched.update(self._ingest_batch(batch))
+            for date in sorted(touched):
+                if len(self.partition_files(date)) > self.compact_files:
+                    self._compact(date)
+            return sorted(touched)
+
+    def _ingest_batch(self, batch):
+        """Stage a batch of downloaded files and write one sorted file per day"""
+        started = time.monotonic()
+        batch_id = uuid.uuid4().hex
+        staging_table = f"ingest_{batch_id}"
+        self.conn.execute(f"""
+            CREATE TEMP TABLE {staging_table} AS
+            SELECT *, {PARTITION_DATE_SQL} AS partition_date
+            FROM read_parquet({sql_path_list([path for _, path in batch])}, hive_partitioning = false)
+        """)
+        try:
+            counts = self.conn.execute(
+                f"SELECT partition_date, COUNT(*) FROM {staging_table} GROUP BY ALL ORDER BY partition_date"
+            ).fetchall()
+            for date, _ in counts:
+                os.makedirs(self.partition_dir(date), exist_ok=True)
+                self._write_sorted(
+                    f"SELECT * EXCLUDE (partition_date) FROM {staging_table} WHERE partition_date = ?",
+                    [date],
+                    os.path.join(self.partition_dir(date), f"part-{batch_id}.parquet")
+                )
+        finally:
+            self.conn.execute(f"DROP TABLE IF EXISTS {staging_table}")
+
+        num_rows = sum(rows for _, rows in counts)
+        ROWS_SCANNED.inc(num_rows, operation='ingest')
+        now = time.time()
+        for key, _ in batch:
+            self.sources[key] = {'ingested': now}
+        self._save_manifest()
+        self.metrics['sourcesIngested'] += len(batch)
+        self.metrics['rowsIngested'] += num_rows
+        self.metrics['filesWritten'] += len(counts)
+        logger.info(
+            f"Ingested {num_rows} events from {len(batch)} files into {len(counts)} partitions "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return [date for date, _ in counts]
+
+    def _write_sorted(self, query, params, path):
+        """Write a query's rows sorted by timestamp to a parquet file, renamed into place when complete"""
+        directory, name = os.path.split(path)
+        temp_path = os.path.join(directory, f".{name}.tmp")
+        self.conn.execute(f"""
+            COPY ({query} ORDER BY timestamp) TO '{temp_path}'
+            (FORMAT PARQUET, COMPRESSION {EVENT_STORE_COMPRESSION}, ROW_GROUP_SIZE {self.row_group_size})
+        """, params)
+        os.replace(temp_path, path)
+
+    def compact(self, date):
+        """Rewrite all files of a partition into a single sorted file"""
+        with self.lock, file_lock(self.lock_path):
+            self._compact(date)
+
+    def _compact(self, date):
+        """Compact a partition, holding the store locks"""
+        files = self.partition_files(date)
+        if len(files) < 2:
+            return
+        started = time.monotonic()
+        self._write_sorted(
+            f"SELECT * FROM read_parquet({sql_path_list(files)}, hive_partitioning = false)",
+            [],
+            os.path.join(self.partition_dir(date), f"part-{uuid.uuid4().hex}.parquet")
+        )
+        # Datasets may still point at the replaced files, see remove_retired()
+        for path in files:
+            open(path + RETIRED_SUFFIX, 'w').close()
+        self.metrics['compactions'] += 1
+        logger.info(f"Compacted {len(files)} files of partition {date} in {time.monotonic() - started:.2f}s")
+
+    def remove_retired(self, referenced, grace_seconds=EVENT_STORE_RETIRED_GRACE_SECONDS):
+        """
+        Delete the files compactions replaced, unless a dataset or session still references
+        them or they were retired less than grace_seconds ago.
+
+        Args:
+            referenced: Paths of the files loaded datasets and sessions point at
+
+        Returns:
+            int: Number of files deleted
+        """
+        removed = 0
+        now = time.time()
+        with self.lock, file_lock(self.lock_path):
+            for date in self.partitions():
+                for path in self.partition_files(date, retired=True):
+                    marker = path + RETIRED_SUFFIX
+                    if path in referenced or now - os.path.getmtime(marker) < grace_seconds:
+                        continue
+                    os.remove(path)
+                    os.remove(marker)
+                    removed += 1
+            self.metrics['retiredRemoved'] += removed
+        if removed:
+            logger.info(f"Deleted {removed} compacted event store files")
+        return removed
+
+    def partition_paths(self, start_ns, end_ns):
+        """
+        Return the data files of the partitions overlapping a time range.
+
+        Args:
+            start_ns: Start of the range (epoch ns)
+            end_ns: End of the range (epoch ns, inclusive)
+
+        Returns:
+            list: Parquet file paths, in partition order
+        """
+        first, last = partition_date(start_ns), partition_date(end_ns)
+        with self.lock, file_lock(self.lock_path, shared=True):
+            return [
+                path
+                for date in self.partitions() if first <= date <= last
+                for path in self.partition_files(date)
+            ]
+
+    def stats(self):
+        """Return partition, file and size counts and ingest counters"""
+        with self.lock:
+            dates = self.partitions()
+            files = [path for date in dates for path in self.partition_files(date)]
+            retired = [path for date in dates for path in self.partition_files(date, retired=True)]
+            return {
+                **self.metrics,
+                'sources': len(self.sources),
+                'partitions': len(dates),
+                'files': len(files),
+                'bytes': sum(os.path.getsize(path) for path in files),
+                'retiredFiles': len(retired),
+                'retiredBytes': sum(os.path.getsize(path) for path in retired)
+            }
@@ -0,0 +1,114 @@
+import logging
+
+from column_stats import pandas_dtypes
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of values returned per column
+FACET_VALUE_LIMIT = 1000
+
+# ============================================================================
+# FACETS
+# ============================================================================
+
+def build_facet_query(table, columns, column_conditions, limit=FACET_VALUE_LIMIT):
+    """
+    Build a single query returning the values and event counts of every column, where
+    each column is filtered by the conditions of all OTHER columns.
+
+    Every row gets a bitmask with one bit per filtered column that it fails. A row
+    counts towards a column's values if it fails no filter, or only that column's own
+    filter. Rows failing two or more filters never count, so they are dropped before
+    one GROUPING SETS aggregation computes (mask, value) counts for all columns at once.
+
+    Args:
+        table: Table to read
+        columns: Columns to compute values for
+        column_conditions: Dict of column name -> SQL condition (placeholders of each
+            condition appear once, in the order of the dict)
+        limit: Maximum number of values per column
+
+    Returns:
+        str: Query returning (facet_column, value, events) rows sorted by column and value,
+        values as VARCHAR but in the order of the column's own type (numbers numerically)
+    """
+    filtered_columns = list(column_conditions.keys())
+    bits = {column: 1 << idx for idx, column in enumerate(filtered_columns)}
+
+    if filtered_columns:
+        mask_expr = ' + '.join(
+            f"(CASE WHEN COALESCE({column_conditions[column]}, FALSE) THEN 0 ELSE {bits[column]} END)"
+            for column in filtered_columns
+        )
+    else:
+        mask_expr = '0'
+
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    grouping_sets = ', '.join(f'(facet_mask, "{column}")' for column in columns)
+
+    # GROUPING(c1, ..., cn) sets the bit of every column that is NOT part of the grouping set
+    all_grouping_bits = (1 << len(columns)) - 1
+    facet_selects = []
+    for idx, column in enumerate(columns):
+        grouping_id = all_grouping_bits ^ (1 << (len(columns) - 1 - idx))
+        own_bit = bits.get(column, 0)
+        facet_selects.append(f"""
+            (SELECT '{column}' AS facet_column, CAST("{column}" AS VARCHAR) AS value, SUM(events) AS events,
+                    ROW_NUMBER() OVER (ORDER BY "{column}") AS position
+             FROM grouped
+             WHERE grouping_id = {grouping_id}
+               AND "{column}" IS NOT NULL
+               AND (facet_mask & ~{own_bit}) = 0
+             GROUP BY "{column}"
+             ORDER BY "{column}"
+             LIMIT {limit})""")
+
+    return f"""
+        WITH flagged AS (
+            SELECT {column_list}, {mask_expr} AS facet_mask
+            FROM {table}
+        ),
+        grouped AS MATERIALIZED (
+            SELECT GROUPING({column_list}) AS grouping_id, facet_mask, {column_list}, COUNT(*) AS events
+            FROM flagged
+            WHERE bit_count(facet_mask) <= 1
+            GROUP BY GROUPING SETS ({grouping_sets})
+        ),
+        facets AS ({' UNION ALL '.join(facet_selects)}
+        )
+        SELECT facet_column, value, events
+        FROM facets
+        ORDER BY facet_column, position
+    """
+
+
+def compute_facets(conn, table, column_conditions, params=(), exclude_columns=(), limit=FACET_VALUE_LIMIT):
+    """
+    Compute the available values and event counts of every column for cascading filters.
+
+    Args:
+        conn: Pooled engine cursor (see engine.TimedCursor)
+        table: Table to read
+        column_conditions: Dict of column name -> SQL condition with ? placeholders
+        params: Parameters of the conditions, in the order of column_conditions
+        exclude_columns: Columns to leave out of the result
+        limit: Maximum number of values per column
+
+    Returns:
+        dict: Column name -> {'type', 'values', 'counts'}
+    """
+    dtypes = pandas_dtypes(conn, table)
+    columns = [col for col in dtypes if col not in exclude_columns]
+
+    facets = {col: {'type': dtypes[col], 'values': [], 'counts': []} for col in columns}
+    if not columns:
+        return facets
+
+    query = build_facet_query(table, columns, column_conditions, limit)
+    logger.debug(f"Facet query: {' '.join(query.split())[:500]}")
+
+    for column, value, events in conn.execute(query, params).fetchall():
+        facets[column]['values'].append(value)
+        facets[column]['counts'].append(int(events))
+
+    return facets
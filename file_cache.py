@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pyarrow.parquet as pq
+
+from downloader import download_files
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CACHE SETTINGS
+# ============================================================================
+
+PARQUET_CACHE_DIR = os.environ.get(
+    'PARQUET_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'workspace_audit_events', 'cache')
+)
+# Total size of cached parquet files before least recently used files are evicted
+PARQUET_CACHE_MAX_BYTES = int(os.environ.get('PARQUET_CACHE_MAX_BYTES', str(10 * 1024 ** 3)))
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+# ============================================================================
+# PARQUET FILE CACHE
+# ============================================================================
+
+def cache_key_for_url(url):
+    """
+    Build the cache key for a download URL.
+
+    Presigned URLs carry a fresh signature in the query string on every request, so the
+    key only uses the host and path, which identify the underlying object.
+    """
+    parts = urlsplit(url)
+    return hashlib.sha256(f"{parts.netloc}{parts.path}".encode('utf-8')).hexdigest()[:32]
+
+
+def read_timestamp_span(path):
+    """Read the (min, max) event timestamp of a parquet file from its row group statistics"""
+    metadata = pq.ParquetFile(path).metadata
+    try:
+        column_idx = metadata.schema.names.index('timestamp')
+    except ValueError:
+        return None, None, metadata.num_rows
+
+    span_min, span_max = None, None
+    for row_group_idx in range(metadata.num_row_groups):
+        stats = metadata.row_group(row_group_idx).column(column_idx).statistics
+        if stats is None or not stats.has_min_max:
+            return None, None, metadata.num_rows
+        span_min = stats.min if span_min is None else min(span_min, stats.min)
+        span_max = stats.max if span_max is None else max(span_max, stats.max)
+    return span_min, span_max, metadata.num_rows
+
+
+class ParquetFileCache:
+    """
+    On-disk cache of downloaded parquet files keyed by object identity.
+
+    A manifest records the size, row count, timestamp span and last access time of
+    every cached file. Files are evicted least recently used first once the cache
+    grows past max_bytes. A file requested while another request is downloading it is
+    not downloaded again; the second request waits for the first download.
+    """
+
+    def __init__(self, cache_dir=PARQUET_CACHE_DIR, max_bytes=PARQUET_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+        self.lock = threading.RLock()
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytesHit': 0,
+            'bytesDownloaded': 0,
+            'bytesEvicted': 0,
+            'coalesced': 0
+        }
+        # Keys being downloaded -> event set once the download finished
+        self.in_flight = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = self._load_manifest()
+
+    def _load_manifest(self):
+        """Load the manifest, dropping entries whose file no longer exists"""
+        try:
+            with open(self.manifest_path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache manifest {self.manifest_path}: {e}")
+            return {}
+        return {key: entry for key, entry in entries.items() if os.path.exists(entry['path'])}
+
+    def _save_manifest(self):
+        """Write the manifest atomically through a temp file and rename"""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.manifest-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def path_for_key(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def lookup(self, url):
+        """Return the cached path for a URL and mark it as recently used, or None on a miss"""
+        key = cache_key_for_url(url)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not os.path.exists(entry['path']):
+                self.entries.pop(key, None)
+                return None
+            entry['lastAccess'] = time.time()
+            return entry['path']
+
+    def add(self, url, path):
+        """Record a downloaded file in the manifest"""
+        key = cache_key_for_url(url)
+        span_min, span_max, num_rows = read_timestamp_span(path)
+        parts = urlsplit(url)
+        with self.lock:
+            self.entries[key] = {
+                'path': path,
+                'object': f"{parts.netloc}{parts.path}",
+                'size': os.path.getsize(path),
+                'rows': num_rows,
+                'minTimestamp': span_min,
+                'maxTimestamp': span_max,
+                'created': time.time(),
+                'lastAccess': time.time()
+            }
+
+    def fetch(self, urls, **kwargs):
+        """
+        Return local paths for the given download URLs, downloading only the files
+        that are not cached yet.
+
+        Args:
+            urls: List of download URLs
+            **kwargs: Additional arguments to pass to download_files
+
+        Returns:
+            list: Local paths in the order of urls (None for files that failed to download)
+        """
+        paths = [None] * len(urls)
+        downloads = []
+        missing_idx = []
+        waiting = []
+
+        with self.lock:
+            for idx, url in enumerate(urls):
+                key = cache_key_for_url(url)
+                cached_path = self.lookup(url)
+                if cached_path:
+                    paths[idx] = cached_path
+                    self.metrics['hits'] += 1
+                    self.metrics['bytesHit'] += self.entries[key]['size']
+                elif key in self.in_flight:
+                    # Another request is downloading the same object
+                    waiting.append((idx, url, self.in_flight[key]))
+                    self.metrics['coalesced'] += 1
+                else:
+                    self.in_flight[key] = threading.Event()
+                    downloads.append((url, self.path_for_key(key)))
+                    missing_idx.append(idx)
+                    self.metrics['misses'] += 1
+
+        logger.info(
+            f"Parquet cache: {len(urls) - len(downloads) - len(waiting)} hits, {len(downloads)} misses, "
+            f"{len(waiting)} already downloading"
+        )
+
+        if downloads:
+            try:
+                results, summary = download_files(downloads, **kwargs)
+                with self.lock:
+                    for idx, (url, _), stats in zip(missing_idx, downloads, results):
+                        if stats:
+                            self.add(url, stats['path'])
+                            paths[idx] = stats['path']
+                    self.metrics['bytesDownloaded'] += summary['bytes']
+            finally:
+                with self.lock:
+                    for url, _ in downloads:
+                        self.in_flight.pop(cache_key_for_url(url)).set()
+
+        for idx, url, done in waiting:
+            done.wait()
+            # None if the other request's download failed
+            paths[idx] = self.lookup(url)
+
+        with self.lock:
+            self.evict(keep={cache_key_for_url(url) for url in urls})
+            self._save_manifest()
+
+        return paths
+
+    def evict(self, keep=()):
+        """Evict least recently used files until the cache fits in max_bytes, never evicting keys in keep"""
+        with self.lock:
+            total_bytes = sum(entry['size'] for entry in self.entries.values())
+            candidates = sorted(
+                (key for key in self.entries if key not in keep),
+                key=lambda key: self.entries[key]['lastAccess']
+            )
+            for key in candidates:
+                if total_bytes <= self.max_bytes:
+                    break
+                entry = self.entries.pop(key)
+                try:
+                    os.remove(entry['path'])
+                except FileNotFoundError:
+                    pass
+                total_bytes -= entry['size']
+                self.metrics['evictions'] += 1
+                self.metrics['bytesEvicted'] += entry['size']
+                logger.info(f"Evicted {entry['path']} ({entry['size']} bytes) from parquet cache")
+
+    def stats(self):
+        """Return cache size and hit/miss/eviction counters"""
+        with self.lock:
+            lookups = self.metrics['hits'] + self.metrics['misses']
+            return {
+                **self.metrics,
+                'files': len(self.entries),
+                'bytes': sum(entry['size'] for entry in self.entries.values()),
+                'maxBytes': self.max_bytes,
+                'hitRate': self.metrics['hits'] / lookups if lookups else None
+            }
@@ -0,0 +1,66 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+# ============================================================================
+# INTERPROCESS LOCKS
+# ============================================================================
+
+@contextmanager
+def file_lock(path, shared=False):
+    """
+    Hold an advisory lock on a lock file while the block runs.
+
+    Serializes work on files shared by several worker processes (the event store, the
+    dataset databases, the session state). Threads of one process each open their
+    own descriptor, so the lock also excludes threads of the same process.
+
+    Args:
+        path: Lock file, created if missing
+        shared: Take a shared (reader) lock instead of an exclusive one
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def hold_shared_lock(path):
+    """
+    Take a shared lock on a lock file and keep it until release_lock().
+
+    Marks a file as in use by this process for as long as the lock is held, see
+    is_unused().
+
+    Returns:
+        int: Descriptor holding the lock
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    return fd
+
+
+def release_lock(fd):
+    """Release a lock taken with hold_shared_lock()"""
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def is_unused(path):
+    """Whether no process (including this one) holds a shared lock on a lock file"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return True
+    finally:
+        os.close(fd)
@@ -0,0 +1,233 @@
+import json
+import logging
+
+from regex_engine import RegexError, merge_patterns
+
+logger = logging.getLogger(__name__)
+
+# Filter kinds in the order their predicates are emitted within a column
+FILTER_KINDS = ('exact', 'substring', 'regex')
+
+# Value lists up to this length are matched with list_contains(), longer ones with a semi-join
+VALUE_LIST_CONTAINS_LIMIT = 64
+
+# ============================================================================
+# FILTER COMPILER
+# ============================================================================
+
+class FilterError(ValueError):
+    """Raised for a filter payload that can't be compiled (unknown column, malformed values)"""
+
+
+def quote_identifier(column):
+    """Quote a column name for SQL"""
+    return '"{}"'.format(column.replace('"', '""'))
+
+
+def sql_string_literal(value):
+    """Render a string as a SQL string literal"""
+    return "'{}'".format(value.replace("'", "''"))
+
+
+class Predicate:
+    """
+    One leaf of the predicate tree: a single test on a column.
+
+    Exact matches take their whole value list as one LIST parameter and substring
+    terms one parameter each, so filter values never appear in the SQL text.
+    Substring terms resolved through an n-gram index are bound as the ids of the
+    matching values instead. The regex patterns of a column form one predicate: bound
+    as the list of matching distinct values when the regex engine resolved them,
+    otherwise a literal alternation (DuckDB only precompiles constant patterns).
+    """
+
+    def __init__(self, column, kind, value, column_type='VARCHAR', index=None, value_ids=None,
+                 matched_values=None):
+        self.column = column
+        self.kind = kind
+        self.value = value
+        self.column_type = column_type
+        self.index = index
+        self.value_ids = value_ids
+        self.matched_values = matched_values
+
+    def to_sql(self):
+        """
+        Returns:
+            tuple: (condition SQL with ? placeholders, list of parameters)
+        """
+        col = quote_identifier(self.column)
+        if self.column_type != 'VARCHAR':
+            col = f"CAST({col} AS VARCHAR)"
+
+        if self.kind == 'exact':
+            return f"list_contains(?, {col})", [list(self.value)]
+        if self.kind == 'substring' and self.index is not None:
+            return self.index.condition(), [self.value_ids]
+        if self.kind == 'substring':
+            return f"{col} LIKE ?", [f"%{self.value}%"]
+        if self.matched_values is not None:
+            if len(self.matched_values) <= VALUE_LIST_CONTAINS_LIMIT:
+                return f"list_contains(?, {col})", [self.matched_values]
+            return f"{col} IN (SELECT unnest(?))", [self.matched_values]
+        return f"regexp_matches({col}, {sql_string_literal(merge_patterns(self.value))})", []
+
+
+class ColumnFilter:
+    """OR-group of the predicates on one column"""
+
+    def __init__(self, column, predicates):
+        self.column = column
+        self.predicates = predicates
+
+    def to_sql(self):
+        conditions = []
+        params = []
+        for predicate in self.predicates:
+            condition, predicate_params = predicate.to_sql()
+            conditions.append(condition)
+            params.extend(predicate_params)
+        if len(conditions) == 1:
+            return conditions[0], params
+        return f"({' OR '.join(conditions)})", params
+
+
+class FilterTree:
+    """
+    Normalized filter payload: an AND of per-column OR-groups, columns sorted by name
+    and values deduplicated and sorted, so equal filters compile to equal SQL.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    @property
+    def columns(self):
+        return [group.column for group in self.groups]
+
+    @property
+    def signature(self):
+        """Canonical string of the full filter, values included"""
+        return json.dumps([
+            [group.column, [[predicate.kind, predicate.value] for predicate in group.predicates]]
+            for group in self.groups
+        ])
+
+    def conditions(self, exclude_column=None):
+        """
+        Build the WHERE conditions, one per filtered column (combine with AND).
+
+        Returns:
+            tuple: (list of condition SQL, list of parameters in placeholder order)
+        """
+        conditions = []
+        params = []
+        for group in self.groups:
+            if group.column == exclude_column:
+                continue
+            condition, group_params = group.to_sql()
+            conditions.append(condition)
+            params.extend(group_params)
+        return conditions, params
+
+    def column_conditions(self):
+        """
+        Build one condition per filtered column.
+
+        Returns:
+            tuple: (dict of column name -> condition SQL, list of parameters in the
+            order of the dict's conditions)
+        """
+        column_conditions = {}
+        params = []
+        for group in self.groups:
+            condition, group_params = group.to_sql()
+            column_conditions[group.column] = condition
+            params.extend(group_params)
+        return column_conditions, params
+
+    def where_clause(self):
+        """
+        Returns:
+            tuple: (' WHERE ...' or '', list of parameters)
+        """
+        conditions, params = self.conditions()
+        return (f" WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def normalize_values(column, values):
+    """Validate a filter value list and return its distinct string values, sorted"""
+    if isinstance(values, (str, bytes)) or not isinstance(values, (list, tuple)):
+        raise FilterError(f"Filter values for {column} must be a list")
+    normalized = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise FilterError(f"Unsupported filter value for {column}: {value!r}")
+        normalized.add(str(value))
+    return sorted(normalized)
+
+
+def compile_filters(filters, substring_filters, regex_filters, column_types=None, ngram_indexes=None,
+                    regex_engine=None):
+    """
+    Compile the exact, substring and regex filter payloads into a predicate tree.
+
+    Args:
+        filters: Dict of column name -> values to match exactly
+        substring_filters: Dict of column name -> substrings (LIKE '%term%')
+        regex_filters: Dict of column name -> regex patterns (leading '/' optional)
+        column_types: Dict of column name -> DuckDB type of the queried table; filters
+            on other columns are rejected (None skips the check)
+        ngram_indexes: Dict of column name -> NgramIndex used to resolve substring terms
+        regex_engine: RegexEngine resolving regex patterns to matching values
+
+    Returns:
+        FilterTree
+
+    Raises:
+        FilterError: For unknown columns or malformed values
+    """
+    payloads = dict(zip(FILTER_KINDS, (filters, substring_filters, regex_filters)))
+    for kind, payload in payloads.items():
+        if payload and not isinstance(payload, dict):
+            raise FilterError(f"{kind} filters must be an object of column -> values")
+
+    columns = set()
+    for payload in payloads.values():
+        columns.update(column for column, values in (payload or {}).items() if values)
+
+    groups = []
+    for column in sorted(columns):
+        if column_types is not None and column not in column_types:
+            raise FilterError(f"Unknown filter column: {column}")
+        column_type = column_types[column] if column_types is not None else 'VARCHAR'
+
+        predicates = []
+        exact_values = normalize_values(column, (payloads['exact'] or {}).get(column) or [])
+        if exact_values:
+            predicates.append(Predicate(column, 'exact', tuple(exact_values), column_type))
+        index = (ngram_indexes or {}).get(column)
+        for term in normalize_values(column, (payloads['substring'] or {}).get(column) or []):
+            value_ids = index.search(term) if index is not None else None
+            if value_ids is None:
+                predicates.append(Predicate(column, 'substring', term, column_type))
+            else:
+                predicates.append(Predicate(column, 'substring', term, column_type, index, value_ids))
+        # Extract the regex patterns (remove leading /)
+        patterns = sorted({
+            pattern[1:] if pattern.startswith('/') else pattern
+            for pattern in normalize_values(column, (payloads['regex'] or {}).get(column) or [])
+        })
+        if patterns:
+            try:
+                matched_values = regex_engine.match_values(column, patterns) if regex_engine else None
+            except RegexError as e:
+                raise FilterError(str(e))
+            predicates.append(Predicate(column, 'regex', tuple(patterns), column_type, matched_values=matched_values))
+
+        if predicates:
+            groups.append(ColumnFilter(column, predicates))
+
+    return FilterTree(groups)
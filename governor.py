@@ -0,0 +1,176 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import duckdb
+
+from metrics import QUERY_TIMEOUTS, RESULT_LIMIT_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# RESOURCE LIMITS
+# ============================================================================
+
+# DuckDB worker threads per connection (0 keeps DuckDB's default, one per core)
+DUCKDB_THREADS = int(os.environ.get('DUCKDB_THREADS', '0'))
+# Memory DuckDB may use per database instance before spilling to DUCKDB_TEMP_DIRECTORY,
+# e.g. 4GB (empty keeps DuckDB's default of 80% of the RAM)
+DUCKDB_MEMORY_LIMIT = os.environ.get('DUCKDB_MEMORY_LIMIT', '')
+# Directory large sorts, joins, aggregates and loaded tables spill to beyond the memory limit
+DUCKDB_TEMP_DIRECTORY = os.environ.get(
+    'DUCKDB_TEMP_DIRECTORY',
+    os.path.join(tempfile.gettempdir(), 'workspace_audit_events', 'spill')
+)
+
+# Seconds a request's queries may run before they are interrupted (0 disables the limit)
+QUERY_TIMEOUT_SECONDS = float(os.environ.get('QUERY_TIMEOUT_SECONDS', '60'))
+# Seconds a CSV or Parquet export may take
+EXPORT_TIMEOUT_SECONDS = float(os.environ.get('EXPORT_TIMEOUT_SECONDS', '900'))
+
+# Rows per /api/query page
+MAX_PAGE_ROWS = int(os.environ.get('MAX_PAGE_ROWS', '10000'))
+# Rows per CSV or Parquet export (0 disables the limit)
+MAX_EXPORT_ROWS = int(os.environ.get('MAX_EXPORT_ROWS', '10000000'))
+# Breakdown series per chart
+MAX_CHART_SERIES = int(os.environ.get('MAX_CHART_SERIES', '50'))
+
+
+# ============================================================================
+# CONNECTION SETTINGS
+# ============================================================================
+
+def configure_connection(conn, threads=DUCKDB_THREADS, memory_limit=DUCKDB_MEMORY_LIMIT,
+                         temp_directory=DUCKDB_TEMP_DIRECTORY):
+    """
+    Apply the resource limits to a DuckDB database instance.
+
+    The settings hold for every cursor of the instance. Each instance spills to its own
+    directory under temp_directory (DuckDB removes it when the instance closes), so
+    instances and worker processes never share temp files.
+    """
+    if threads:
+        conn.execute(f"SET threads TO {int(threads)}")
+    if memory_limit:
+        conn.execute("SET memory_limit = '{}'".format(memory_limit.replace("'", "''")))
+    if temp_directory:
+        os.makedirs(temp_directory, exist_ok=True)
+        spill_dir = os.path.join(temp_directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        conn.execute("SET temp_directory = '{}'".format(spill_dir.replace("'", "''")))
+    return conn
+
+
+class InvalidSizeError(ValueError):
+    """A requested size or page number is not an integer"""
+
+
+def clamp(value, limit, minimum=1, name='size'):
+    """
+    Clamp a requested size to [minimum, limit] (no upper bound if limit is 0).
+
+    Raises:
+        InvalidSizeError: If the value is not an integer (name identifies it in the message)
+    """
+    try:
+        value = max(minimum, int(value))
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidSizeError(f"{name} must be an integer, got {value!r}")
+    return min(value, limit) if limit else value
+
+
+# ============================================================================
+# QUERY LIMITS
+# ============================================================================
+
+class ResourceLimitError(Exception):
+    """A request exceeded a resource limit; status_code is the HTTP status to answer with"""
+
+    status_code = 503
+
+
+class QueryTimeout(ResourceLimitError):
+    """Queries of a request ran past their time limit and were interrupted"""
+
+    status_code = 503
+
+
+class ResultTooLarge(ResourceLimitError):
+    """A result would hold more rows than an endpoint materializes"""
+
+    status_code = 413
+
+    def __init__(self, message):
+        super().__init__(message)
+        RESULT_LIMIT_REJECTIONS.inc()
+
+
+class QueryWatchdog:
+    """
+    Interrupts DuckDB cursors that run past their deadline.
+
+    One background thread sleeps until the earliest deadline and calls interrupt() on
+    the cursor, which aborts the statement it is running (interrupting an idle cursor
+    has no effect). Only that cursor's statement is affected; other requests keep
+    running.
+    """
+
+    def __init__(self):
+        self.deadlines = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+    @contextmanager
+    def deadline(self, cursor, seconds):
+        """
+        Interrupt the cursor if the block is still running after seconds.
+
+        Raises:
+            QueryTimeout: If the cursor was interrupted for running past the deadline
+        """
+        if not seconds:
+            yield
+            return
+        token = object()
+        entry = {'deadline': time.monotonic() + seconds, 'cursor': cursor, 'interrupted': False}
+        with self.condition:
+            self.deadlines[token] = entry
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='query-watchdog', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        try:
+            yield
+        except duckdb.InterruptException as e:
+            if entry['interrupted']:
+                raise QueryTimeout(
+                    f"The query took longer than {seconds:g}s and was stopped. "
+                    f"Narrow the date range or add filters."
+                ) from e
+            raise
+        finally:
+            with self.condition:
+                del self.deadlines[token]
+
+    def _run(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                pending = []
+                for entry in self.deadlines.values():
+                    if entry['interrupted']:
+                        continue
+                    if entry['deadline'] <= now:
+                        entry['interrupted'] = True
+                        QUERY_TIMEOUTS.inc()
+                        logger.warning("Interrupting a query that ran past its deadline")
+                        entry['cursor'].interrupt()
+                    else:
+                        pending.append(entry['deadline'])
+                self.condition.wait(min(pending) - now if pending else None)
+
+
+watchdog = QueryWatchdog()
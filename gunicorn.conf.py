@@ -0,0 +1,44 @@
+"""
+Gunicorn settings of the production serving mode (see start.sh).
+
+Every worker process runs its own copy of app.py with a thread pool for concurrent
+requests. Datasets are shared between the workers as read-only DuckDB files in
+ENGINE_DATABASE_DIR, next to the shared parquet cache and event store, so each
+range is downloaded, ingested and materialized once no matter which worker serves
+it.
+
+The app is imported in each worker after the fork rather than preloaded in the
+master: DuckDB connections and their threads do not survive a fork. The heavy
+libraries are imported in the master, so workers share their loaded code.
+
+Settings (environment):
+    APP_BIND      Address to listen on (default 0.0.0.0:8888)
+    APP_WORKERS   Worker processes (default: one per core)
+    APP_THREADS   Request threads per worker (default 4)
+    APP_TIMEOUT   Seconds a request may take before its worker is restarted (default 600)
+"""
+import multiprocessing
+import os
+import tempfile
+
+import duckdb  # noqa: F401
+import pandas  # noqa: F401
+import pyarrow  # noqa: F401
+
+# Workers share their datasets through files, set before the workers import the app
+os.environ.setdefault(
+    'ENGINE_DATABASE_DIR',
+    os.path.join(tempfile.gettempdir(), 'workspace_audit_events', 'datasets')
+)
+
+bind = os.environ.get('APP_BIND', '0.0.0.0:8888')
+workers = int(os.environ.get('APP_WORKERS', str(multiprocessing.cpu_count())))
+threads = int(os.environ.get('APP_THREADS', '4'))
+worker_class = 'gthread'
+# Loading a wide range downloads and materializes it within the request
+timeout = int(os.environ.get('APP_TIMEOUT', '600'))
+graceful_timeout = 30
+preload_app = False
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
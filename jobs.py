@@ -0,0 +1,379 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import ENGINE_DATABASE_DIR
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# JOB SETTINGS
+# ============================================================================
+
+# Ingest jobs running at the same time, further jobs queue
+INGEST_JOB_WORKERS = int(os.environ.get('INGEST_JOB_WORKERS', '2'))
+# Files downloaded and loaded per step; the range becomes queryable after the first step
+INGEST_JOB_BATCH_FILES = int(os.environ.get('INGEST_JOB_BATCH_FILES', '32'))
+# Finished jobs are forgotten after this many seconds
+INGEST_JOB_TTL_SECONDS = int(os.environ.get('INGEST_JOB_TTL_SECONDS', '3600'))
+
+# Progress of each job, shared by worker processes along with the dataset files
+JOB_STATE_DIR = os.path.join(ENGINE_DATABASE_DIR, 'jobs') if ENGINE_DATABASE_DIR else ''
+# Minimum interval between progress writes to the state directory
+JOB_PUBLISH_SECONDS = 0.5
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+# ============================================================================
+# INGEST JOBS
+# ============================================================================
+
+class JobCancelled(Exception):
+    """Raised inside a job once it was cancelled"""
+
+
+class IngestJob:
+    """
+    Background load of a date range for one session, with its progress.
+
+    status goes from queued through listing, downloading, ingesting and loading (once
+    per batch of files) to completed, failed or cancelled. Every change bumps version
+    and wakes the streams waiting for it.
+    """
+
+    def __init__(self, job_id, session_id, start, end):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.start = start
+        self.end = end
+        self.status = 'queued'
+        self.progress = {
+            'filesTotal': 0,
+            'filesDownloaded': 0,
+            'filesLoaded': 0,
+            'bytesExpected': 0,
+            'bytesDownloaded': 0,
+            'rowsLoaded': 0
+        }
+        self.queryable = False
+        self.summary = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self.cancel_requested = threading.Event()
+        self.condition = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATUSES
+
+    def eta_seconds(self):
+        """
+        Remaining seconds, extrapolated from the elapsed time and the share of work done.
+
+        Downloaded bytes (of the transfers started so far) count towards the files being
+        downloaded. None until some work is done.
+        """
+        files_total = self.progress['filesTotal']
+        if self.done or not self.started or not files_total:
+            return None
+        fraction = self.progress['filesLoaded'] / files_total
+        bytes_expected = self.progress['bytesExpected']
+        if bytes_expected:
+            in_flight_files = self.progress['filesDownloaded'] - self.progress['filesLoaded']
+            batch_files = min(INGEST_JOB_BATCH_FILES, files_total - self.progress['filesLoaded'])
+            download_fraction = min(1.0, self.progress['bytesDownloaded'] / bytes_expected)
+            # Downloading is about half of a batch, the rest is ingesting and loading it
+            fraction += 0.5 * max(in_flight_files, download_fraction * batch_files) / files_total
+        if fraction <= 0:
+            return None
+        elapsed = time.time() - self.started
+        return round(elapsed / min(fraction, 1.0) - elapsed, 1)
+
+    def snapshot(self):
+        """Return the job's state as a JSON-serializable dict"""
+        with self.condition:
+            return {
+                'jobId': self.job_id,
+                'start': self.start,
+                'end': self.end,
+                'status': self.status,
+                **self.progress,
+                'etaSeconds': self.eta_seconds(),
+                'queryable': self.queryable,
+                'summary': self.summary,
+                'error': self.error,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished,
+                'version': self.version
+            }
+
+    def update(self, status=None, summary=None, **progress):
+        """Set the status, summary and progress counters and wake the waiting streams"""
+        with self.condition:
+            if status is not None:
+                self.status = status
+            if summary is not None:
+                self.summary = summary
+                self.queryable = True
+            self.progress.update(progress)
+            self.version += 1
+            self.condition.notify_all()
+
+    def add_bytes(self, num_bytes, expected_bytes=0):
+        """Count downloaded bytes (progress callback of the downloader)"""
+        with self.condition:
+            self.progress['bytesDownloaded'] += num_bytes
+            self.progress['bytesExpected'] += expected_bytes
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        """Wait until the job changed from version (or timeout seconds passed)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+
+
+class JobRegistry:
+    """
+    Ingest jobs run on a small thread pool, so request threads only submit them and
+    stream their progress.
+
+    A session has at most one running job; submitting another cancels the previous
+    one. Cancellation is checked between files and between downloaded chunks, and
+    keeps whatever the job already loaded.
+
+    With a state_dir, every job's progress is also written there (at most every
+    JOB_PUBLISH_SECONDS) and cancellations are requested through marker files, so any
+    worker process can stream or cancel a job running in another one.
+    """
+
+    def __init__(self, max_workers=INGEST_JOB_WORKERS, ttl_seconds=INGEST_JOB_TTL_SECONDS, state_dir=JOB_STATE_DIR):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest-job')
+        self.ttl_seconds = ttl_seconds
+        self.state_dir = state_dir or None
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self.jobs = {}
+        self.published = {}
+        self.lock = threading.Lock()
+        self.metrics = {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+
+    def submit(self, session_id, start, end, run):
+        """
+        Start a job loading a range for a session.
+
+        Args:
+            session_id: Session the range is loaded for
+            start: Start date (YYYY-MM-DD)
+            end: End date (YYYY-MM-DD, inclusive)
+            run: Function (job) doing the work; it reports progress with job.update() and
+                calls check_cancelled(job) between steps
+
+        Returns:
+            IngestJob: The queued job
+        """
+        job = IngestJob(uuid.uuid4().hex, session_id, start, end)
+        with self.lock:
+            previous = [
+                other for other in self.jobs.values()
+                if other.session_id == session_id and not other.done
+            ]
+            self.jobs[job.job_id] = job
+            self.metrics['submitted'] += 1
+        for other in previous:
+            self.cancel(other.job_id)
+        self._publish(job, force=True)
+        self.executor.submit(self._run, job, run)
+        self.expire()
+        return job
+
+    def _run(self, job, run):
+        job.started = time.time()
+        try:
+            self.check_cancelled(job)
+            run(job)
+            outcome = 'completed'
+        except JobCancelled:
+            outcome = 'cancelled'
+        except Exception as e:
+            logger.error(f"Ingest job {job.job_id[:8]} failed: {e}")
+            logger.error(traceback.format_exc())
+            job.error = str(e)
+            outcome = 'failed'
+        job.finished = time.time()
+        job.update(status=outcome)
+        with self.lock:
+            self.metrics[outcome] += 1
+        self._publish(job, force=True)
+        logger.info(
+            f"Ingest job {job.job_id[:8]} ({job.start} to {job.end}) {outcome} after "
+            f"{job.finished - job.started:.1f}s: {job.progress['filesLoaded']}/{job.progress['filesTotal']} files, "
+            f"{job.progress['rowsLoaded']} rows"
+        )
+
+    def report(self, job, **kwargs):
+        """Update a job's progress (see IngestJob.update) and publish it to the state directory"""
+        job.update(**kwargs)
+        self._publish(job, force='status' in kwargs)
+
+    def progress_callback(self, job):
+        """Downloader progress callback counting a job's bytes"""
+        def progress(num_bytes, expected_bytes=0):
+            job.add_bytes(num_bytes, expected_bytes)
+            self._publish(job)
+        return progress
+
+    def state_path(self, job_id, suffix='.json'):
+        # Job ids come from URLs, keep them inside the state directory
+        return os.path.join(self.state_dir, os.path.basename(job_id) + suffix)
+
+    def _publish(self, job, force=False):
+        """Write a job's progress to the state directory, at most every JOB_PUBLISH_SECONDS unless forced"""
+        if not self.state_dir:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.published.get(job.job_id, 0) < JOB_PUBLISH_SECONDS:
+                return
+            self.published[job.job_id] = now
+        path = self.state_path(job.job_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({**job.snapshot(), 'sessionId': job.session_id}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not publish progress of ingest job {job.job_id[:8]}: {e}")
+
+    def _load_state(self, job_id):
+        """Progress of a job of another worker process from the state directory, or None"""
+        if not self.state_dir:
+            return None
+        try:
+            with open(self.state_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, job_id, session_id):
+        """Return the progress of a session's job, or None if there is no such job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return job.snapshot() if job.session_id == session_id else None
+        state = self._load_state(job_id)
+        if state is None or state.pop('sessionId', None) != session_id:
+            return None
+        return state
+
+    def cancel(self, job_id, session_id=None):
+        """
+        Request cancellation of a job (of the given session, if one is given).
+
+        Returns:
+            bool: Whether the job exists and was still running
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            if session_id is not None and job.session_id != session_id:
+                return False
+            if job.done:
+                return False
+            job.cancel_requested.set()
+            # Wake a job waiting in the queue (and the streams)
+            job.update()
+            return True
+        # Running in another worker process, which checks for the marker file
+        state = self.get(job_id, session_id) if session_id is not None else self._load_state(job_id)
+        if state is None or state['status'] in TERMINAL_STATUSES:
+            return False
+        with open(self.state_path(job_id, '.cancel'), 'w'):
+            pass
+        return True
+
+    def is_cancelled(self, job):
+        """Whether cancellation of a job was requested, in this process or another one"""
+        if job.cancel_requested.is_set():
+            return True
+        if self.state_dir and os.path.exists(self.state_path(job.job_id, '.cancel')):
+            job.cancel_requested.set()
+            return True
+        return False
+
+    def check_cancelled(self, job):
+        """Raise JobCancelled if cancellation of a job was requested"""
+        if self.is_cancelled(job):
+            raise JobCancelled(f"Ingest job {job.job_id} was cancelled")
+
+    def stream(self, job_id, session_id, keepalive_seconds=15):
+        """
+        Yield the progress of a session's job on every change until it finished.
+
+        Yields None when nothing changed for keepalive_seconds, so the caller can keep
+        the connection alive. Jobs of other worker processes are polled from the state
+        directory.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+        version = None
+        waited = 0.0
+        while True:
+            if job is not None:
+                snapshot = job.snapshot()
+            else:
+                snapshot = self.get(job_id, session_id)
+                if snapshot is None:
+                    return
+            if snapshot['version'] != version:
+                version = snapshot['version']
+                waited = 0.0
+                yield snapshot
+                if snapshot['status'] in TERMINAL_STATUSES:
+                    return
+            elif waited >= keepalive_seconds:
+                waited = 0.0
+                yield None
+
+            started = time.monotonic()
+            if job is not None:
+                job.wait(version, keepalive_seconds - waited)
+            else:
+                time.sleep(JOB_PUBLISH_SECONDS)
+            waited += time.monotonic() - started
+
+    def expire(self):
+        """Forget jobs that finished ttl_seconds ago (and their state files)"""
+        now = time.time()
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job.done and now - job.finished >= self.ttl_seconds
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+                self.published.pop(job_id, None)
+        if self.state_dir:
+            for name in os.listdir(self.state_dir):
+                path = os.path.join(self.state_dir, name)
+                try:
+                    if now - os.path.getmtime(path) >= self.ttl_seconds:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        """Return job counters and the number of running jobs"""
+        with self.lock:
+            running = sum(1 for job in self.jobs.values() if not job.done)
+            return {**self.metrics, 'running': running, 'jobs': len(self.jobs)}
@@ -0,0 +1,344 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# METRIC SETTINGS
+# ============================================================================
+
+# Statements running longer than this (seconds) are logged as slow queries
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', '1.0'))
+# Re-run slow queries with the DuckDB profiler to capture their profiled plan (doubles their cost)
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'false').lower() in ('1', 'true', 'yes')
+# Slow queries kept for /api/metrics/slow-queries
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', '50'))
+
+# Latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ============================================================================
+# PROMETHEUS METRICS
+# ============================================================================
+
+def format_value(value):
+    """Format a sample value in the Prometheus text format"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    """Render a label dict as {name="value",...} (empty string without labels)"""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [
+                (self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(self.values.items())
+            ]
+
+
+class Histogram:
+    """Cumulative histogram with optional labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            samples = []
+            for key, (counts, total) in sorted(self.values.items()):
+                labels = dict(zip(self.labelnames, key))
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", {**labels, 'le': format_value(float(bound))}, count))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, counts[-1]))
+            return samples
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text exposition format.
+
+    Counters and histograms are updated as events happen. Collectors are called at
+    scrape time and return (name, type, documentation, [(labels, value)]) families,
+    used for values other components already track (cache counters, store sizes).
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        with self.lock:
+            self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Return the current value of every metric as Prometheus text"""
+        with self.lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in metrics]
+        for collector in collectors:
+            try:
+                for name, metric_type, documentation, values in collector():
+                    families.append((name, metric_type, documentation, [(name, labels, value) for labels, value in values]))
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                if value is not None:
+                    lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    'audit_request_duration_seconds', 'Request latency until the response is returned',
+    ('endpoint', 'method', 'status')
+)
+STAGE_SECONDS = registry.histogram(
+    'audit_stage_duration_seconds', 'Time spent per request stage (exclusive of nested stages)', ('stage',)
+)
+QUERY_SECONDS = registry.histogram(
+    'audit_duckdb_query_duration_seconds', 'DuckDB statement execution time', ('kind',)
+)
+SLOW_QUERIES = registry.counter(
+    'audit_slow_queries_total', 'DuckDB statements slower than SLOW_QUERY_SECONDS'
+)
+QUERY_TIMEOUTS = registry.counter(
+    'audit_query_timeouts_total', 'Queries interrupted for running past their time limit'
+)
+RESULT_LIMIT_REJECTIONS = registry.counter(
+    'audit_result_limit_rejections_total', 'Requests rejected for exceeding a row limit'
+)
+BYTES_SERVED = registry.counter(
+    'audit_response_bytes_total', 'Response body bytes sent', ('endpoint',)
+)
+ROWS_SCANNED = registry.counter(
+    'audit_rows_scanned_total', 'Event rows read from parquet files', ('operation',)
+)
+ROWS_RETURNED = registry.counter(
+    'audit_rows_returned_total', 'Event rows returned in row responses', ('endpoint',)
+)
+DOWNLOADED_FILES = registry.counter(
+    'audit_download_files_total', 'Parquet files downloaded', ('outcome',)
+)
+DOWNLOADED_BYTES = registry.counter(
+    'audit_download_bytes_total', 'Parquet bytes downloaded'
+)
+DOWNLOAD_SECONDS = registry.counter(
+    'audit_download_seconds_total', 'Wall-clock time spent downloading parquet files (bytes / seconds is the throughput)'
+)
+
+
+# ============================================================================
+# REQUEST TRACING
+# ============================================================================
+
+class RequestTrace:
+    """Exclusive time per stage of one request, built from nested span() blocks"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.stack = []
+
+    def enter(self):
+        self.stack.append(0.0)
+
+    def exit(self, stage, elapsed):
+        child_seconds = self.stack.pop()
+        exclusive = max(0.0, elapsed - child_seconds)
+        self.stages[stage] = self.stages.get(stage, 0.0) + exclusive
+        if self.stack:
+            self.stack[-1] += elapsed
+        return exclusive
+
+
+def start_request_trace():
+    """Attach a new trace to the current request"""
+    g.request_trace = RequestTrace()
+
+
+def current_trace():
+    """Trace of the current request, or None outside a traced request"""
+    if not has_request_context():
+        return None
+    return g.get('request_trace')
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block as a stage of the current request.
+
+    Time spent in nested spans is attributed to the inner stage only. Outside a
+    request (background threads, scripts) the block runs untimed.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    trace.enter()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(trace.exit(stage, time.perf_counter() - started), stage=stage)
+
+
+def server_timing_header(stages):
+    """Render stage durations as a Server-Timing header value (durations in ms)"""
+    return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items())
+
+
+def count_bytes(chunks, endpoint):
+    """Pass a streamed response body through, counting its bytes once it is sent"""
+    num_bytes = 0
+    try:
+        for chunk in chunks:
+            num_bytes += len(chunk)
+            yield chunk
+    finally:
+        BYTES_SERVED.inc(num_bytes, endpoint=endpoint)
+
+
+def finish_request_trace(req, response):
+    """
+    Record the latency, stage breakdown and size of a finished request.
+
+    Adds a Server-Timing header with the stages so the browser's network panel shows
+    where the time went, and logs a one-line breakdown.
+    """
+    trace = current_trace()
+    if trace is None:
+        return response
+    seconds = time.perf_counter() - trace.started
+    endpoint = req.url_rule.rule if req.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint, method=req.method, status=response.status_code)
+
+    if response.is_streamed:
+        response.response = count_bytes(response.response, endpoint)
+    else:
+        BYTES_SERVED.inc(response.calculate_content_length() or 0, endpoint=endpoint)
+
+    if trace.stages:
+        stages = {**trace.stages, 'total': seconds}
+        response.headers['Server-Timing'] = server_timing_header(stages)
+        breakdown = ' '.join(f"{stage}={stage_seconds * 1000:.1f}ms" for stage, stage_seconds in trace.stages.items())
+        logger.info(
+            f"{req.method} {req.path} {response.status_code} in {seconds * 1000:.1f}ms ({breakdown})"
+        )
+    return response
+
+
+# ============================================================================
+# SLOW QUERY LOG
+# ============================================================================
+
+class SlowQueryLog:
+    """Most recent DuckDB statements slower than threshold seconds, with their profiled plan if captured"""
+
+    def __init__(self, threshold=SLOW_QUERY_SECONDS, explain=SLOW_QUERY_EXPLAIN, max_entries=SLOW_QUERY_LOG_SIZE):
+        self.threshold = threshold
+        self.explain = explain
+        self.entries = deque(maxlen=max_entries)
+        self.lock = threading.Lock()
+
+    def record(self, query, seconds, plan=None):
+        SLOW_QUERIES.inc()
+        entry = {
+            'time': time.time(),
+            'seconds': seconds,
+            'query': query,
+            'path': request.path if has_request_context() else None,
+            'plan': plan
+        }
+        with self.lock:
+            self.entries.append(entry)
+        logger.warning(f"Slow query ({seconds:.2f}s): {query[:500]}")
+        if plan:
+            logger.info(f"Profiled plan of slow query:\n{plan}")
+
+    def stats(self):
+        """Return the threshold and the logged slow queries, most recent first"""
+        with self.lock:
+            return {
+                'thresholdSeconds': self.threshold,
+                'explain': self.explain,
+                'queries': list(reversed(self.entries))
+            }
@@ -0,0 +1,269 @@
+import logging
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+# Length of the indexed n-grams
+NGRAM_SIZE = 3
+
+# Columns that get an n-gram index at load time
+NGRAM_INDEX_COLUMNS = [
+    column.strip() for column in os.environ.get('NGRAM_INDEX_COLUMNS', 'filename').split(',') if column.strip()
+]
+
+# Fraction of the rows above which a substring term is filtered with a LIKE scan instead
+# of the index (a semi-join over most of the table is slower than scanning it)
+NGRAM_INDEX_MAX_SELECTIVITY = float(os.environ.get('NGRAM_INDEX_MAX_SELECTIVITY', '0.05'))
+
+# Characters with a special meaning in LIKE patterns
+LIKE_WILDCARDS = ('%', '_')
+
+# ============================================================================
+# N-GRAM INDEX
+# ============================================================================
+
+def build_postings(conn, values_table):
+    """
+    Compute the posting lists of a (value_id, value) table.
+
+    Returns:
+        dict: Trigram -> sorted np.int32 array of the ids of the values containing it
+    """
+    grams = conn.execute(f"""
+        SELECT gram, list(value_id ORDER BY value_id) AS value_ids
+        FROM (
+            SELECT DISTINCT value_id, substring(value, pos, {NGRAM_SIZE}) AS gram
+            FROM (
+                SELECT value_id, value, unnest(range(1, length(value) - {NGRAM_SIZE - 2})) AS pos
+                FROM {values_table}
+            )
+        )
+        GROUP BY gram
+    """).arrow()
+    return postings_from_arrow(grams)
+
+
+def postings_from_arrow(grams):
+    """Turn a (gram, value_ids list) Arrow table into the trigram -> np.int32 ids dict"""
+    value_ids = grams.column('value_ids').combine_chunks()
+    offsets = value_ids.offsets.to_numpy()
+    flat_ids = value_ids.flatten().to_numpy().astype(np.int32)
+    return {
+        gram: flat_ids[offsets[idx]:offsets[idx + 1]]
+        for idx, gram in enumerate(grams.column('gram').to_pylist())
+    }
+
+
+class NgramIndex:
+    """
+    Trigram index for substring search on one column of an events table.
+
+    The distinct values of the column get ids. Every trigram maps to the sorted ids of
+    the values containing it, and a DuckDB table maps value ids to the row ids of the
+    events holding that value. A substring term is resolved by intersecting the posting
+    lists of its trigrams, checking the term only against those candidate values, and
+    filtering the events by the row ids of the matching values.
+    """
+
+    def __init__(self, column, rows_table, values, postings, value_rows, num_rows):
+        self.column = column
+        self.rows_table = rows_table
+        self.values = values
+        self.postings = postings
+        self.value_rows = value_rows
+        self.num_rows = num_rows
+        self.empty = np.empty(0, dtype=np.int32)
+
+    @classmethod
+    def build(cls, conn, table, column):
+        """
+        Build the index of a column of a loaded events table.
+
+        Args:
+            conn: DuckDB connection holding the table
+            table: Events table (rows are never modified, so row ids are stable)
+            column: VARCHAR column to index
+
+        Returns:
+            NgramIndex
+        """
+        started = time.monotonic()
+        col = '"{}"'.format(column.replace('"', '""'))
+        values_table = f"{table}__ngram_{column}_values"
+        rows_table = f"{table}__ngram_{column}_rows"
+
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {values_table} AS
+            SELECT (row_number() OVER (ORDER BY value) - 1)::INTEGER AS value_id, value
+            FROM (SELECT DISTINCT {col} AS value FROM {table} WHERE {col} IS NOT NULL)
+        """)
+        conn.execute(f"""
+            CREATE OR REPLACE TABLE {rows_table} AS
+            SELECT v.value_id, e.rowid AS row_id
+            FROM {table} AS e JOIN {values_table} AS v ON e.{col} = v.value
+            ORDER BY v.value_id, row_id
+        """)
+
+        values = conn.execute(f"SELECT value FROM {values_table} ORDER BY value_id").arrow().column(0).combine_chunks()
+        value_rows = np.zeros(len(values), dtype=np.int64)
+        counts = conn.execute(f"SELECT value_id, COUNT(*) FROM {rows_table} GROUP BY value_id").fetchnumpy()
+        value_rows[counts['value_id']] = counts['count_star()']
+
+        postings = build_postings(conn, values_table)
+        conn.execute(f"DROP TABLE {values_table}")
+
+        num_rows = int(value_rows.sum())
+        logger.info(
+            f"Built {NGRAM_SIZE}-gram index on {table}.{column}: {len(values)} values, "
+            f"{len(postings)} grams, {sum(ids.nbytes for ids in postings.values())} posting bytes "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return cls(column, rows_table, values, postings, value_rows, num_rows)
+
+    def extend(self, conn, delta_table):
+        """
+        Index the events appended to the indexed table.
+
+        Values not seen before get the next free ids, so existing posting lists stay
+        sorted when the new ids are appended. The index itself is not modified (requests
+        may be using it); the row id table is shared with the returned index.
+
+        Args:
+            conn: DuckDB connection holding the tables
+            delta_table: Table of the appended events, with a row_id column holding
+                their row ids in the indexed table
+
+        Returns:
+            NgramIndex
+        """
+        started = time.monotonic()
+        col = '"{}"'.format(self.column.replace('"', '""'))
+        delta_values = conn.execute(
+            f"SELECT DISTINCT {col} AS value FROM {delta_table} WHERE {col} IS NOT NULL"
+        ).arrow().column(0).combine_chunks()
+
+        new_values = pc.filter(delta_values, pc.invert(pc.is_in(delta_values, value_set=self.values)))
+        values = pa.concat_arrays([self.values, new_values]) if len(new_values) else self.values
+        value_ids = pc.index_in(delta_values, value_set=values).cast(pa.int32())
+
+        mapping = pa.table({'value_id': value_ids, 'value': delta_values})
+        mapping_view = f"ngram_delta_{id(mapping)}"
+        conn.register(mapping_view, mapping)
+        try:
+            conn.execute(f"""
+                INSERT INTO {self.rows_table}
+                SELECT v.value_id, d.row_id
+                FROM {delta_table} AS d JOIN {mapping_view} AS v ON d.{col} = v.value
+                ORDER BY v.value_id, d.row_id
+            """)
+            counts = conn.execute(f"""
+                SELECT v.value_id, COUNT(*) AS events
+                FROM {delta_table} AS d JOIN {mapping_view} AS v ON d.{col} = v.value
+                GROUP BY v.value_id
+            """).fetchnumpy()
+            postings = dict(self.postings)
+            if len(new_values):
+                new_values_table = f"{self.rows_table}_new_values"
+                conn.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE {new_values_table} AS
+                    SELECT value_id, value FROM {mapping_view} WHERE value_id >= {len(self.values)}
+                """)
+                for gram, ids in build_postings(conn, new_values_table).items():
+                    existing = postings.get(gram)
+                    postings[gram] = ids if existing is None else np.concatenate([existing, ids])
+                conn.execute(f"DROP TABLE {new_values_table}")
+        finally:
+            conn.unregister(mapping_view)
+
+        value_rows = np.concatenate([self.value_rows, np.zeros(len(new_values), dtype=np.int64)])
+        value_rows[counts['value_id']] += counts['events']
+
+        logger.info(
+            f"Extended {NGRAM_SIZE}-gram index on {self.column}: {len(new_values)} new values, "
+            f"{int(counts['events'].sum())} events "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return NgramIndex(self.column, self.rows_table, values, postings, value_rows, int(value_rows.sum()))
+
+    def save(self, conn):
+        """
+        Store the values, per-value row counts and posting lists next to the row id table,
+        so open() can restore the index from another connection to the same database.
+        """
+        values = pa.table({
+            'value_id': pa.array(np.arange(len(self.values), dtype=np.int32)),
+            'value': self.values,
+            'value_rows': pa.array(self.value_rows)
+        })
+        grams = list(self.postings)
+        postings = pa.table({
+            'gram': pa.array(grams, type=pa.string()),
+            'value_ids': pa.array([self.postings[gram] for gram in grams], type=pa.list_(pa.int32()))
+        })
+        for suffix, data in (('values', values), ('postings', postings)):
+            view_name = f"ngram_save_{id(data)}"
+            conn.register(view_name, data)
+            try:
+                conn.execute(f"CREATE OR REPLACE TABLE {self.rows_table}_{suffix} AS SELECT * FROM {view_name}")
+            finally:
+                conn.unregister(view_name)
+
+    @classmethod
+    def open(cls, conn, column, rows_table):
+        """Restore an index stored with save() (rows_table may be qualified with its database)"""
+        values = conn.execute(f"SELECT value, value_rows FROM {rows_table}_values ORDER BY value_id").arrow()
+        value_rows = values.column('value_rows').to_numpy().astype(np.int64)
+        postings = postings_from_arrow(conn.execute(f"SELECT gram, value_ids FROM {rows_table}_postings").arrow())
+        return cls(
+            column, rows_table, values.column('value').combine_chunks(), postings, value_rows, int(value_rows.sum())
+        )
+
+    def candidates(self, term):
+        """Ids of the values containing every trigram of the term (all values for short terms)"""
+        if len(term) < NGRAM_SIZE:
+            return np.arange(len(self.values), dtype=np.int32)
+
+        grams = {term[idx:idx + NGRAM_SIZE] for idx in range(len(term) - NGRAM_SIZE + 1)}
+        # Intersect the shortest posting lists first
+        posting_lists = sorted((self.postings.get(gram, self.empty) for gram in grams), key=len)
+        value_ids = posting_lists[0]
+        for posting_list in posting_lists[1:]:
+            if len(value_ids) == 0:
+                break
+            value_ids = np.intersect1d(value_ids, posting_list, assume_unique=True)
+        return value_ids
+
+    def search(self, term):
+        """
+        Resolve a substring term (LIKE '%term%') to the ids of the matching values.
+
+        Returns:
+            list|None: Sorted value ids, or None if the term has LIKE wildcards or matches
+            too many rows for the index to beat a scan
+        """
+        if any(wildcard in term for wildcard in LIKE_WILDCARDS):
+            return None
+
+        value_ids = self.candidates(term)
+        if len(value_ids):
+            # Check the term against the candidate values only
+            candidate_values = self.values.take(pa.array(value_ids))
+            value_ids = value_ids[pc.match_substring(candidate_values, term).to_numpy(zero_copy_only=False)]
+
+        if self.value_rows[value_ids].sum() > self.num_rows * NGRAM_INDEX_MAX_SELECTIVITY:
+            return None
+        return value_ids.tolist()
+
+    def condition(self):
+        """SQL condition selecting the events of the value ids bound to its ? placeholder"""
+        return f"rowid IN (SELECT row_id FROM {self.rows_table} WHERE value_id IN (SELECT unnest(?)))"
+
+    def drop(self, conn):
+        """Drop the row id table of the index (and the tables written by save())"""
+        for name in (self.rows_table, f"{self.rows_table}_values", f"{self.rows_table}_postings"):
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
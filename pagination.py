@@ -0,0 +1,122 @@
+import base64
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Column used to break ties between rows with the same sort value
+TIEBREAK_COLUMN = 'uuid'
+
+# Number of filtered totals kept in the count cache
+COUNT_CACHE_SIZE = 256
+
+# ============================================================================
+# KEYSET PAGINATION
+# ============================================================================
+
+def encode_cursor(sort_column, sort_order, value, uuid, direction):
+    """
+    Encode an opaque page cursor pointing at a row of the current page.
+
+    Args:
+        sort_column: Column the page is sorted by
+        sort_order: 'ASC' or 'DESC'
+        value: Sort column value of the row
+        uuid: Tiebreak (uuid) value of the row
+        direction: 'next' to seek past the row, 'prev' to seek before it
+    """
+    payload = json.dumps({'c': sort_column, 'o': sort_order, 'v': value, 'u': uuid, 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, sort_column, sort_order):
+    """
+    Decode a page cursor.
+
+    Returns:
+        dict|None: {'value', 'uuid', 'direction'}, or None if the cursor is missing,
+        malformed or was issued for a different sort
+    """
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        logger.warning(f"Ignoring malformed page cursor: {e}")
+        return None
+
+    if payload.get('c') != sort_column or payload.get('o') != sort_order:
+        return None
+    if payload.get('d') not in ('next', 'prev') or payload.get('u') is None:
+        return None
+    return {'value': payload.get('v'), 'uuid': payload['u'], 'direction': payload['d']}
+
+
+def build_order_by(sort_column, sort_order, reverse=False):
+    """
+    Build a deterministic ORDER BY clause (NULLs always last, uuid as tiebreak).
+
+    With reverse=True the order is flipped, which is used to read the rows before a cursor.
+    """
+    descending = (sort_order == 'DESC') != reverse
+    direction = 'DESC' if descending else 'ASC'
+    nulls = 'NULLS FIRST' if reverse else 'NULLS LAST'
+    return f'ORDER BY "{sort_column}" {direction} {nulls}, {TIEBREAK_COLUMN} {direction}'
+
+
+def build_seek_condition(sort_column, sort_order, cursor):
+    """
+    Build the WHERE condition selecting the rows after (next) or before (prev) a cursor row
+    in the order produced by build_order_by().
+
+    Returns:
+        tuple: (condition SQL with ? placeholders, list of parameters)
+    """
+    col = f'"{sort_column}"'
+    forward = cursor['direction'] == 'next'
+    # Comparison that moves forward in the requested order
+    after = '<' if sort_order == 'DESC' else '>'
+    before = '>' if sort_order == 'DESC' else '<'
+    cmp = after if forward else before
+
+    if cursor['value'] is None:
+        # Cursor row is in the trailing block of NULL sort values, ordered by uuid only
+        if forward:
+            return f"({col} IS NULL AND {TIEBREAK_COLUMN} {cmp} ?)", [cursor['uuid']]
+        return f"({col} IS NOT NULL OR {TIEBREAK_COLUMN} {cmp} ?)", [cursor['uuid']]
+
+    condition = f"({col} {cmp} ? OR ({col} = ? AND {TIEBREAK_COLUMN} {cmp} ?)"
+    if forward:
+        # NULL sort values come after every non-NULL value
+        condition += f" OR {col} IS NULL"
+    condition += ")"
+    return condition, [cursor['value'], cursor['value'], cursor['uuid']]
+
+
+# ============================================================================
+# COUNT CACHE
+# ============================================================================
+
+class CountCache:
+    """LRU cache of filtered totals keyed by dataset generation and filter signature (FilterTree.signature)"""
+
+    def __init__(self, max_entries=COUNT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, total):
+        with self.lock:
+            self.entries[key] = total
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import duckdb
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Merged patterns whose matching values are kept per loaded dataset
+REGEX_CACHE_SIZE = int(os.environ.get('REGEX_CACHE_SIZE', '256'))
+
+# Patterns matching more distinct values than this are evaluated per row instead
+REGEX_VALUE_LIST_LIMIT = int(os.environ.get('REGEX_VALUE_LIST_LIMIT', '10000'))
+
+# ============================================================================
+# REGEX ENGINE
+# ============================================================================
+
+class RegexError(ValueError):
+    """Raised for a regex pattern DuckDB can't compile"""
+
+
+def sql_string_literal(value):
+    """Render a string as a SQL string literal"""
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def merge_patterns(patterns):
+    """Merge OR-ed patterns into one alternation (a single pattern is used as it is)"""
+    if len(patterns) == 1:
+        return patterns[0]
+    return '|'.join(f"(?:{pattern})" for pattern in patterns)
+
+
+class RegexEngine:
+    """
+    Regex filters evaluated over the distinct values of a column.
+
+    The patterns on a column are validated once, merged into one alternation and run
+    with DuckDB's regexp_matches() over the column's distinct values (a few thousand
+    at most for most audit columns) instead of over every event. The matching values
+    are cached per column and pattern set for the loaded dataset, so pages, facets and
+    exports with the same regex only do a dictionary lookup.
+    """
+
+    def __init__(self, conn, table, distinct_values=None):
+        """
+        Args:
+            conn: DuckDB connection holding the table
+            table: Events table of the loaded dataset
+            distinct_values: Dict of column name -> Arrow array of its distinct values
+                that are already known (e.g. from an n-gram index)
+        """
+        self.conn = conn
+        self.table = table
+        self.distinct_values = dict(distinct_values or {})
+        self.matches = OrderedDict()
+        self.validated = {}
+        self.lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def validate(self, pattern):
+        """Compile a pattern once with DuckDB's regex engine (RE2), raising RegexError if it is invalid"""
+        with self.lock:
+            error = self.validated.get(pattern)
+        if error is None:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(f"SELECT regexp_matches('', {sql_string_literal(pattern)})").fetchone()
+                error = ''
+            except duckdb.Error as e:
+                error = str(e)
+            finally:
+                cursor.close()
+            with self.lock:
+                self.validated[pattern] = error
+        if error:
+            raise RegexError(f"Invalid regex pattern /{pattern}: {error}")
+
+    def column_values(self, column):
+        """Distinct non-NULL values of a column as VARCHAR, read once per dataset"""
+        with self.lock:
+            values = self.distinct_values.get(column)
+        if values is None:
+            col = '"{}"'.format(column.replace('"', '""'))
+            cursor = self.conn.cursor()
+            try:
+                values = cursor.execute(
+                    f"SELECT DISTINCT CAST({col} AS VARCHAR) FROM {self.table} WHERE {col} IS NOT NULL"
+                ).arrow().column(0).combine_chunks()
+            finally:
+                cursor.close()
+            with self.lock:
+                self.distinct_values[column] = values
+        return values
+
+    def match_values(self, column, patterns):
+        """
+        Return the distinct values of a column matching any of the patterns.
+
+        Args:
+            column: Column name
+            patterns: Regex patterns (without the leading '/')
+
+        Returns:
+            list|None: Sorted matching values, or None if more than REGEX_VALUE_LIST_LIMIT
+            values match (cheaper to evaluate per row)
+
+        Raises:
+            RegexError: If a pattern is invalid
+        """
+        patterns = tuple(sorted(set(patterns)))
+        key = (column, patterns)
+        with self.lock:
+            if key in self.matches:
+                self.matches.move_to_end(key)
+                self.metrics['hits'] += 1
+                return self.matches[key]
+            self.metrics['misses'] += 1
+
+        for pattern in patterns:
+            self.validate(pattern)
+
+        values = pa.table({'value': self.column_values(column)})
+        cursor = self.conn.cursor()
+        view_name = f"regex_values_{id(values)}"
+        try:
+            cursor.register(view_name, values)
+            matched = [row[0] for row in cursor.execute(
+                f"SELECT value FROM {view_name} "
+                f"WHERE regexp_matches(value, {sql_string_literal(merge_patterns(patterns))}) ORDER BY value"
+            ).fetchall()]
+        finally:
+            cursor.unregister(view_name)
+            cursor.close()
+
+        result = matched if len(matched) <= REGEX_VALUE_LIST_LIMIT else None
+        logger.debug(f"Regex {patterns} on {column}: {len(matched)} of {len(values)} distinct values match")
+
+        with self.lock:
+            self.matches[key] = result
+            while len(self.matches) > REGEX_CACHE_SIZE:
+                self.matches.popitem(last=False)
+                self.metrics['evictions'] += 1
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {**self.metrics, 'entries': len(self.matches)}
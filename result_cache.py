@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Total size of the cached response bodies
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Responses larger than this fraction of the cap are not cached
+RESULT_CACHE_MAX_ENTRY_FRACTION = 0.25
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+def result_cache_key(*parts):
+    """Canonical hash of the JSON serializable parts of a request (dict keys sorted)"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    In-process LRU cache of serialized responses with a memory cap.
+
+    Entries are response bodies (bytes) plus their mimetype, keyed by
+    result_cache_key(). Keys include the dataset generation, so sessions on the same
+    dataset share entries, and entries of evicted or refreshed datasets are never
+    served again and age out of the LRU.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'skipped': 0}
+
+    def get(self, key):
+        """Return the cached (body, mimetype) for a key and mark it as recently used, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.metrics['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.metrics['hits'] += 1
+            return entry
+
+    def put(self, key, body, mimetype):
+        """Cache a response body, evicting least recently used entries to stay within max_bytes"""
+        size = len(body)
+        if size > self.max_bytes * RESULT_CACHE_MAX_ENTRY_FRACTION:
+            with self.lock:
+                self.metrics['skipped'] += 1
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[0])
+            self.entries[key] = (body, mimetype)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted_body, _) = self.entries.popitem(last=False)
+                self.bytes -= len(evicted_body)
+                self.metrics['evictions'] += 1
+
+    def stats(self):
+        """Return cache size and hit/miss/eviction counters"""
+        with self.lock:
+            lookups = self.metrics['hits'] + self.metrics['misses']
+            return {
+                **self.metrics,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'maxBytes': self.max_bytes,
+                'hitRate': self.metrics['hits'] / lookups if lookups else None
+            }
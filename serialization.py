@@ -0,0 +1,258 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+from flask import Response
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Rows serialized per record batch
+JSON_BATCH_ROWS = 10000
+
+# Epoch nanoseconds -> ISO 8601 string in UTC, computed inside DuckDB
+ISO_TIMESTAMP_SQL = "strftime(make_timestamp(\"{column}\" // 1000), '%Y-%m-%dT%H:%M:%S.%f')"
+
+# Response formats for row results: JSON array of row objects, column-oriented JSON, Arrow IPC stream
+RESPONSE_FORMATS = ('json', 'columnar', 'arrow')
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+COLUMNAR_JSON_MIMETYPE = 'application/vnd.columnar+json'
+
+# Low-cardinality columns sent as a dictionary plus integer codes in the columnar formats
+DICTIONARY_COLUMNS = ('action', 'username', 'projectName')
+
+# ============================================================================
+# RESULT SERIALIZATION
+# ============================================================================
+
+def iso_timestamp_expression(column='timestamp'):
+    """SQL expression formatting an epoch-nanosecond column as an ISO 8601 UTC string"""
+    return ISO_TIMESTAMP_SQL.format(column=column)
+
+
+def format_epoch_ns(value):
+    """Format epoch nanoseconds as an ISO 8601 UTC string like ISO_TIMESTAMP_SQL (None stays None)"""
+    if value is None:
+        return None
+    seconds, nanos = divmod(int(value), 1_000_000_000)
+    moment = datetime(1970, 1, 1) + timedelta(seconds=seconds, microseconds=nanos // 1000)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+
+def build_select_list(schema):
+    """
+    Build a select list for a result schema that formats the epoch-nanosecond
+    timestamp column as an ISO string and passes every other column through.
+    """
+    select_list = []
+    for field in schema:
+        if field.name == 'timestamp' and pa.types.is_integer(field.type):
+            select_list.append(f'{iso_timestamp_expression()} AS "timestamp"')
+        else:
+            select_list.append('"{}"'.format(field.name.replace('"', '""')))
+    return ', '.join(select_list)
+
+
+def iter_json_records(conn, relation_sql):
+    """
+    Yield a JSON array of row objects in chunks, one Arrow record batch at a time.
+
+    Rows are serialized by DuckDB's to_json(), so no Python object is built per row
+    or per value.
+
+    Args:
+        conn: DuckDB connection or cursor
+        relation_sql: Query (or registered view name) producing the rows
+
+    Yields:
+        str: Chunks that concatenate to the JSON array
+    """
+    schema = conn.execute(f"SELECT * FROM ({relation_sql}) AS result LIMIT 0").arrow().schema
+    query = f"""
+        SELECT CAST(to_json(result_row) AS VARCHAR)
+        FROM (SELECT {build_select_list(schema)} FROM ({relation_sql}) AS result) AS result_row
+    """
+    reader = conn.execute(query).fetch_record_batch(JSON_BATCH_ROWS)
+
+    yield '['
+    first = True
+    for batch in reader:
+        if batch.num_rows == 0:
+            continue
+        rows = ','.join(batch.column(0).to_pylist())
+        yield rows if first else ',' + rows
+        first = False
+    yield ']'
+
+
+def arrow_to_json_records(conn, table):
+    """Serialize an Arrow table to a JSON array of row objects, formatting timestamps as ISO strings"""
+    view_name = f"serialize_{id(table)}"
+    conn.register(view_name, table)
+    try:
+        return ''.join(iter_json_records(conn, f"SELECT * FROM {view_name}"))
+    finally:
+        conn.unregister(view_name)
+
+
+def table_to_iso_timestamps(conn, table):
+    """Return an Arrow table with the epoch-nanosecond timestamp column formatted as ISO strings"""
+    if 'timestamp' not in table.column_names or not pa.types.is_integer(table.schema.field('timestamp').type):
+        return table
+    view_name = f"format_{id(table)}"
+    conn.register(view_name, table)
+    try:
+        return conn.execute(f"SELECT {build_select_list(table.schema)} FROM {view_name}").arrow()
+    finally:
+        conn.unregister(view_name)
+
+
+def dictionary_encode_columns(table, columns=DICTIONARY_COLUMNS):
+    """Dictionary-encode the given string columns of an Arrow table (others are left as they are)"""
+    for name in columns:
+        if name in table.column_names and pa.types.is_string(table.schema.field(name).type):
+            idx = table.column_names.index(name)
+            encoded = pc.dictionary_encode(table.column(name).combine_chunks())
+            table = table.set_column(idx, name, encoded)
+    return table
+
+
+def column_values(column):
+    """Python list of an Arrow column's values, via numpy when the column has no NULLs"""
+    if column.null_count == 0:
+        return column.to_numpy(zero_copy_only=False).tolist()
+    return column.to_pylist()
+
+
+def columnar_json(conn, table, dictionary_columns=DICTIONARY_COLUMNS):
+    """
+    Serialize an Arrow table to column-oriented JSON.
+
+    Every column is one array instead of repeating the keys on every row. Dictionary
+    columns are sent as integer codes into a per-column list of distinct values.
+
+    Returns:
+        str: {"columns": [...], "rowCount": n, "data": {column: [...]}, "dictionaries": {column: [...]}}
+    """
+    with span('format_timestamps'):
+        table = table_to_iso_timestamps(conn, table)
+    table = dictionary_encode_columns(table, dictionary_columns)
+    data = {}
+    dictionaries = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if pa.types.is_dictionary(column.type):
+            dictionaries[name] = column.dictionary.to_pylist()
+            column = column.indices
+        data[name] = column_values(column)
+
+    return json.dumps({
+        'columns': table.column_names,
+        'rowCount': table.num_rows,
+        'data': data,
+        'dictionaries': dictionaries
+    }, separators=(',', ':'))
+
+
+def arrow_ipc_stream(table, metadata=None, dictionary_columns=DICTIONARY_COLUMNS):
+    """
+    Serialize an Arrow table to an Arrow IPC stream.
+
+    The epoch-nanosecond timestamp column is sent as a native timestamp, dictionary
+    columns as Arrow dictionary arrays. Response fields (total, page, cursors, ...) are
+    stored as JSON under the 'response' key of the schema metadata.
+
+    Returns:
+        bytes: Arrow IPC stream
+    """
+    if 'timestamp' in table.column_names and pa.types.is_integer(table.schema.field('timestamp').type):
+        with span('format_timestamps'):
+            idx = table.column_names.index('timestamp')
+            table = table.set_column(idx, 'timestamp', table.column('timestamp').cast(pa.timestamp('ns')))
+    table = dictionary_encode_columns(table, dictionary_columns)
+    if metadata:
+        table = table.replace_schema_metadata({'response': json.dumps(metadata)})
+
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate_response_format(req):
+    """
+    Pick the response format of a row endpoint.
+
+    The 'format' query parameter wins; otherwise the Accept header selects the Arrow
+    IPC stream or columnar JSON media type. Defaults to a JSON array of row objects.
+    """
+    requested = (req.args.get('format') or '').lower()
+    if requested in RESPONSE_FORMATS:
+        return requested
+
+    accepted = req.accept_mimetypes
+    for mimetype, response_format in ((ARROW_STREAM_MIMETYPE, 'arrow'), (COLUMNAR_JSON_MIMETYPE, 'columnar')):
+        # Only explicit matches count, */* keeps the default JSON rows
+        if any(value == mimetype for value, _ in accepted):
+            return response_format
+    return 'json'
+
+
+def rows_response(conn, table, response_format, **fields):
+    """
+    Build the response for a result table in the requested format.
+
+    Args:
+        conn: DuckDB connection or cursor used for formatting
+        table: Arrow table with the result rows
+        response_format: One of RESPONSE_FORMATS
+        **fields: Additional response fields (total, page, ...)
+
+    Returns:
+        Response: JSON rows under 'data', columnar JSON under 'data', or an Arrow IPC stream
+    """
+    # Timed as the 'serialize' stage; timestamp formatting is its own nested stage where it
+    # is a separate step (JSON rows format timestamps within DuckDB's serialization)
+    with span('serialize'):
+        if response_format == 'arrow':
+            return Response(arrow_ipc_stream(table, fields), mimetype=ARROW_STREAM_MIMETYPE)
+        if response_format == 'columnar':
+            response = json_response({'data': columnar_json(conn, table)}, format='columnar', **fields)
+            response.mimetype = COLUMNAR_JSON_MIMETYPE
+            return response
+        return json_response({'data': arrow_to_json_records(conn, table)}, **fields)
+
+
+def json_response(raw_fields, **fields):
+    """
+    Build a JSON response from already serialized JSON fragments plus regular fields.
+
+    Args:
+        raw_fields: Dict of field name -> JSON string (or iterable of JSON chunks)
+        **fields: Regular JSON serializable fields
+
+    Returns:
+        Response: application/json response, streamed if any raw field is an iterator
+    """
+    def generate():
+        yield '{'
+        first = True
+        for name, fragment in raw_fields.items():
+            yield ('' if first else ',') + json.dumps(name) + ':'
+            first = False
+            if isinstance(fragment, str):
+                yield fragment
+            else:
+                yield from fragment
+        for name, value in fields.items():
+            yield ('' if first else ',') + json.dumps(name) + ':' + json.dumps(value)
+            first = False
+        yield '}'
+
+    if all(isinstance(fragment, str) for fragment in raw_fields.values()):
+        return Response(''.join(generate()), mimetype='application/json')
+    return Response(generate(), mimetype='application/json')
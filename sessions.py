@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from engine import ENGINE_DATABASE_DIR
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# SESSION SETTINGS
+# ============================================================================
+
+# Sessions idle for longer than this release their dataset
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', '3600'))
+
+# Cookie identifying a browser session
+SESSION_COOKIE = 'audit_session'
+
+# Loaded range of each session, shared by worker processes along with the dataset files
+SESSION_STATE_DIR = os.path.join(ENGINE_DATABASE_DIR, 'sessions') if ENGINE_DATABASE_DIR else ''
+
+
+# ============================================================================
+# DATASET SESSIONS
+# ============================================================================
+
+def session_id_for_request(req):
+    """
+    Identify the session of a request.
+
+    Browsers are identified by the session cookie, other clients by their
+    authorization token. Returns (session id, whether it is new and must be set as
+    the cookie).
+    """
+    session_id = req.cookies.get(SESSION_COOKIE)
+    if session_id:
+        return session_id, False
+    token = req.headers.get('authorization')
+    if token:
+        return 'token-' + hashlib.sha256(token.encode('utf-8')).hexdigest()[:32], False
+    return uuid.uuid4().hex, True
+
+
+class DatasetSession:
+    """Loaded range of one session: the requested dates and the shared dataset holding it"""
+
+    def __init__(self, session_id, start, end, dataset):
+        self.session_id = session_id
+        self.start = start
+        self.end = end
+        self.dataset = dataset
+        self.last_access = time.monotonic()
+
+
+class SessionRegistry:
+    """
+    Loaded range per browser session or user token.
+
+    Each session holds one reference to the engine dataset of its range, so sessions
+    loading the same range share a dataset and loading another range releases the
+    previous one. Requests check out the session's dataset with an extra reference
+    for their duration, so a dataset is never dropped under a running query. Sessions
+    idle for ttl_seconds are closed.
+
+    With a state_dir, the range of each session is also written to a state file, so
+    the next request of a session may land on any worker process: a worker that did
+    not open the session (or holds an older version of its dataset) acquires the
+    dataset from the state file, attaching the shared dataset file.
+    """
+
+    def __init__(self, engine, ttl_seconds=SESSION_TTL_SECONDS, state_dir=SESSION_STATE_DIR):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.state_dir = state_dir or None
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.metrics = {'opened': 0, 'expired': 0, 'restored': 0}
+
+    def state_path(self, session_id):
+        """State file of a session (ids are hashed, cookies are client supplied)"""
+        return os.path.join(self.state_dir, hashlib.sha256(session_id.encode('utf-8')).hexdigest() + '.json')
+
+    def _save_state(self, handle):
+        """Write a session's range to its state file, atomically through a temp file and rename"""
+        if not self.state_dir:
+            return
+        dataset = handle.dataset
+        state = {
+            'start': handle.start,
+            'end': handle.end,
+            'paths': dataset.paths,
+            'startNs': dataset.start_ns,
+            'endNs': dataset.end_ns
+        }
+        path = self.state_path(handle.session_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+    def _load_state(self, session_id):
+        """Read a session's state file, or return None if it has none"""
+        path = self.state_path(session_id)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            # Keeps the session alive for the other workers' expiry
+            os.utime(path)
+            return state
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable session state {path}: {e}")
+            return None
+
+    def _restore(self, session_id):
+        """
+        Point the session at the dataset of its state file if this worker does not hold
+        it yet (the session was opened, or its dataset appended to, by another worker).
+        """
+        state = self._load_state(session_id)
+        if state is None:
+            return
+        key = self.engine.dataset_key(state['paths'], state['startNs'], state['endNs'])
+        with self.lock:
+            handle = self.sessions.get(session_id)
+            if handle is not None and handle.dataset.key == key:
+                return
+        dataset = self.engine.acquire(state['paths'], state['startNs'], state['endNs'])
+        with self.lock:
+            previous = self.sessions.get(session_id)
+            self.sessions[session_id] = DatasetSession(session_id, state['start'], state['end'], dataset)
+            self.metrics['restored'] += 1
+        if previous is not None:
+            self.engine.release(previous.dataset)
+
+    def open(self, session_id, start, end, paths, start_ns, end_ns):
+        """
+        Point a session at the dataset of a range, loading it if no session holds it yet.
+
+        Returns:
+            DatasetSession: The session's new handle
+        """
+        dataset = self.engine.acquire(paths, start_ns, end_ns)
+        handle = DatasetSession(session_id, start, end, dataset)
+        with self.lock:
+            previous = self.sessions.get(session_id)
+            self.sessions[session_id] = handle
+            self.metrics['opened'] += 1
+        self._save_state(handle)
+        if previous is not None:
+            self.engine.release(previous.dataset)
+        self.expire()
+        return handle
+
+    def checkout(self, session_id):
+        """
+        Return the session's handle with a reference taken on its dataset, or None if the
+        session has not loaded a range. Give the reference back with checkin().
+        """
+        if self.state_dir:
+            self._restore(session_id)
+        with self.lock:
+            handle = self.sessions.get(session_id)
+            if handle is None:
+                return None
+            handle.last_access = time.monotonic()
+            self.engine.retain(handle.dataset)
+            return handle
+
+    def checkin(self, handle):
+        """Release the reference taken by checkout()"""
+        self.engine.release(handle.dataset)
+
+    def replace(self, handle, dataset):
+        """
+        Point a checked-out session at a new version of its dataset (see EventEngine.append()).
+
+        The handle takes over the caller's reference to the new dataset and releases the
+        one it held on the previous version; the session keeps its own reference.
+        """
+        previous = handle.dataset
+        if dataset is previous:
+            self.engine.release(dataset)
+            return
+        with self.lock:
+            current = self.sessions.get(handle.session_id)
+            if current is not None and current.dataset is previous:
+                # Move the session's reference over as well
+                self.engine.retain(dataset)
+                current.dataset = dataset
+            else:
+                current = None
+        handle.dataset = dataset
+        self.engine.release(previous)
+        if current is not None:
+            self.engine.release(previous)
+            self._save_state(current)
+
+    def expire(self):
+        """Close sessions idle for ttl_seconds, releasing their datasets"""
+        now = time.monotonic()
+        with self.lock:
+            expired = [
+                handle for handle in self.sessions.values()
+                if now - handle.last_access >= self.ttl_seconds
+            ]
+            for handle in expired:
+                del self.sessions[handle.session_id]
+            self.metrics['expired'] += len(expired)
+        for handle in expired:
+            logger.info(f"Closing idle session {handle.session_id[:8]} ({handle.start} to {handle.end})")
+            self.engine.release(handle.dataset)
+
+        if self.state_dir:
+            # Sessions no worker used for ttl_seconds
+            for name in os.listdir(self.state_dir):
+                path = os.path.join(self.state_dir, name)
+                try:
+                    if time.time() - os.path.getmtime(path) >= self.ttl_seconds:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def referenced_paths(self):
+        """
+        Parquet files the sessions' ranges were loaded from, those of every worker's
+        sessions with a state_dir (a worker may rebuild a session's dataset from them).
+        """
+        with self.lock:
+            paths = {path for handle in self.sessions.values() for path in handle.dataset.paths}
+        if self.state_dir:
+            for name in os.listdir(self.state_dir):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.state_dir, name)) as f:
+                        paths.update(json.load(f)['paths'])
+                except (FileNotFoundError, ValueError, KeyError):
+                    # Expired meanwhile, or unreadable (ignored by _load_state() as well)
+                    continue
+        return paths
+
+    def stats(self):
+        """Return session counters and the number of open sessions"""
+        with self.lock:
+            return {**self.metrics, 'sessions': len(self.sessions), 'ttlSeconds': self.ttl_seconds}
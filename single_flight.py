@@ -0,0 +1,162 @@
+import logging
+import threading
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# SINGLE-FLIGHT QUERIES
+# ============================================================================
+
+class QueryCancelled(Exception):
+    """A request was superseded by a newer one of the same client before its result was ready"""
+
+    status_code = 409
+
+
+class Flight:
+    """One execution of a query signature, shared by every request waiting for its result"""
+
+    def __init__(self, key, condition):
+        self.key = key
+        self.condition = condition
+        self.waiters = 0
+        self.done = False
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.cursor = None
+
+    def attach(self, cursor):
+        """
+        Register the DuckDB cursor running the flight, so it can be interrupted once no
+        request waits for the result anymore.
+
+        Raises:
+            QueryCancelled: If the flight was cancelled before it got a cursor
+        """
+        with self.condition:
+            if self.cancelled:
+                raise QueryCancelled('The request was superseded by a newer one')
+            self.cursor = cursor
+
+
+class SingleFlight:
+    """
+    Runs concurrent requests with the same signature once.
+
+    The first request for a key computes the result; requests arriving with the same
+    key while it runs wait for it and share its result (or its error), so bursts of
+    identical requests from fast clicks or several tabs cost one DuckDB execution.
+    Keys are result_cache_key() signatures: loaded dataset, range, filters, sort and
+    page.
+
+    Requests may name a client (session, tab and endpoint). A newer request of the
+    same client for a different key supersedes the previous one: that request stops
+    waiting and raises QueryCancelled, and if no other request waits for its flight,
+    the flight's cursor is interrupted.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.clients = {}
+        self.condition = threading.Condition()
+        self.metrics = {'executions': 0, 'coalesced': 0, 'superseded': 0, 'cancelled': 0}
+
+    def run(self, key, compute, client=None):
+        """
+        Return the result of compute(flight) for a key, computed once for all concurrent
+        requests of the key.
+
+        Args:
+            key: Signature of the request
+            compute: Function computing the result; it should pass its DuckDB cursor to
+                flight.attach() so a cancelled flight can be interrupted
+            client: Hashable id of the requesting client, or None if it cannot be
+                superseded
+
+        Returns:
+            tuple: (result, whether it was computed for another request)
+
+        Raises:
+            QueryCancelled: If a newer request of the client superseded this one
+        """
+        ticket = {'flight': None, 'superseded': False}
+        with self.condition:
+            if client is not None:
+                previous = self.clients.get(client)
+                if previous is not None and previous['flight'].key != key:
+                    self._supersede(previous)
+                self.clients[client] = ticket
+            flight = self.flights.get(key)
+            leader = flight is None or flight.cancelled
+            if leader:
+                flight = Flight(key, self.condition)
+                self.flights[key] = flight
+                self.metrics['executions'] += 1
+            else:
+                self.metrics['coalesced'] += 1
+            flight.waiters += 1
+            ticket['flight'] = flight
+
+        try:
+            if leader:
+                return self._lead(flight, compute), False
+            return self._follow(flight, ticket), True
+        finally:
+            with self.condition:
+                if not ticket['superseded']:
+                    flight.waiters -= 1
+                if client is not None and self.clients.get(client) is ticket:
+                    del self.clients[client]
+
+    def _lead(self, flight, compute):
+        """Compute a flight's result and hand it to the waiting requests"""
+        try:
+            flight.result = compute(flight)
+            return flight.result
+        except duckdb.InterruptException as e:
+            if not flight.cancelled:
+                raise
+            flight.error = QueryCancelled('The request was superseded by a newer one')
+            raise flight.error from e
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.condition:
+                flight.done = True
+                if self.flights.get(flight.key) is flight:
+                    del self.flights[flight.key]
+                self.condition.notify_all()
+
+    def _follow(self, flight, ticket):
+        """Wait for the result of a flight another request computes"""
+        with self.condition:
+            while not flight.done and not ticket['superseded']:
+                self.condition.wait()
+        if ticket['superseded']:
+            raise QueryCancelled('The request was superseded by a newer one')
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _supersede(self, ticket):
+        """Stop a request waiting for its flight, cancelling the flight if nobody else waits (lock held)"""
+        flight = ticket['flight']
+        ticket['superseded'] = True
+        flight.waiters -= 1
+        self.metrics['superseded'] += 1
+        if flight.waiters == 0 and not flight.done:
+            flight.cancelled = True
+            self.metrics['cancelled'] += 1
+            if flight.cursor is not None:
+                logger.info("Interrupting a superseded query")
+                flight.cursor.interrupt()
+        self.condition.notify_all()
+
+    def stats(self):
+        """Return execution, coalescing and cancellation counters"""
+        with self.condition:
+            return {**self.metrics, 'inFlight': len(self.flights)}
@@ -1,3 +1,8 @@
+# APP_MODE=production runs the multi-worker production server (see gunicorn.conf.py),
+# anything else the Flask debug server with the reloader
+if [ "${APP_MODE:-development}" = "production" ]; then
+    exec python -m gunicorn -c gunicorn.conf.py app:app
+fi
 export FLASK_APP=app.py
 export FLASK_DEBUG=1
-python -m flask run --host=0.0.0.0 --port=8888
\ No newline at end of file
+exec python -m flask run --host=0.0.0.0 --port=8888
@@ -2,6 +2,7 @@
 // MAIN APPLICATION ENTRY POINT
 // ============================================================================
 
+import { CONFIG } from "./config.js";
 import { initializeDateRange } from "./components/DateRangePicker.js";
 import { renderPlaceholderFilters } from "./components/Filters.js";
 import {
@@ -49,8 +50,7 @@ renderPlaceholderFilters();
 loadSyncStatus();
 loadData();
 
-const pollingInterval = 60000;
-setInterval(loadSyncStatus, pollingInterval);
+setInterval(() => loadSyncStatus(), CONFIG.syncStatusPollMs);
 
 window.addEventListener("beforeunload", () => {
   clearError();
@@ -2,12 +2,9 @@
 // CHART COMPONENT
 // ============================================================================
 
-import { CONFIG } from "../config.js";
 import { state } from "../state.js";
 import {
   determineTimeBucket,
-  bucketTimestamp,
-  getTopNValues,
   generateTimeBuckets,
 } from "../utils/chartHelpers.js";
 
@@ -62,7 +59,10 @@ export function updateChart() {
     return;
   }
 
-  const bucket = determineTimeBucket(state.dateRange);
+  // Use the bucket the server aggregated with, falling back to the date range
+  const bucket =
+    (state.chartData && state.chartData.bucket) ||
+    determineTimeBucket(state.dateRange);
 
   // Generate all time buckets for the full date range (fixed x-axis)
   const allTimeBuckets = generateTimeBuckets(
@@ -71,28 +71,18 @@ export function updateChart() {
     bucket
   );
 
-  // Create time series data
-  const timeSeriesData = {};
+  // Use all time buckets (from date range) sorted
+  const sortedTimes = allTimeBuckets.sort();
 
-  // Initialize all buckets with 0
-  allTimeBuckets.forEach((bucket) => {
-    timeSeriesData[bucket] = 0;
-  });
+  // Series arrive pre-aggregated from /api/chart as { name, data: { bucket: count } }
+  const seriesData = (state.chartData && state.chartData.series) || [];
 
   if (!state.selectedField) {
     // Simple time series - just count events per time bucket
-    if (state.chartData && state.chartData.length > 0) {
-      state.chartData.forEach((event) => {
-        const timeBucket = bucketTimestamp(event.timestamp, bucket);
-        timeSeriesData[timeBucket] = (timeSeriesData[timeBucket] || 0) + 1;
-      });
-    }
-
-    // Use all time buckets (from date range) sorted
-    const sortedTimes = allTimeBuckets.sort();
+    const counts = seriesData.length > 0 ? seriesData[0].data : {};
     const chartData = sortedTimes.map((time) => ({
       x: dayjs.utc(time).valueOf(),
-      y: timeSeriesData[time] || 0,
+      y: counts[time] || 0,
     }));
 
     const chartConfig = {
@@ -107,79 +97,17 @@ export function updateChart() {
 
     Highcharts.chart("chart", chartConfig);
   } else {
-    // Stacked area chart by field
-    const topValues =
-      state.chartData && state.chartData.length > 0
-        ? getTopNValues(
-            state.chartData,
-            state.selectedField,
-            CONFIG.chart.topNValues
-          )
-        : [];
-
-    // Initialize time series for each top value and "Other"
-    const seriesData = {};
-    topValues.forEach((value) => {
-      seriesData[value] = {};
-      // Initialize all buckets with 0 for each series
-      allTimeBuckets.forEach((bucket) => {
-        seriesData[value][bucket] = 0;
-      });
-    });
-    seriesData["Other"] = {};
-    allTimeBuckets.forEach((bucket) => {
-      seriesData["Other"][bucket] = 0;
-    });
-
-    // Aggregate data
-    if (state.chartData && state.chartData.length > 0) {
-      state.chartData.forEach((event) => {
-        const timeBucket = bucketTimestamp(event.timestamp, bucket);
-        const fieldValue = event[state.selectedField] || "Unknown";
-        const seriesKey = topValues.includes(fieldValue) ? fieldValue : "Other";
-
-        seriesData[seriesKey][timeBucket] =
-          (seriesData[seriesKey][timeBucket] || 0) + 1;
-      });
-    }
-
-    // Use all time buckets (from date range) sorted
-    const sortedTimes = allTimeBuckets.sort();
-
-    // Convert to Highcharts series format
-    const series = [];
-
-    // Add top values first
-    topValues.forEach((value) => {
+    // Stacked chart by field - top values first, then "Other" if the server grouped any
+    const series = seriesData.map((entry) => {
       const data = sortedTimes.map((time) => ({
         x: dayjs.utc(time).valueOf(),
-        y: seriesData[value][time] || 0,
+        y: entry.data[time] || 0,
       }));
-      series.push({
-        name: value,
-        data: data,
-      });
+      return entry.name === "Other"
+        ? { name: entry.name, data: data, color: "#cccccc" }
+        : { name: entry.name, data: data };
     });
 
-    // Add "Other" if there are more than topNValues unique values
-    const totalUniqueValues =
-      state.chartData && state.chartData.length > 0
-        ? new Set(
-            state.chartData.map((e) => e[state.selectedField] || "Unknown")
-          ).size
-        : 0;
-    if (totalUniqueValues > CONFIG.chart.topNValues) {
-      const data = sortedTimes.map((time) => ({
-        x: dayjs.utc(time).valueOf(),
-        y: seriesData["Other"][time] || 0,
-      }));
-      series.push({
-        name: "Other",
-        data: data,
-        color: "#cccccc",
-      });
-    }
-
     const chartConfig = {
       ...getBaseChartConfig("column", { stacking: "normal" }),
       series: series,
@@ -11,7 +11,7 @@ import {
   highlightText,
   getFilename,
 } from "../utils/helpers.js";
-import { applyFilters } from "../services/api.js";
+import { applyFilters, searchColumnValues } from "../services/api.js";
 
 // Helper to render a single placeholder filter
 function renderPlaceholderFilter(column, container) {
@@ -125,10 +125,14 @@ function renderFilterControl(column, container) {
 
   // Use availableColumns for count (shows scoped count based on filters)
   const availableCount = state.availableColumns[column]?.values.length || 0;
-  const totalCount = state.columns[column]?.values.length || 0;
+  // Distinct count from the column statistics (values only lists the first page of large columns)
+  const isComplete = state.columns[column]?.complete !== false;
+  const totalCount =
+    state.columns[column]?.distinctCount ??
+    (state.columns[column]?.values.length || 0);
 
   // Show both available and total if they differ
-  if (availableCount < totalCount) {
+  if (isComplete && availableCount < totalCount) {
     label.innerHTML += `<span class="filter-count">(${availableCount} of ${totalCount})</span>`;
   } else {
     label.innerHTML += `<span class="filter-count">(${totalCount})</span>`;
@@ -179,6 +183,7 @@ function renderFilterControl(column, container) {
     const [searchTerm, setSearchTerm] = useState("");
     const [selectedValues, setSelectedValues] = useState([]);
     const [open, setOpen] = useState(false);
+    const [searchMatches, setSearchMatches] = useState([]);
     const selectRef = useRef(null);
     const containerRef = useRef(null);
     const openTimeRef = useRef(0);
@@ -233,13 +238,64 @@ function renderFilterControl(column, container) {
       }
     }, [open]);
 
+    // Columns with more values than listed are searched on the server
+    useEffect(() => {
+      const term = searchTerm.trim();
+      if (
+        state.columns[column]?.complete !== false ||
+        !term ||
+        isRegexPattern(term)
+      ) {
+        setSearchMatches([]);
+        return;
+      }
+
+      let cancelled = false;
+      const timer = setTimeout(async () => {
+        try {
+          const result = await searchColumnValues(column, term);
+          if (!cancelled) {
+            setSearchMatches(
+              result.values.map((value, index) => ({
+                value,
+                count: result.counts[index],
+              }))
+            );
+          }
+        } catch (error) {
+          console.error("Error searching column values:", error);
+        }
+      }, CONFIG.valueSearchDebounceMs);
+
+      return () => {
+        cancelled = true;
+        clearTimeout(timer);
+      };
+    }, [searchTerm]);
+
     // Build options list using availableColumns (scoped to current filters)
     const availableValues = state.availableColumns[column]?.values || [];
-    let options = availableValues.map((value) => ({
+    const availableCounts = state.availableColumns[column]?.counts || [];
+    let options = availableValues.map((value, index) => ({
       label: value,
       value: value,
+      count: availableCounts[index],
     }));
 
+    // Add server-side search matches beyond the listed values
+    if (searchMatches.length) {
+      const listed = new Set(availableValues);
+      options = options.concat(
+        searchMatches
+          .filter((match) => !listed.has(match.value))
+          .map((match) => ({
+            label: match.value,
+            value: match.value,
+            count: match.count,
+          }))
+      );
+    }
+
     // Add substring or regex search option at the top if there's a search term
     if (searchTerm && searchTerm.trim()) {
       const isRegex = isRegexPattern(searchTerm);
@@ -546,6 +602,17 @@ function renderFilterControl(column, container) {
       optionRender: (option) => {
         const value = option.label;
 
+        // Number of events matching this value under the other filters
+        const count = option.data?.count;
+        const countElement =
+          count !== undefined
+            ? React.createElement(
+                "span",
+                { key: "count", className: "custom-option-count" },
+                count.toLocaleString()
+              )
+            : null;
+
         // Special rendering for filename (file path) - show filename and path separately
         if (column === "filename" && !option.data?.isSubstringSearch) {
           const filename = getFilename(value);
@@ -558,7 +625,14 @@ function renderFilterControl(column, container) {
                 key: "name",
                 className: "custom-option-name",
               },
-              highlightText(filename, searchTerm)
+              [
+                React.createElement(
+                  "span",
+                  { key: "text" },
+                  highlightText(filename, searchTerm)
+                ),
+                countElement,
+              ]
             ),
             React.createElement(
               "div",
@@ -572,7 +646,14 @@ function renderFilterControl(column, container) {
         }
 
         // Default rendering for all fields with highlighting
-        return React.createElement("div", {}, highlightText(value, searchTerm));
+        return React.createElement("div", { className: "custom-option-row" }, [
+          React.createElement(
+            "span",
+            { key: "text" },
+            highlightText(value, searchTerm)
+          ),
+          countElement,
+        ]);
       },
       onChange: (values) => {
         // Check if an item was removed (values count decreased)
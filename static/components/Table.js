@@ -198,6 +198,7 @@ export function updateTable(total) {
             state.sortColumn = newSortColumn;
             state.sortOrder = newSortOrder;
             state.currentPage = 1;
+            state.pageCursor = null;
             sortChanged = true;
             needsUpdate = true;
           }
@@ -209,6 +210,14 @@ export function updateTable(total) {
           pagination.current &&
           pagination.current !== state.currentPage
         ) {
+          // Moving by one page can seek from the current page's first/last row
+          if (pagination.current === state.currentPage + 1) {
+            state.pageCursor = state.nextCursor;
+          } else if (pagination.current === state.currentPage - 1) {
+            state.pageCursor = state.prevCursor;
+          } else {
+            state.pageCursor = null;
+          }
           state.currentPage = pagination.current;
           needsUpdate = true;
         }
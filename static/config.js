@@ -10,6 +10,20 @@ export const CONFIG = {
   defaultSortOrder: "DESC",
   defaultDateRangeDays: 30,
 
+  // Response format of row endpoints: "json" (row objects) or "columnar"
+  // (one array per column, low-cardinality columns dictionary-encoded)
+  responseFormat: "columnar",
+
+  // Values fetched per search of a high-cardinality filter column, and the
+  // delay (ms) after the last keystroke before searching
+  valueSearchLimit: 100,
+  valueSearchDebounceMs: 250,
+
+  // Sync status polling interval (ms); while a sync runs the status is
+  // long-polled instead, each request held up to syncStatusWaitSeconds
+  syncStatusPollMs: 60000,
+  syncStatusWaitSeconds: 25,
+
   // Columns to exclude from all filters
   excludeColumns: [
     "uuid",
@@ -2,59 +2,197 @@
 // API SERVICE
 // ============================================================================
 
+import { CONFIG } from "../config.js";
 import { state, BASE_PATH } from "../state.js";
-import { cleanFilters } from "../utils/helpers.js";
-import { showLoading, showError, clearError } from "../utils/ui.js";
+import { cleanFilters, decodeColumnarRows } from "../utils/helpers.js";
+import { determineTimeBucket } from "../utils/chartHelpers.js";
+import {
+  showLoading,
+  showError,
+  clearError,
+  showLoadProgress,
+  hideLoadProgress,
+} from "../utils/ui.js";
 import { renderFilters } from "../components/Filters.js";
 import { renderFieldSelector } from "../components/FieldSelector.js";
 import { renderSyncData } from "../components/SyncButton.js";
 import { updateChart } from "../components/Chart.js";
 import { updateTable } from "../components/Table.js";
 
+// Background load of the selected range (see POST /api/jobs)
+let loadJob = null;
+
+// Identifies this tab, so the server cancels its superseded queries only
+const CLIENT_ID = Math.random().toString(36).slice(2) + Date.now().toString(36);
+
+// Controllers of the latest /api/query and /api/filtered-columns requests
+const latestRequests = {};
+
+/**
+ * POST a JSON body and parse the JSON response, aborting the previous request
+ * of the same kind if it is still running. Returns { response, result }, or
+ * null if a newer request superseded this one.
+ */
+async function postLatest(kind, url, body) {
+  latestRequests[kind]?.abort();
+  const controller = new AbortController();
+  latestRequests[kind] = controller;
+  try {
+    const response = await fetch(url, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "X-Client-Id": CLIENT_ID,
+      },
+      body: JSON.stringify(body),
+      signal: controller.signal,
+    });
+    const result = await response.json();
+    return { response, result };
+  } catch (error) {
+    if (error.name === "AbortError") {
+      return null;
+    }
+    throw error;
+  } finally {
+    if (latestRequests[kind] === controller) {
+      delete latestRequests[kind];
+    }
+  }
+}
+
+function formatBytes(bytes) {
+  if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(0)} KB`;
+  return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+}
+
+function describeLoadProgress(job) {
+  if (job.status === "queued" || job.status === "listing") {
+    return "Listing files...";
+  }
+  const parts = [
+    `Loaded ${job.filesLoaded}/${job.filesTotal} files`,
+    `${job.rowsLoaded.toLocaleString()} events`,
+  ];
+  if (job.status === "downloading" && job.bytesExpected) {
+    parts.push(
+      `downloading ${formatBytes(job.bytesDownloaded)} of ${formatBytes(job.bytesExpected)}`
+    );
+  }
+  if (job.etaSeconds !== null) {
+    parts.push(`about ${Math.ceil(job.etaSeconds)}s left`);
+  }
+  return parts.join(", ");
+}
+
+async function cancelLoadJob() {
+  const job = loadJob;
+  if (!job) return;
+  loadJob = null;
+  job.events.close();
+  hideLoadProgress();
+  await fetch(`${BASE_PATH}/api/jobs/${job.id}/cancel`, { method: "POST" });
+}
+
+async function showLoadedRange(summary) {
+  // Only the summary of the loaded range comes back, rows are read page by page
+  state.datasetSummary = summary;
+  state.filteredData = [];
+
+  await loadColumns();
+  renderFilters();
+  renderFieldSelector();
+
+  document.getElementById("chart-container").classList.remove("hidden");
+  document
+    .getElementById("table-container-wrapper")
+    .classList.remove("hidden");
+
+  await Promise.all([applyFilters(false), loadChartData()]);
+}
+
 export async function loadData() {
   if (!state.dateRange || !state.dateRange[0] || !state.dateRange[1]) {
     showError("Please select a date range");
     return;
   }
 
+  await cancelLoadJob();
   showLoading(true);
   try {
     const startDate = state.dateRange[0].format("YYYY-MM-DD");
     const endDate = state.dateRange[1].format("YYYY-MM-DD");
 
-    const response = await fetch(
-      `${BASE_PATH}/api/data?start=${startDate}&end=${endDate}`
-    );
+    const response = await fetch(`${BASE_PATH}/api/jobs`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ start: startDate, end: endDate }),
+    });
     const result = await response.json();
 
-    if (response.ok) {
-      state.data = result.data;
-      state.filteredData = result.data;
-      state.chartData = result.data;
-
-      await loadColumns();
-      renderFilters();
-      renderFieldSelector();
-
-      document.getElementById("chart-container").classList.remove("hidden");
-      document
-        .getElementById("table-container-wrapper")
-        .classList.remove("hidden");
-
-      state.currentPage = 1;
-      await applyFilters(false);
-
-      clearError();
-    } else {
+    if (!response.ok) {
       showError(result.error || "Failed to load data");
+      showLoading(false);
+      return;
     }
+    followLoadJob(result.jobId);
   } catch (error) {
     showError("Error loading data: " + error.message);
-  } finally {
     showLoading(false);
   }
 }
 
+function followLoadJob(jobId) {
+  // Progress arrives as server-sent events; the table and chart are shown as
+  // soon as the first files are loaded and refreshed once the load finished
+  const events = new EventSource(`${BASE_PATH}/api/jobs/${jobId}/events`);
+  const job = { id: jobId, events, shown: false };
+  loadJob = job;
+
+  events.addEventListener("progress", async (event) => {
+    if (loadJob !== job) return;
+    const progress = JSON.parse(event.data);
+
+    const finished = ["completed", "failed", "cancelled"].includes(
+      progress.status
+    );
+    if (finished) {
+      events.close();
+      loadJob = null;
+      hideLoadProgress();
+      if (progress.status === "failed") {
+        showError(progress.error || "Failed to load data");
+      } else if (progress.summary) {
+        state.currentPage = 1;
+        await showLoadedRange(progress.summary);
+        clearError();
+      }
+      return;
+    }
+
+    showLoadProgress(describeLoadProgress(progress), !progress.queryable, cancelLoadJob);
+    if (progress.queryable && !job.shown) {
+      job.shown = true;
+      state.currentPage = 1;
+      await showLoadedRange(progress.summary);
+      clearError();
+    } else if (progress.summary) {
+      state.datasetSummary = progress.summary;
+    }
+  });
+
+  events.onerror = () => {
+    // The stream ends after the final event; anything else lost the connection
+    if (loadJob !== job) return;
+    events.close();
+    loadJob = null;
+    hideLoadProgress();
+    showError("Lost the connection while loading data. Please try again.");
+  };
+}
+
 export async function loadColumns() {
   try {
     const response = await fetch(`${BASE_PATH}/api/columns`);
@@ -76,45 +214,102 @@ export async function loadColumns() {
   }
 }
 
+export async function searchColumnValues(column, search, offset = 0) {
+  // Page through the distinct values of columns too large to list in full
+  const params = new URLSearchParams({
+    search,
+    offset,
+    limit: CONFIG.valueSearchLimit,
+  });
+  const response = await fetch(
+    `${BASE_PATH}/api/columns/${encodeURIComponent(column)}/values?${params}`
+  );
+  const result = await response.json();
+  if (!response.ok) {
+    throw new Error(result.error || "Failed to search column values");
+  }
+  return result;
+}
+
 export async function loadAvailableColumns() {
   try {
     const cleanedFilters = cleanFilters(state.filters);
     const cleanedSubstringFilters = cleanFilters(state.substringFilters);
     const cleanedRegexFilters = cleanFilters(state.regexFilters);
 
-    const response = await fetch(`${BASE_PATH}/api/filtered-columns`, {
+    const reply = await postLatest("facets", `${BASE_PATH}/api/filtered-columns`, {
+      filters: cleanedFilters,
+      substringFilters: cleanedSubstringFilters,
+      regexFilters: cleanedRegexFilters,
+    });
+    if (!reply) {
+      return;
+    }
+    const { response, result } = reply;
+
+    if (response.ok) {
+      state.availableColumns = result.columns;
+      renderFilters();
+    }
+  } catch (error) {
+    console.error("Error loading available columns:", error);
+  }
+}
+
+export async function loadChartData() {
+  try {
+    const requestBody = {
+      bucket: determineTimeBucket(state.dateRange),
+      breakdownField: state.selectedField,
+      topN: CONFIG.chart.topNValues,
+    };
+
+    if (state.sqlQuery) {
+      requestBody.query = state.sqlQuery;
+    } else {
+      requestBody.filters = cleanFilters(state.filters);
+      requestBody.substringFilters = cleanFilters(state.substringFilters);
+      requestBody.regexFilters = cleanFilters(state.regexFilters);
+    }
+
+    const response = await fetch(`${BASE_PATH}/api/chart`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({
-        filters: cleanedFilters,
-        substringFilters: cleanedSubstringFilters,
-        regexFilters: cleanedRegexFilters,
-      }),
+      body: JSON.stringify(requestBody),
     });
 
     const result = await response.json();
 
     if (response.ok) {
-      state.availableColumns = result.columns;
-      renderFilters();
+      state.chartData = result;
+      updateChart();
+    } else {
+      console.error("Failed to load chart data:", result.error);
     }
   } catch (error) {
-    console.error("Error loading available columns:", error);
+    console.error("Error loading chart data:", error);
   }
 }
 
 export async function applyFilters(resetPage = false) {
   if (resetPage) {
     state.currentPage = 1;
+    state.pageCursor = null;
   }
+  state.sqlQuery = null;
+
+  // A cursor is only valid for the request it was set up for
+  const pageCursor = state.pageCursor;
+  state.pageCursor = null;
 
   const cleanedFilters = cleanFilters(state.filters);
   const cleanedSubstringFilters = cleanFilters(state.substringFilters);
   const cleanedRegexFilters = cleanFilters(state.regexFilters);
 
   showLoading(true);
+  let superseded = false;
   try {
     const requestBody = {
       filters: cleanedFilters,
@@ -124,19 +319,23 @@ export async function applyFilters(resetPage = false) {
       pageSize: state.pageSize,
       sortColumn: state.sortColumn,
       sortOrder: state.sortOrder,
+      cursor: pageCursor,
     };
 
-    const response = await fetch(`${BASE_PATH}/api/query`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify(requestBody),
-    });
-
-    const result = await response.json();
+    const reply = await postLatest(
+      "query",
+      `${BASE_PATH}/api/query?format=${CONFIG.responseFormat}`,
+      requestBody
+    );
+    if (!reply) {
+      // The newer request shows its own loading state
+      superseded = true;
+      return;
+    }
+    const { response, result } = reply;
 
     if (response.ok) {
+      const rows = decodeColumnarRows(result.data);
       const maxPage = Math.max(1, Math.ceil(result.total / state.pageSize));
       if (state.currentPage > maxPage) {
         state.currentPage = 1;
@@ -145,23 +344,22 @@ export async function applyFilters(resetPage = false) {
       }
 
       if (
-        (!result.data || result.data.length === 0) &&
-        result.chartData &&
-        result.chartData.length > 0 &&
-        result.total > 0
+        rows.length === 0 &&
+        result.total > 0 &&
+        state.currentPage > 1
       ) {
         state.currentPage = 1;
         applyFilters(false);
         return;
       }
 
-      state.filteredData = result.data || [];
-      state.chartData = result.chartData || result.data || [];
-      updateChart();
+      state.filteredData = rows;
+      state.nextCursor = result.nextCursor || null;
+      state.prevCursor = result.prevCursor || null;
       updateTable(result.total);
 
       if (resetPage) {
-        await loadAvailableColumns();
+        await Promise.all([loadAvailableColumns(), loadChartData()]);
       }
     } else {
       showError(result.error || "Failed to apply filters");
@@ -169,32 +367,114 @@ export async function applyFilters(resetPage = false) {
   } catch (error) {
     showError("Error applying filters: " + error.message);
   } finally {
-    showLoading(false);
+    if (!superseded) {
+      showLoading(false);
+    }
   }
 }
 
-export async function loadSyncStatus() {
+/**
+ * Load the latest sync status. With wait (seconds), the server holds the
+ * request until the status changes from the last one seen (long-poll).
+ * Returns whether the status was loaded.
+ */
+export async function loadSyncStatus(wait = 0) {
   try {
-    const response = await fetch(`${BASE_PATH}/api/sync/status`, {
-      method: "GET",
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
+    const params = new URLSearchParams();
+    if (wait && state.syncVersion) {
+      params.set("since", state.syncVersion);
+      params.set("wait", wait);
+    }
+    const query = params.toString();
+    const response = await fetch(
+      `${BASE_PATH}/api/sync/status${query ? `?${query}` : ""}`,
+      {
+        method: "GET",
+        headers: {
+          "Content-Type": "application/json",
+        },
+      }
+    );
 
     const result = await response.json();
 
     if (response.ok) {
+      const previousStatus = state.lastSyncStatus;
       state.lastSyncTime = result.updatedAt;
       state.lastSyncStatus = result.status;
+      state.syncVersion = response.headers.get("X-Sync-Version");
       renderSyncData();
       clearError();
+
+      // A sync just finished: append its events to the loaded range
+      if (
+        previousStatus &&
+        previousStatus !== "Completed" &&
+        result.status === "Completed" &&
+        state.datasetSummary
+      ) {
+        refreshData();
+      }
+      if (result.status === "InProgress") {
+        watchSyncStatus();
+      }
+      return true;
     } else {
       console.error("Failed to load sync status:", result.error);
     }
   } catch (error) {
     console.error("Error loading sync status:", error);
   }
+  return false;
+}
+
+let watchingSyncStatus = false;
+
+/**
+ * Long-poll the sync status while a sync runs, so its completion shows up
+ * right away instead of at the next regular poll.
+ */
+async function watchSyncStatus() {
+  if (watchingSyncStatus) {
+    return;
+  }
+  watchingSyncStatus = true;
+  try {
+    while (state.lastSyncStatus === "InProgress") {
+      // On errors the regular polling takes over
+      if (!(await loadSyncStatus(CONFIG.syncStatusWaitSeconds))) {
+        break;
+      }
+    }
+  } finally {
+    watchingSyncStatus = false;
+  }
+}
+
+export async function refreshData() {
+  try {
+    const response = await fetch(`${BASE_PATH}/api/data/refresh`, {
+      method: "POST",
+    });
+    const result = await response.json();
+
+    if (!response.ok) {
+      console.error("Failed to refresh data:", result.error);
+      return;
+    }
+    if (result.appended > 0) {
+      state.datasetSummary = {
+        ...state.datasetSummary,
+        total: result.total,
+        maxTimestamp: result.highWaterMark,
+      };
+      await loadColumns();
+      renderFilters();
+      await Promise.all([applyFilters(false), loadChartData()]);
+    }
+  } catch (error) {
+    console.error("Error refreshing data:", error);
+  }
 }
 
 export async function syncData() {
@@ -230,26 +510,28 @@ export async function executeSqlQuery() {
   }
 
   showLoading(true);
+  let superseded = false;
   try {
-    const response = await fetch(`${BASE_PATH}/api/query`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
+    const reply = await postLatest(
+      "query",
+      `${BASE_PATH}/api/query?format=${CONFIG.responseFormat}`,
+      {
         query: sqlQuery,
         page: state.currentPage,
         pageSize: state.pageSize,
-      }),
-    });
-
-    const result = await response.json();
+      }
+    );
+    if (!reply) {
+      superseded = true;
+      return;
+    }
+    const { response, result } = reply;
 
     if (response.ok) {
-      state.filteredData = result.data;
-      state.chartData = result.chartData || result.data;
-      updateChart();
+      state.filteredData = decodeColumnarRows(result.data);
+      state.sqlQuery = sqlQuery;
       updateTable(result.total);
+      await loadChartData();
       clearError();
     } else {
       showError(result.error || "Failed to execute query");
@@ -257,7 +539,9 @@ export async function executeSqlQuery() {
   } catch (error) {
     showError("Error executing query: " + error.message);
   } finally {
-    showLoading(false);
+    if (!superseded) {
+      showLoading(false);
+    }
   }
 }
 
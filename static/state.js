@@ -19,21 +19,26 @@ function getBasePath() {
 export const BASE_PATH = getBasePath();
 
 export const state = {
-  data: [],
-  filteredData: [],
-  chartData: [], // Separate data for chart (not paginated)
+  datasetSummary: null, // Row count, time bounds, files and columns of the loaded range from /api/data
+  filteredData: [], // Rows of the current table page
+  chartData: null, // Aggregated chart series from /api/chart
   columns: {},
   availableColumns: {}, // Dynamically scoped columns based on current filters
   columnLabels: {}, // Human-readable column labels from backend
   filters: {},
   substringFilters: {}, // Store substring (LIKE) filters separately
   regexFilters: {}, // Store regex filters separately
+  sqlQuery: null, // Custom SQL query from the SQL mode, if active
   currentPage: 1,
+  nextCursor: null, // Keyset cursor for the page after the current one
+  prevCursor: null, // Keyset cursor for the page before the current one
+  pageCursor: null, // Cursor to send with the next /api/query request
   pageSize: CONFIG.pageSize,
   dateRange: null,
   selectedField: null, // Field to split time series by
   sortColumn: CONFIG.defaultSortColumn,
   sortOrder: CONFIG.defaultSortOrder,
   lastSyncTime: null,
-  lastSyncStatus: null
+  lastSyncStatus: null,
+  syncVersion: null // X-Sync-Version of the last status, to long-poll for changes
 };
@@ -33,22 +33,6 @@ export function bucketTimestamp(timestamp, bucket) {
   }
 }
 
-// Helper function to get top N values and group others
-export function getTopNValues(data, field, n = 10) {
-  const counts = {};
-  data.forEach((event) => {
-    const value = event[field] || "Unknown";
-    counts[value] = (counts[value] || 0) + 1;
-  });
-
-  const sorted = Object.entries(counts)
-    .sort((a, b) => b[1] - a[1])
-    .map(([value]) => value);
-
-  const topN = sorted.slice(0, n);
-  return topN;
-}
-
 // Helper function to generate all time buckets within a date range
 export function generateTimeBuckets(startDate, endDate, bucket) {
   const buckets = [];
@@ -50,6 +50,29 @@ export function cleanFilters(filters) {
   return cleaned;
 }
 
+// Helper function to turn a columnar response ({columns, rowCount, data, dictionaries})
+// into row objects; arrays of row objects are returned as they are
+export function decodeColumnarRows(payload) {
+  if (!payload) return [];
+  if (Array.isArray(payload)) return payload;
+
+  const { columns, rowCount, data, dictionaries = {} } = payload;
+  const rows = new Array(rowCount);
+  for (let i = 0; i < rowCount; i++) {
+    rows[i] = {};
+  }
+  for (const column of columns) {
+    const values = data[column];
+    const dictionary = dictionaries[column];
+    for (let i = 0; i < rowCount; i++) {
+      const value = values[i];
+      rows[i][column] =
+        dictionary && value !== null ? dictionary[value] : value;
+    }
+  }
+  return rows;
+}
+
 // Helper function to highlight matching text
 export function highlightText(text, query) {
   if (!query) return text;
@@ -12,6 +12,28 @@ export function showLoading(show) {
   }
 }
 
+// Show the progress of a background load: in the loading overlay until the
+// range is queryable, then in a banner above the page
+export function showLoadProgress(message, blocking, onCancel) {
+  showLoading(blocking);
+  document.getElementById("loading-text").textContent = message;
+  const banner = document.getElementById("load-progress");
+  banner.classList.toggle("hidden", blocking);
+  document.getElementById("load-progress-text").textContent = message;
+  document.getElementById("load-progress-cancel").onclick = onCancel;
+  const overlayCancel = document.getElementById("loading-cancel");
+  overlayCancel.classList.remove("hidden");
+  overlayCancel.onclick = onCancel;
+}
+
+// Hide the load progress and restore the loading overlay
+export function hideLoadProgress() {
+  showLoading(false);
+  document.getElementById("loading-text").textContent = "Loading...";
+  document.getElementById("loading-cancel").classList.add("hidden");
+  document.getElementById("load-progress").classList.add("hidden");
+}
+
 // Show error message
 export function showError(message) {
   const container = document.getElementById("error-container");
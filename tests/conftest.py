@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app creates its stores at import time, keep them out of the real directories
+_scratch = tempfile.mkdtemp(prefix='audit-tests-')
+os.environ.setdefault('PARQUET_CACHE_DIR', os.path.join(_scratch, 'cache'))
+os.environ.setdefault('EVENT_STORE_DIR', os.path.join(_scratch, 'store'))
+os.environ.setdefault('DUCKDB_TEMP_DIRECTORY', os.path.join(_scratch, 'spill'))
+os.environ['ENGINE_DATABASE_DIR'] = ''
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as app_module  # noqa: E402
+from benchmarks.generate_events import generate_events  # noqa: E402
+from benchmarks.stub_server import StubAuditApi, create_app  # noqa: E402
+from engine import EventEngine  # noqa: E402
+from event_store import EventStore  # noqa: E402
+from file_cache import ParquetFileCache  # noqa: E402
+from pagination import CountCache  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from sessions import SessionRegistry  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+# Events of the stand-in API: one UTC day (a single store partition) in 12 chunks, so
+# chunk URLs sort out of time order (events_10 before events_2)
+STUB_ROWS = 24000
+STUB_FILES = 12
+STUB_DAY = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def serve(wsgi_app):
+    """Serve a WSGI app on a free local port in a background thread, return (base URL, server)"""
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+@pytest.fixture(scope='session')
+def stub_api(tmp_path_factory):
+    """Base URL of a local stand-in of the workspace audit API"""
+    data_dir = str(tmp_path_factory.mktemp('stub-data'))
+    generate_events(
+        data_dir, STUB_ROWS, days=1, end=STUB_DAY + timedelta(days=1), rows_per_file=STUB_ROWS // STUB_FILES
+    )
+    base_url, server = serve(create_app(StubAuditApi(data_dir, sync_seconds=0, sync_rows=0)))
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def audit_app(tmp_path, monkeypatch, stub_api):
+    """The app module with empty caches, store and datasets of its own, talking to the stand-in API"""
+    engine = EventEngine()
+    monkeypatch.setattr(app_module, 'AUDIT_API_BASE_URL', stub_api)
+    monkeypatch.setattr(app_module, 'file_cache', ParquetFileCache(cache_dir=str(tmp_path / 'cache')))
+    monkeypatch.setattr(app_module, 'event_store', EventStore(root=str(tmp_path / 'store')))
+    monkeypatch.setattr(app_module, 'engine', engine)
+    monkeypatch.setattr(app_module, 'sessions', SessionRegistry(engine, state_dir=None))
+    monkeypatch.setattr(app_module, 'count_cache', CountCache())
+    monkeypatch.setattr(app_module, 'result_cache', ResultCache())
+    monkeypatch.setattr(app_module, 'query_flights', SingleFlight())
+    return app_module
+
+
+@pytest.fixture
+def client(audit_app):
+    return audit_app.app.test_client()
+
+
+def wait_for_job(client, job_id, timeout=60):
+    """Poll an ingest job until it finished, return its last snapshot"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"Job {job_id} did not finish within {timeout}s")
+
+
+def load_range(client):
+    """Load the stand-in API's day through an ingest job, return the finished job"""
+    start = STUB_DAY.strftime('%Y-%m-%d')
+    end = (STUB_DAY + timedelta(days=1)).strftime('%Y-%m-%d')
+    response = client.post('/api/jobs', json={'start': start, 'end': end})
+    assert response.status_code == 202, response.get_json()
+    return wait_for_job(client, response.get_json()['jobId'])
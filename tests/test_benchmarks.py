@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import duckdb
+import pyarrow.parquet as pq
+
+from benchmarks.generate_events import generate_events
+from benchmarks.stub_server import StubAuditApi, create_app
+from file_cache import read_timestamp_span
+
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+END_NS = int(END.timestamp()) * 10**9
+DAY_NS = 86400 * 10**9
+
+API = '/api/workspace-audit/v1'
+
+
+def test_chunks_cover_the_span_with_the_requested_rows(tmp_path):
+    paths = generate_events(str(tmp_path), 2500, days=2, end=END, rows_per_file=1000)
+
+    assert [os.path.basename(path) for path in paths] == ['events_0.parquet', 'events_1.parquet', 'events_2.parquet']
+    assert [pq.ParquetFile(path).metadata.num_rows for path in paths] == [1000, 1000, 500]
+
+    spans = [read_timestamp_span(path) for path in paths]
+    assert END_NS - 2 * DAY_NS <= spans[0][0] and spans[-1][1] < END_NS
+    # Chunks are consecutive slices of the span
+    assert all(previous[1] < following[0] for previous, following in zip(spans, spans[1:]))
+
+    events = duckdb.connect().execute(f"SELECT * FROM read_parquet({[str(p) for p in paths]})").arrow()
+    assert events.column_names == [
+        'uuid', 'deduplicationId', 'timestamp', 'filename', 'projectId', 'projectName', 'userId', 'username',
+        'hardwareTierId', 'environmentName', 'workspaceName', 'action'
+    ]
+    assert set(events.column('action').to_pylist()) <= {'Read', 'Write'}
+    assert len(set(events.column('uuid').to_pylist())) == 2500
+    assert len(set(events.column('deduplicationId').to_pylist())) == 2500
+
+
+def test_stub_serves_the_chunks_of_a_window(tmp_path):
+    generate_events(str(tmp_path), 2000, days=2, end=END, rows_per_file=500)
+    api = StubAuditApi(str(tmp_path), sync_seconds=0, sync_rows=0)
+    client = create_app(api).test_client()
+
+    # Only the chunks overlapping the last day, under a fresh signature per call
+    first = client.get(f'{API}/events/download-urls?startTimestamp={END_NS - DAY_NS}&endTimestamp={END_NS}').get_json()
+    again = client.get(f'{API}/events/download-urls?startTimestamp={END_NS - DAY_NS}&endTimestamp={END_NS}').get_json()
+    assert [urlsplit(url).path for url in first] == ['/files/events_2.parquet', '/files/events_3.parquet']
+    assert [urlsplit(url).path for url in again] == [urlsplit(url).path for url in first]
+    assert first[0] != again[0]
+
+    response = client.get(urlsplit(first[0]).path)
+    assert response.data == (tmp_path / 'events_2.parquet').read_bytes()
+    assert client.get('/files/missing.parquet').status_code == 404
+
+
+def test_sync_writes_new_events_after_the_latest(tmp_path):
+    generate_events(str(tmp_path), 1000, days=1, end=END, rows_per_file=1000)
+    api = StubAuditApi(str(tmp_path), sync_seconds=3600, sync_rows=300)
+    client = create_app(api).test_client()
+
+    assert client.post(f'{API}/process').get_json()['status'] == 'InProgress'
+    assert client.get(f'{API}/process/latest').get_json()['status'] == 'InProgress'
+    # The sync is due from now on
+    api.sync_seconds = 0
+    assert client.get(f'{API}/process/latest').get_json()['status'] == 'Completed'
+
+    assert sorted(api.chunks) == ['events_0.parquet', 'events_1.parquet']
+    new_min, _, rows = read_timestamp_span(str(tmp_path / 'events_1.parquet'))
+    assert rows == 300 and new_min > api.chunks['events_0.parquet'][1]
@@ -0,0 +1,51 @@
+from collections import Counter
+from datetime import datetime, timezone
+
+from conftest import STUB_ROWS, load_range
+
+
+def loaded_events(audit_app, columns):
+    dataset = next(iter(audit_app.engine.datasets.values()))
+    with audit_app.engine.cursor() as conn:
+        return conn.execute(f"SELECT {columns} FROM {dataset.table}").fetchall()
+
+
+def hour_bucket(timestamp_ns):
+    return datetime.fromtimestamp(timestamp_ns / 1e9, timezone.utc).strftime('%Y-%m-%d %H:00')
+
+
+def test_events_are_counted_per_hour_of_a_one_day_range(client, audit_app):
+    assert load_range(client)['status'] == 'completed'
+
+    body = client.post('/api/chart', json={'filters': {}}).get_json()
+
+    # A one day range is bucketed by hour, like determineTimeBucket() in the UI
+    assert body['bucket'] == 'hour'
+    assert body['total'] == STUB_ROWS
+    [series] = body['series']
+    expected = Counter(hour_bucket(timestamp) for (timestamp,) in loaded_events(audit_app, 'timestamp'))
+    assert series == {'name': 'Events', 'data': dict(expected)}
+
+
+def test_breakdown_keeps_the_top_values_and_groups_the_rest(client, audit_app):
+    assert load_range(client)['status'] == 'completed'
+
+    body = client.post('/api/chart', json={'filters': {}, 'breakdownField': 'username', 'topN': 3, 'bucket': 'day'}).get_json()
+
+    counts = Counter(username for (username,) in loaded_events(audit_app, 'username'))
+    top = sorted(counts, key=lambda username: (-counts[username], username))[:3]
+    names = [series['name'] for series in body['series']]
+    assert names == top + ['Other']
+    totals = {series['name']: sum(series['data'].values()) for series in body['series']}
+    assert totals == {**{username: counts[username] for username in top}, 'Other': STUB_ROWS - sum(counts[u] for u in top)}
+
+
+def test_chart_applies_filters_and_rejects_unknown_breakdown_fields(client, audit_app):
+    assert load_range(client)['status'] == 'completed'
+
+    body = client.post('/api/chart', json={'filters': {'action': ['Write']}, 'bucket': 'day'}).get_json()
+    writes = sum(1 for (action,) in loaded_events(audit_app, 'action') if action == 'Write')
+    assert body['total'] == writes
+
+    response = client.post('/api/chart', json={'filters': {}, 'breakdownField': 'nope'})
+    assert response.status_code == 400
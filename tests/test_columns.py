@@ -0,0 +1,55 @@
+import duckdb
+
+from column_stats import compute_column_stats, lookup_column_values, merge_column_stats
+from engine import TimedCursor
+from facets import compute_facets
+
+
+def numeric_events():
+    conn = duckdb.connect()
+    conn.execute(
+        "CREATE TABLE events AS SELECT * FROM (VALUES (10, 2.5, 'b'), (9, 10.0, 'a'), (100, 2.5, 'a'), (9, -1.0, 'c')) "
+        "t(revision, score, action)"
+    )
+    return conn
+
+
+def test_column_values_sort_numerically_with_pandas_types():
+    conn = numeric_events()
+    stats = compute_column_stats(conn, 'events', {'revision': 'INTEGER', 'score': 'DOUBLE', 'action': 'VARCHAR'})
+
+    assert stats['revision']['type'] == 'int32'
+    assert stats['score']['type'] == 'float64'
+    assert stats['action']['type'] == 'object'
+    assert stats['revision']['values'] == ['9', '10', '100']
+    assert stats['score']['values'] == ['-1.0', '2.5', '10.0']
+
+    page = lookup_column_values(conn, 'events', 'revision', stats['revision']['valueTable'], limit=2)
+    assert page['values'] == ['9', '10'] and page['counts'] == [2, 1]
+
+    # Values appended later keep the numeric order
+    conn.execute("CREATE TABLE delta AS SELECT 20 AS revision, 3.0 AS score, 'a' AS action")
+    merged = merge_column_stats(conn, 'delta', stats)
+    assert merged['revision']['values'] == ['9', '10', '20', '100']
+
+
+def test_facet_values_sort_numerically():
+    facets = compute_facets(TimedCursor(numeric_events()), 'events', {'action': 'action = ?'}, ['a'])
+
+    assert facets['revision'] == {'type': 'int32', 'values': ['9', '100'], 'counts': [1, 1]}
+    assert facets['score']['values'] == ['2.5', '10.0']
+    assert facets['action']['values'] == ['a', 'b', 'c']
+
+
+def test_identifier_columns_list_their_first_values():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE events AS SELECT i AS revision, 'file' || i AS filename FROM range(3000) t(i)")
+    stats = compute_column_stats(conn, 'events', {'revision': 'BIGINT', 'filename': 'VARCHAR'})
+
+    assert stats['revision']['valueTable'] is None and stats['revision']['complete'] is False
+    assert stats['revision']['values'] == [str(i) for i in range(1000)]
+
+    conn.execute("CREATE TABLE delta AS SELECT -5 AS revision, 'file-5' AS filename")
+    merged = merge_column_stats(conn, 'delta', stats)
+    assert merged['revision']['values'][:3] == ['-5', '0', '1'] and len(merged['revision']['values']) == 1000
+    assert merged['filename']['values'][0] == 'file-5'
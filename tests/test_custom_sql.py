@@ -0,0 +1,79 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import STUB_ROWS, load_range
+from engine import CustomQueryError, EventEngine, validate_custom_query
+
+ESCAPE = "SELECT * FROM events) s; DELETE FROM events; SELECT * FROM (SELECT * FROM events"
+
+
+def loaded_rows(client):
+    return client.post('/api/query', json={'filters': {}, 'pageSize': 1}).get_json()['total']
+
+
+@pytest.mark.parametrize('query', [ESCAPE, 'DELETE FROM events', 'SELECT 1; DROP TABLE events', 'PRAGMA version'])
+def test_custom_sql_must_be_a_single_select(client, query):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/query', json={'query': query})
+    assert response.status_code == 400
+    assert client.post('/api/chart', json={'query': query}).status_code == 400
+    assert loaded_rows(client) == STUB_ROWS
+
+
+def test_custom_sql_cannot_reach_files_or_the_shared_tables(client, audit_app):
+    assert load_range(client)['status'] == 'completed'
+    table = next(iter(audit_app.engine.datasets))
+
+    response = client.post('/api/query', json={'query': f"SELECT * FROM {table}"})
+    assert 'does not exist' in response.get_json()['error']
+    response = client.post('/api/query', json={'query': "SELECT * FROM read_csv_auto('/etc/passwd')"})
+    assert 'disabled' in response.get_json()['error']
+
+
+def test_custom_sql_pages_and_sorts_on_checked_columns(client):
+    assert load_range(client)['status'] == 'completed'
+
+    query = "SELECT action, COUNT(*) AS hits FROM events GROUP BY action;"
+    response = client.post('/api/query', json={'query': query, 'sortColumn': 'hits', 'sortOrder': 'ASC'})
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert body['total'] == 2
+    counts = [row['hits'] for row in body['data']]
+    assert counts == sorted(counts) and sum(counts) == STUB_ROWS
+
+    # Unknown sort columns are ignored instead of spliced into the query
+    response = client.post('/api/query', json={'query': query, 'sortColumn': 'hits; DROP TABLE events'})
+    assert response.status_code == 200
+
+
+def test_custom_sql_chart(client):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/chart', json={'query': "SELECT * FROM events WHERE action = 'Read'", 'breakdownField': 'action'})
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert [series['name'] for series in body['series']] == ['Read']
+    assert 0 < body['total'] < STUB_ROWS
+
+
+def test_sandbox_attaches_shared_dataset_files_read_only(tmp_path):
+    path = str(tmp_path / 'events.parquet')
+    pq.write_table(pa.table({'timestamp': [1, 2, 3], 'action': ['a', 'b', 'c']}), path)
+    engine = EventEngine(database_dir=str(tmp_path / 'datasets'))
+    dataset = engine.acquire([path], 0, 10)
+
+    with engine.sandbox(dataset) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM events").fetchone() == (3,)
+        with pytest.raises(Exception, match='read-only'):
+            conn.execute("DELETE FROM dataset.events")
+    with engine.cursor() as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {dataset.table}").fetchone() == (3,)
+
+
+def test_validate_custom_query_strips_trailing_semicolons():
+    with EventEngine().cursor() as conn:
+        assert validate_custom_query(conn, ' SELECT 1 ; ') == 'SELECT 1'
+        with pytest.raises(CustomQueryError):
+            validate_custom_query(conn, 'SELECT 1; SELECT 2')
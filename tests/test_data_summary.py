@@ -0,0 +1,26 @@
+from conftest import STUB_DAY, STUB_ROWS
+
+
+def test_data_returns_a_summary_instead_of_rows(client, audit_app):
+    day = STUB_DAY.strftime('%Y-%m-%d')
+
+    response = client.get(f'/api/data?start={day}&end={day}')
+    body = response.get_json()
+    assert response.status_code == 200, body
+
+    assert 'data' not in body
+    assert body['total'] == STUB_ROWS and (body['start'], body['end']) == (day, day)
+    assert sum(file_stats['rows'] for file_stats in body['files']) == STUB_ROWS
+    assert body['minTimestamp'] == min(file_stats['minTimestamp'] for file_stats in body['files'])
+    assert body['maxTimestamp'] == max(file_stats['maxTimestamp'] for file_stats in body['files'])
+    assert body['minTimestamp'].startswith(day) and body['maxTimestamp'].startswith(day)
+
+    columns = {column['name']: column for column in body['columns']}
+    assert columns['timestamp']['type'] == 'BIGINT' and columns['action']['type'] == 'VARCHAR'
+    [dataset] = audit_app.engine.datasets.values()
+    assert list(columns) == dataset.columns
+
+
+def test_data_requires_a_range(client):
+    response = client.get('/api/data?start=2024-01-01')
+    assert response.status_code == 400
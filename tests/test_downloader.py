@@ -0,0 +1,166 @@
+import os
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from downloader import DownloadError, download_file, download_files
+from file_cache import ParquetFileCache
+
+BODY = b'x' * 4096
+
+
+class FlakyServer:
+    """
+    Local stand-in for presigned download URLs.
+
+    The first path segment picks the behaviour: ok (slow 200), fail-<n> (500 for the
+    first n requests), reset-<n> (connection reset for the first n requests), forbidden
+    (403), truncated (body cut short) and parquet (a small parquet file).
+    """
+
+    def __init__(self, parquet_body=b''):
+        self.parquet_body = parquet_body
+        self.requests = {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def handle(self, handler):
+        path = handler.path.split('?')[0]
+        with self.lock:
+            self.requests[path] = count = self.requests.get(path, 0) + 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            kind = path.strip('/').split('/')[0]
+            name, _, arg = kind.partition('-')
+            if name == 'ok':
+                time.sleep(0.1)
+                self.respond(handler, 200, BODY)
+            elif name == 'fail' and count <= int(arg):
+                self.respond(handler, 500, b'error')
+            elif name == 'reset' and count <= int(arg):
+                # Close with an RST instead of a response
+                handler.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                handler.close_connection = True
+            elif name == 'forbidden':
+                self.respond(handler, 403, b'expired')
+            elif name == 'truncated':
+                handler.send_response(200)
+                handler.send_header('Content-Length', str(len(BODY)))
+                handler.end_headers()
+                handler.wfile.write(BODY[:100])
+                handler.close_connection = True
+            elif name == 'parquet':
+                self.respond(handler, 200, self.parquet_body)
+            else:
+                self.respond(handler, 200, BODY)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    @staticmethod
+    def respond(handler, status, body):
+        handler.send_response(status)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.fixture
+def server(tmp_path):
+    parquet_path = tmp_path / 'events.parquet'
+    pq.write_table(pa.table({'timestamp': [1, 2, 3], 'action': ['a', 'b', 'c']}), parquet_path)
+    server = FlakyServer(parquet_path.read_bytes())
+    yield server
+    server.close()
+
+
+def leftover_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith('.part')]
+
+
+def test_concurrency_is_bounded(server, tmp_path):
+    downloads = [(f"{server.url}/ok/{idx}", str(tmp_path / f"{idx}.bin")) for idx in range(6)]
+
+    results, summary = download_files(downloads, concurrency=2)
+
+    assert summary['files'] == 6 and summary['failed'] == 0
+    assert server.max_active == 2
+    assert all(open(stats['path'], 'rb').read() == BODY for stats in results)
+
+
+def test_retries_server_errors_with_backoff(server, tmp_path):
+    stats = download_file(f"{server.url}/fail-2/a", str(tmp_path / 'a.bin'), backoff_seconds=0.01)
+
+    assert stats['attempts'] == 3
+    assert server.requests['/fail-2/a'] == 3
+    assert open(tmp_path / 'a.bin', 'rb').read() == BODY
+
+
+def test_retries_connection_resets(server, tmp_path):
+    stats = download_file(f"{server.url}/reset-1/a", str(tmp_path / 'a.bin'), backoff_seconds=0.01)
+
+    assert stats['attempts'] == 2
+    assert open(tmp_path / 'a.bin', 'rb').read() == BODY
+
+
+def test_gives_up_after_max_retries(server, tmp_path):
+    with pytest.raises(DownloadError):
+        download_file(f"{server.url}/fail-9/a", str(tmp_path / 'a.bin'), max_retries=2, backoff_seconds=0.01)
+
+    assert server.requests['/fail-9/a'] == 3
+
+
+def test_client_errors_are_not_retried(server, tmp_path):
+    with pytest.raises(DownloadError):
+        download_file(f"{server.url}/forbidden/a", str(tmp_path / 'a.bin'), backoff_seconds=0.01)
+
+    assert server.requests['/forbidden/a'] == 1
+    assert not os.path.exists(tmp_path / 'a.bin')
+
+
+def test_failed_download_leaves_no_partial_file(server, tmp_path):
+    with pytest.raises(DownloadError):
+        download_file(f"{server.url}/truncated/a", str(tmp_path / 'a.bin'), max_retries=1, backoff_seconds=0.01)
+
+    assert server.requests['/truncated/a'] == 2
+    assert not os.path.exists(tmp_path / 'a.bin')
+    assert leftover_files(tmp_path) == []
+
+
+def test_cached_files_are_not_downloaded_again(server, tmp_path):
+    cache = ParquetFileCache(cache_dir=str(tmp_path / 'cache'))
+    first = cache.fetch([f"{server.url}/parquet/a?signature=1"])
+    assert cache.stats()['misses'] == 1
+
+    # Presigned URLs change their signature between calls, the object stays the same
+    assert cache.fetch([f"{server.url}/parquet/a?signature=2"]) == first
+    assert cache.stats()['hits'] == 1
+
+    # A new process finds the file through the manifest
+    reopened = ParquetFileCache(cache_dir=str(tmp_path / 'cache'))
+    assert reopened.fetch([f"{server.url}/parquet/a?signature=3"]) == first
+    assert reopened.stats()['hits'] == 1
+    assert server.requests['/parquet/a'] == 1
@@ -0,0 +1,69 @@
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from engine import EventEngine, TimedCursor
+from metrics import SlowQueryLog
+
+
+def events_connection():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE events AS SELECT * FROM (VALUES ('o''brien', 1.5), ('a?b', 'nan'::DOUBLE), ('c', 3.0)) t(name, score)")
+    return conn
+
+
+def test_parameters_are_bound_not_inlined():
+    cursor = TimedCursor(events_connection())
+
+    # Quotes and placeholders inside values, list values and non-finite floats
+    rows = cursor.execute(
+        "SELECT name FROM events WHERE list_contains(?, name) OR score = ? ORDER BY name",
+        [["o'brien", 'a?b'], float('inf')]
+    ).fetchall()
+    assert rows == [('a?b',), ("o'brien",)]
+    assert cursor.execute("SELECT name FROM events WHERE isnan(score) AND score = ?", [float('nan')]).fetchall() == [('a?b',)]
+
+
+def test_slow_queries_keep_their_profiled_plan():
+    slow_queries = SlowQueryLog(threshold=0, explain=True)
+    cursor = TimedCursor(events_connection(), slow_queries=slow_queries)
+
+    cursor.execute("SELECT COUNT(*) FROM events WHERE list_contains(?, name)", [['c']])
+
+    # The pending result stays readable after profiling on a separate cursor
+    assert cursor.fetchone() == (1,)
+    entry = slow_queries.stats()['queries'][0]
+    assert entry['query'] == "SELECT COUNT(*) FROM events WHERE list_contains(?, name)"
+    assert 'SEQ_SCAN' in entry['plan']
+
+
+def test_pooled_cursors_bind_parameters():
+    engine = EventEngine()
+    with engine.cursor() as conn:
+        assert conn.execute("SELECT ? || ?", ["it's", ' bound']).fetchone() == ("it's bound",)
+
+
+def write_events(path, rows):
+    pq.write_table(pa.table({
+        'timestamp': [row[0] for row in rows],
+        'uuid': [row[1] for row in rows],
+        'deduplicationId': pa.array([row[2] for row in rows], pa.string()),
+        'action': ['Read'] * len(rows)
+    }), path)
+    return str(path)
+
+
+def test_refreshes_do_not_duplicate_events_without_deduplication_id(tmp_path):
+    loaded = [(1, 'a', 'dedup-a'), (2, 'b', None), (3, 'c', None)]
+    first = write_events(tmp_path / 'first.parquet', loaded)
+    # A re-delivery of all loaded events plus new ones, one of them without any id
+    second = write_events(tmp_path / 'second.parquet', loaded + [(4, 'd', None), (5, None, None)])
+    engine = EventEngine()
+    dataset = engine.acquire([first], 0, 10)
+
+    _, counts = engine.append(dataset, [second])
+
+    assert counts == {'fetched': 5, 'appended': 2, 'duplicates': 3}
+    with engine.cursor() as conn:
+        rows = conn.execute(f"SELECT timestamp, uuid FROM {dataset.table} ORDER BY timestamp").fetchall()
+    assert rows == [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (5, None)]
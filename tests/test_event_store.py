@@ -0,0 +1,39 @@
+import os
+from datetime import datetime, timezone
+
+import duckdb
+
+from benchmarks.generate_events import generate_events
+from event_store import EventStore
+
+DAY = datetime(2025, 10, 10, tzinfo=timezone.utc)
+
+
+def ingest_chunks(store, data_dir, num_chunks=3):
+    """Ingest chunks of one day one at a time, so each adds a file to the partition"""
+    chunks = generate_events(str(data_dir), 3000, days=1, end=DAY, rows_per_file=3000 // num_chunks)
+    for idx, path in enumerate(chunks):
+        store.ingest([(f"chunk-{idx}", path)])
+        if idx == 1:
+            loaded = store.partition_paths(0, 2**62)
+    return loaded
+
+
+def test_compaction_keeps_replaced_files_until_unreferenced(tmp_path):
+    store = EventStore(root=str(tmp_path / 'store'), compact_files=2)
+    loaded = ingest_chunks(store, tmp_path / 'data')
+
+    # The third file triggered a compaction into one file, the replaced ones are hidden but kept
+    current = store.partition_paths(0, 2**62)
+    assert len(current) == 1
+    assert store.stats()['compactions'] == 1
+    assert all(os.path.exists(path) for path in loaded)
+    assert duckdb.sql(f"SELECT COUNT(*) FROM read_parquet({current!r})").fetchone()[0] == 3000
+
+    # Retired files are kept while referenced or within the grace period
+    assert store.remove_retired(set()) == 0
+    assert store.remove_retired({loaded[0]}, grace_seconds=0) == 2
+    assert os.path.exists(loaded[0])
+    assert store.remove_retired(set(), grace_seconds=0) == 1
+    assert not any(os.path.exists(path) for path in loaded)
+    assert store.partition_paths(0, 2**62) == current
@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import serve
+from file_cache import ParquetFileCache, cache_key_for_url
+
+
+@pytest.fixture
+def objects(tmp_path):
+    """Base URL of a server of parquet objects of 100 rows each, and a counter of its requests"""
+    body = tmp_path / 'object.parquet'
+    pq.write_table(pa.table({'timestamp': list(range(100, 200)), 'action': ['Read'] * 100}), str(body))
+    requests = Counter()
+
+    def wsgi_app(environ, start_response):
+        requests[environ['PATH_INFO']] += 1
+        start_response('200 OK', [('Content-Type', 'application/octet-stream')])
+        return [body.read_bytes()]
+
+    base_url, server = serve(wsgi_app)
+    yield base_url, requests
+    server.shutdown()
+
+
+def test_presigned_signatures_do_not_change_the_cache_key():
+    assert cache_key_for_url('https://s3/bucket/a.parquet?X-Amz-Signature=1') == \
+        cache_key_for_url('https://s3/bucket/a.parquet?X-Amz-Signature=2')
+    assert cache_key_for_url('https://s3/bucket/a.parquet') != cache_key_for_url('https://s3/bucket/b.parquet')
+
+
+def test_objects_are_downloaded_once_across_signatures_and_instances(objects, tmp_path):
+    base_url, requests = objects
+    cache = ParquetFileCache(cache_dir=str(tmp_path / 'cache'))
+
+    first = cache.fetch([f"{base_url}/a.parquet?sig=1", f"{base_url}/b.parquet?sig=1"])
+    second = cache.fetch([f"{base_url}/b.parquet?sig=2", f"{base_url}/a.parquet?sig=2"])
+    assert second == first[::-1]
+    assert requests == {'/a.parquet': 1, '/b.parquet': 1}
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+    # The manifest keeps the cache, and its timestamp spans, across restarts
+    restarted = ParquetFileCache(cache_dir=str(tmp_path / 'cache'))
+    assert restarted.fetch([f"{base_url}/a.parquet?sig=3"]) == first[:1]
+    assert requests['/a.parquet'] == 1
+    [entry] = [entry for entry in restarted.entries.values() if entry['object'].endswith('/a.parquet')]
+    assert (entry['rows'], entry['minTimestamp'], entry['maxTimestamp']) == (100, 100, 199)
+
+
+def test_least_recently_used_files_are_evicted_past_max_bytes(objects, tmp_path):
+    base_url, requests = objects
+    cache = ParquetFileCache(cache_dir=str(tmp_path / 'cache'))
+    cache.fetch([f"{base_url}/a.parquet", f"{base_url}/b.parquet"])
+    cache.max_bytes = cache.stats()['bytes']
+
+    cache.fetch([f"{base_url}/a.parquet"])
+    cache.fetch([f"{base_url}/c.parquet"])
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] <= cache.max_bytes
+    assert sorted(entry['object'].rsplit('/', 1)[1] for entry in cache.entries.values()) == ['a.parquet', 'c.parquet']
+
+    cache.fetch([f"{base_url}/b.parquet"])
+    assert requests['/b.parquet'] == 2
@@ -0,0 +1,92 @@
+import functools
+import threading
+import time
+
+import duckdb
+import pytest
+
+from conftest import STUB_ROWS, load_range
+from engine import EventEngine
+from governor import InvalidSizeError, QueryTimeout, clamp, watchdog
+
+# Runs for minutes unless interrupted
+ENDLESS_QUERY = "SELECT SUM(a.i * b.i) FROM range(100000) a(i), range(100000) b(i)"
+
+
+def test_clamp_bounds_sizes_and_rejects_non_integers():
+    assert clamp('25', 100) == 25
+    assert clamp(10**9, 100) == 100
+    assert clamp(-3, 100) == 1
+    assert clamp(10**9, 0) == 10**9
+    with pytest.raises(InvalidSizeError, match='pageSize must be an integer'):
+        clamp('1e3', 100, name='pageSize')
+
+
+def test_watchdog_interrupts_only_the_late_cursor():
+    conn = duckdb.connect()
+    late, other = conn.cursor(), conn.cursor()
+    results = {}
+
+    def run_other():
+        with watchdog.deadline(other, 30):
+            time.sleep(0.3)
+            results['other'] = other.execute("SELECT 42").fetchone()[0]
+
+    thread = threading.Thread(target=run_other)
+    thread.start()
+    started = time.monotonic()
+    with pytest.raises(QueryTimeout, match='longer than 0.2s'):
+        with watchdog.deadline(late, 0.2):
+            late.execute(ENDLESS_QUERY)
+    thread.join()
+
+    assert time.monotonic() - started < 10
+    assert results['other'] == 42
+    # The cursor stays usable after the interrupt
+    assert late.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_engine_cursors_time_out():
+    engine = EventEngine()
+    with pytest.raises(QueryTimeout):
+        with engine.cursor(timeout=0.2) as conn:
+            conn.execute(ENDLESS_QUERY)
+    with engine.cursor(timeout=0.2) as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_timed_out_queries_are_503(client, audit_app, monkeypatch):
+    assert load_range(client)['status'] == 'completed'
+    engine = audit_app.engine
+    monkeypatch.setattr(engine, 'sandbox', functools.partial(EventEngine.sandbox, engine, timeout=0.2))
+
+    response = client.post('/api/query', json={'query': "SELECT * FROM events, range(1000000000) t(i)"})
+    assert response.status_code == 503
+    assert 'Narrow the date range' in response.get_json()['error']
+
+
+def test_page_and_series_sizes_are_capped(client, audit_app, monkeypatch):
+    assert load_range(client)['status'] == 'completed'
+    monkeypatch.setattr(audit_app, 'MAX_PAGE_ROWS', 30)
+    monkeypatch.setattr(audit_app, 'MAX_CHART_SERIES', 2)
+
+    body = client.post('/api/query', json={'filters': {}, 'pageSize': 10**6}).get_json()
+    assert body['pageSize'] == 30 and len(body['data']) == 30
+
+    body = client.post('/api/chart', json={'filters': {}, 'breakdownField': 'username', 'topN': 40}).get_json()
+    assert [series['name'] for series in body['series']][-1] == 'Other' and len(body['series']) == 3
+
+
+def test_exports_above_the_row_limit_are_413(client, audit_app, monkeypatch):
+    assert load_range(client)['status'] == 'completed'
+    monkeypatch.setattr(audit_app, 'MAX_EXPORT_ROWS', STUB_ROWS - 1)
+
+    for endpoint in ('/api/download/csv', '/api/download/parquet'):
+        response = client.post(endpoint, json={'filters': {}})
+        assert response.status_code == 413
+        assert f'more than the limit of {STUB_ROWS - 1}' in response.get_json()['error']
+
+    writes = client.post('/api/query', json={'filters': {'action': ['Write']}, 'pageSize': 1}).get_json()['total']
+    response = client.post('/api/download/csv', json={'filters': {'action': ['Write']}})
+    assert response.status_code == 200
+    assert response.data.count(b'\n') == writes + 1
@@ -0,0 +1,24 @@
+from conftest import STUB_ROWS, load_range
+
+
+def test_job_loads_range_in_batches(client):
+    job = load_range(client)
+    assert job['status'] == 'completed', job['error']
+    assert job['rowsLoaded'] == STUB_ROWS
+    assert job['summary']['total'] == STUB_ROWS
+    assert client.post('/api/query?format=json', json={'page': 1}).get_json()['total'] == STUB_ROWS
+
+
+def test_batched_job_survives_compaction(client, audit_app, monkeypatch):
+    # Every batch adds a part to the day's partition, the third one triggers a compaction
+    # of the parts the first batches were loaded from
+    monkeypatch.setattr(audit_app, 'INGEST_JOB_BATCH_FILES', 4)
+    audit_app.event_store.compact_files = 2
+
+    job = load_range(client)
+
+    assert audit_app.event_store.stats()['compactions'] >= 1
+    assert job['status'] == 'completed', job['error']
+    assert job['rowsLoaded'] == STUB_ROWS
+    assert job['summary']['total'] == STUB_ROWS
+    assert sum(file_stats['rows'] for file_stats in job['summary']['files']) >= STUB_ROWS
@@ -0,0 +1,68 @@
+import re
+
+from conftest import STUB_ROWS, load_range
+from metrics import PROMETHEUS_MIMETYPE, Histogram, Registry, RequestTrace
+
+
+def sample_value(text, sample):
+    """Value of one sample line of a Prometheus exposition (None if absent)"""
+    for line in text.splitlines():
+        if line.startswith(sample + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram('demo_seconds', 'Demo latency', ('endpoint',), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, endpoint='/api/"x"')
+    counter = registry.counter('demo_total', 'Demo counter')
+    counter.inc(3)
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text and '# TYPE demo_total counter' in text
+    assert sample_value(text, 'demo_seconds_bucket{endpoint="/api/\\"x\\"",le="0.1"}') == 1
+    assert sample_value(text, 'demo_seconds_bucket{endpoint="/api/\\"x\\"",le="1"}') == 2
+    assert sample_value(text, 'demo_seconds_bucket{endpoint="/api/\\"x\\"",le="+Inf"}') == 3
+    assert sample_value(text, 'demo_seconds_count{endpoint="/api/\\"x\\""}') == 3
+    assert sample_value(text, 'demo_seconds_sum{endpoint="/api/\\"x\\""}') == 5.55
+    assert sample_value(text, 'demo_total') == 3
+
+
+def test_nested_stages_count_exclusive_time():
+    trace = RequestTrace()
+    trace.enter()
+    trace.enter()
+    trace.exit('fetch', 0.3)
+    trace.exit('query', 1.0)
+
+    assert trace.stages == {'fetch': 0.3, 'query': 0.7}
+
+
+def test_queries_report_their_stages_and_feed_the_metrics(client):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/query', json={'filters': {}, 'pageSize': 25})
+    stages = dict(re.findall(r'(\w+);dur=([\d.]+)', response.headers['Server-Timing']))
+    assert {'count', 'fetch', 'serialize', 'total'} <= set(stages)
+    assert sum(float(stages[stage]) for stage in stages if stage != 'total') <= float(stages['total']) + 1
+
+    response = client.get('/metrics')
+    assert response.headers['Content-Type'] == PROMETHEUS_MIMETYPE
+    text = response.get_data(as_text=True)
+    assert sample_value(text, 'audit_request_duration_seconds_count{endpoint="/api/query",method="POST",status="200"}') >= 1
+    assert sample_value(text, 'audit_rows_returned_total{endpoint="/api/query"}') >= 25
+    assert sample_value(text, 'audit_rows_scanned_total{operation="ingest"}') >= STUB_ROWS
+    assert sample_value(text, 'audit_response_bytes_total{endpoint="/api/query"}') > 0
+
+
+def test_slow_queries_are_listed_with_their_request(client, audit_app, monkeypatch):
+    assert load_range(client)['status'] == 'completed'
+    monkeypatch.setattr(audit_app.engine.slow_queries, 'threshold', 0)
+
+    client.post('/api/query', json={'filters': {'action': ['Write']}, 'pageSize': 5})
+
+    body = client.get('/api/metrics/slow-queries').get_json()
+    assert body['thresholdSeconds'] == 0
+    assert any(entry['path'] == '/api/query' and 'LIMIT' in entry['query'] for entry in body['queries'])
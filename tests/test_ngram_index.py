@@ -0,0 +1,92 @@
+import duckdb
+import pytest
+
+from conftest import load_range
+from ngram_index import NgramIndex
+
+TERMS = ['report', 'ort', 'de', 'x', 'data/2024', 'no-such-file', 'REPORT', 'café', 'é']
+
+
+@pytest.fixture
+def events(monkeypatch):
+    # Any match count goes through the index, so every term below is resolved by it
+    monkeypatch.setattr('ngram_index.NGRAM_INDEX_MAX_SELECTIVITY', 1.0)
+    conn = duckdb.connect()
+    conn.execute("""
+        CREATE TABLE events AS
+        SELECT CASE i % 7
+            WHEN 0 THEN 'data/2024/report_' || (i % 50) || '.csv'
+            WHEN 1 THEN 'notes/readme.md'
+            WHEN 2 THEN NULL
+            WHEN 3 THEN 'x'
+            WHEN 4 THEN 'models/café_' || (i % 3) || '.pkl'
+            ELSE 'src/deploy/export_' || (i % 20) || '.py'
+        END AS filename
+        FROM range(2000) t(i)
+    """)
+    return conn
+
+
+def like_rows(conn, table, term):
+    return conn.execute(f"SELECT rowid FROM {table} WHERE filename LIKE ? ORDER BY rowid", [f'%{term}%']).fetchall()
+
+
+def index_rows(conn, table, index, term):
+    value_ids = index.search(term)
+    if value_ids is None:
+        return None
+    return conn.execute(f"SELECT rowid FROM {table} WHERE {index.condition()} ORDER BY rowid", [value_ids]).fetchall()
+
+
+@pytest.mark.parametrize('term', TERMS)
+def test_index_matches_the_same_rows_as_like(events, term):
+    index = NgramIndex.build(events, 'events', 'filename')
+
+    assert index_rows(events, 'events', index, term) == like_rows(events, 'events', term)
+
+
+def test_extended_and_reopened_indexes_match_like(events):
+    index = NgramIndex.build(events, 'events', 'filename')
+    events.execute("""
+        CREATE TABLE appended AS
+        SELECT * FROM (VALUES ('data/2025/report_new.csv', 2000), ('notes/readme.md', 2001), (NULL, 2002)) t(filename, row_id)
+    """)
+    events.execute("INSERT INTO events SELECT filename FROM appended ORDER BY row_id")
+
+    extended = index.extend(events, 'appended')
+    extended.save(events)
+    reopened = NgramIndex.open(events, 'filename', extended.rows_table)
+
+    for term in TERMS + ['2025', 'readme']:
+        assert index_rows(events, 'events', extended, term) == like_rows(events, 'events', term)
+        assert index_rows(events, 'events', reopened, term) == like_rows(events, 'events', term)
+
+
+def test_unselective_terms_fall_back_to_a_scan(events, monkeypatch):
+    monkeypatch.setattr('ngram_index.NGRAM_INDEX_MAX_SELECTIVITY', 0.05)
+    index = NgramIndex.build(events, 'events', 'filename')
+
+    assert index.search('readme') is None
+    assert index.search('7.csv') is not None
+    # LIKE wildcards are left to the LIKE scan
+    assert index.search('report_') is None and index.search('%') is None
+
+
+def test_substring_filters_return_the_same_rows_as_like(client, audit_app):
+    assert load_range(client)['status'] == 'completed'
+    [dataset] = audit_app.engine.datasets.values()
+    assert 'filename' in dataset.ngram_indexes
+    with audit_app.engine.cursor() as conn:
+        # The rarest file name, selective enough to be resolved by the index
+        term = conn.execute(
+            f"SELECT regexp_extract(filename, '/file[0-9]+[.]', 0) AS term FROM {dataset.table} "
+            f"GROUP BY term ORDER BY COUNT(*), term LIMIT 1"
+        ).fetchone()[0]
+        expected = sorted(row[0] for row in conn.execute(
+            f"SELECT uuid FROM {dataset.table} WHERE filename LIKE ?", [f'%{term}%']
+        ).fetchall())
+
+    body = client.post('/api/query', json={'filters': {}, 'substringFilters': {'filename': [term]}, 'pageSize': 1000}).get_json()
+    assert 0 < body['total'] == len(expected) < 1000
+    assert dataset.ngram_indexes['filename'].search(term) is not None
+    assert sorted(row['uuid'] for row in body['data']) == expected
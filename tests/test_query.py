@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import load_range
+
+
+@pytest.mark.parametrize('payload', [{'page': 'abc'}, {'pageSize': 'many'}, {'page': None}, {'pageSize': [10]}])
+def test_malformed_page_is_a_client_error(client, payload):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/query', json={'filters': {}, **payload})
+    assert response.status_code == 400
+    assert 'must be an integer' in response.get_json()['error']
+
+
+def test_numeric_strings_are_accepted_as_page(client):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/query', json={'filters': {}, 'page': '2', 'pageSize': '10'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['page'] == 2 and body['pageSize'] == 10
+
+
+def test_malformed_top_n_is_a_client_error(client):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/chart', json={'filters': {}, 'breakdownField': 'action', 'topN': 'ten'})
+    assert response.status_code == 400
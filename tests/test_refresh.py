@@ -0,0 +1,74 @@
+import os
+from datetime import timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.generate_events import generate_events
+from benchmarks.stub_server import StubAuditApi, create_app
+from conftest import STUB_DAY, load_range, serve
+
+ROWS = 2000
+
+
+@pytest.fixture
+def sync_api(tmp_path, monkeypatch, audit_app):
+    """A stand-in API of its own, whose chunks the test can add to"""
+    data_dir = str(tmp_path / 'stub-data')
+    generate_events(data_dir, ROWS, days=1, end=STUB_DAY + timedelta(days=1), rows_per_file=ROWS // 4)
+    api = StubAuditApi(data_dir, sync_seconds=3600, sync_rows=0)
+    base_url, server = serve(create_app(api))
+    monkeypatch.setattr(audit_app, 'AUDIT_API_BASE_URL', base_url)
+    yield api
+    server.shutdown()
+
+
+def loaded_table(audit_app):
+    [dataset] = audit_app.engine.datasets.values()
+    with audit_app.engine.cursor() as conn:
+        return conn.execute(f"SELECT * FROM {dataset.table} ORDER BY timestamp").arrow()
+
+
+def add_chunk(api, table, name):
+    pq.write_table(table, os.path.join(api.data_dir, name))
+    api.scan()
+
+
+def test_refresh_appends_only_new_events(client, audit_app, sync_api):
+    assert load_range(client)['status'] == 'completed'
+
+    body = client.post('/api/data/refresh').get_json()
+    assert (body['appended'], body['total']) == (0, ROWS)
+
+    # A chunk re-delivering the latest events next to new ones
+    loaded = loaded_table(audit_app)
+    redelivered = loaded.slice(ROWS - 10)
+    latest = pc.max(loaded.column('timestamp')).as_py()
+    new = loaded.slice(0, 25)
+    new = new.set_column(new.column_names.index('timestamp'), 'timestamp',
+                         pa.array([latest + 1000 * (idx + 1) for idx in range(25)], pa.int64()))
+    new = new.set_column(new.column_names.index('deduplicationId'), 'deduplicationId',
+                         pa.array([f'new-{idx}' for idx in range(25)]))
+    add_chunk(sync_api, pa.concat_tables([redelivered, new]), 'events_100.parquet')
+
+    body = client.post('/api/data/refresh').get_json()
+    assert (body['files'], body['fetched'], body['duplicates'], body['appended']) == (1, 35, 10, 25)
+    assert body['total'] == ROWS + 25
+    latest_row = client.post('/api/query', json={'filters': {}, 'pageSize': 1}).get_json()['data'][0]
+    assert (latest_row['deduplicationId'], latest_row['timestamp']) == ('new-24', body['highWaterMark'])
+
+    # Refreshing again finds nothing new
+    body = client.post('/api/data/refresh').get_json()
+    assert (body['appended'], body['total']) == (0, ROWS + 25)
+    assert loaded_table(audit_app).num_rows == ROWS + 25
+
+
+def test_refresh_waits_for_the_running_sync(client, sync_api):
+    assert load_range(client)['status'] == 'completed'
+    sync_api.start_sync()
+
+    response = client.post('/api/data/refresh')
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'InProgress'
@@ -0,0 +1,68 @@
+import re
+
+import duckdb
+import pytest
+
+from conftest import load_range
+from regex_engine import RegexEngine, RegexError
+
+
+@pytest.fixture
+def regex_engine():
+    conn = duckdb.connect()
+    conn.execute("""
+        CREATE TABLE events AS
+        SELECT 'user-' || (i % 40) AS username, i AS revision FROM range(400) t(i)
+        UNION ALL SELECT NULL, -1
+    """)
+    return RegexEngine(conn, 'events')
+
+
+def test_patterns_match_distinct_values_like_python(regex_engine):
+    usernames = [f'user-{i}' for i in range(40)]
+
+    matched = regex_engine.match_values('username', ['^user-1[0-9]$', '-3$'])
+    assert matched == sorted(u for u in usernames if re.search('^user-1[0-9]$', u) or re.search('-3$', u))
+    # Non-VARCHAR columns are matched on their text
+    assert regex_engine.match_values('revision', ['^39[0-9]$']) == [str(i) for i in range(390, 400)]
+
+    # The same pattern set (in any order) is a cache hit
+    assert regex_engine.match_values('username', ['-3$', '^user-1[0-9]$']) == matched
+    assert regex_engine.stats()['hits'] == 1
+
+
+def test_invalid_patterns_raise(regex_engine):
+    with pytest.raises(RegexError, match='Invalid regex pattern'):
+        regex_engine.match_values('username', ['user-(1'])
+
+
+def test_patterns_matching_too_many_values_are_evaluated_per_row(regex_engine, monkeypatch):
+    monkeypatch.setattr('regex_engine.REGEX_VALUE_LIST_LIMIT', 5)
+
+    assert regex_engine.match_values('username', ['^user-1']) is None
+    assert regex_engine.match_values('username', ['^user-1$']) == ['user-1']
+
+
+def test_regex_filters_select_the_matching_rows(client, audit_app, monkeypatch):
+    assert load_range(client)['status'] == 'completed'
+    [dataset] = audit_app.engine.datasets.values()
+    with audit_app.engine.cursor() as conn:
+        usernames = [row[0] for row in conn.execute(f"SELECT username FROM {dataset.table}").fetchall()]
+    expected = sum(1 for username in usernames if re.search('^user-1', username))
+    assert 0 < expected < len(usernames)
+
+    query = {'filters': {}, 'regexFilters': {'username': ['/^user-1']}, 'pageSize': 1}
+    assert client.post('/api/query', json=query).get_json()['total'] == expected
+
+    # Same rows when the pattern is evaluated per row instead of through the matching values
+    monkeypatch.setattr('regex_engine.REGEX_VALUE_LIST_LIMIT', 0)
+    query['regexFilters']['username'].append('/^user-1.*')
+    assert client.post('/api/query', json=query).get_json()['total'] == expected
+
+
+def test_bad_regex_patterns_are_client_errors(client):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/query', json={'filters': {}, 'regexFilters': {'username': ['/user-(1']}})
+    assert response.status_code == 400
+    assert 'Invalid regex pattern' in response.get_json()['error']
@@ -0,0 +1,62 @@
+import json
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from conftest import STUB_ROWS, load_range
+from serialization import ARROW_STREAM_MIMETYPE, COLUMNAR_JSON_MIMETYPE
+
+PAGE = {'filters': {}, 'pageSize': 50, 'sortColumn': 'timestamp', 'sortOrder': 'ASC'}
+
+
+def json_rows(client):
+    response = client.post('/api/query', json=PAGE)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def test_columnar_json_decodes_to_the_json_rows(client):
+    assert load_range(client)['status'] == 'completed'
+    rows = json_rows(client)
+
+    response = client.post('/api/query?format=columnar', json=PAGE)
+    assert response.mimetype == COLUMNAR_JSON_MIMETYPE
+    body = response.get_json()
+    assert body['format'] == 'columnar' and body['total'] == STUB_ROWS
+    columnar = body['data']
+    assert columnar['rowCount'] == 50 and set(columnar['dictionaries']) == {'action', 'username', 'projectName'}
+
+    decoded = [
+        {
+            name: columnar['dictionaries'][name][values[idx]] if name in columnar['dictionaries'] else values[idx]
+            for name, values in columnar['data'].items()
+        }
+        for idx in range(columnar['rowCount'])
+    ]
+    assert decoded == rows
+
+
+def test_arrow_stream_is_selected_by_the_accept_header(client):
+    assert load_range(client)['status'] == 'completed'
+    rows = json_rows(client)
+
+    response = client.post('/api/query', json=PAGE, headers={'Accept': ARROW_STREAM_MIMETYPE})
+    assert response.mimetype == ARROW_STREAM_MIMETYPE
+    table = ipc.open_stream(response.data).read_all()
+
+    assert json.loads(table.schema.metadata[b'response'])['total'] == STUB_ROWS
+    assert table.schema.field('timestamp').type == pa.timestamp('ns')
+    assert pa.types.is_dictionary(table.schema.field('action').type)
+    assert table.column('uuid').to_pylist() == [row['uuid'] for row in rows]
+    assert [value.isoformat(timespec='microseconds') for value in table.column('timestamp').to_pylist()] == \
+        [row['timestamp'] for row in rows]
+
+
+def test_format_parameter_wins_over_the_accept_header(client):
+    assert load_range(client)['status'] == 'completed'
+
+    response = client.post('/api/query?format=json', json=PAGE, headers={'Accept': ARROW_STREAM_MIMETYPE})
+    assert response.mimetype == 'application/json'
+    response = client.post('/api/query', json=PAGE, headers={'Accept': '*/*'})
+    assert response.mimetype == 'application/json'
+    assert len(response.get_json()['data']) == 50
@@ -0,0 +1,49 @@
+from conftest import load_range
+from result_cache import ResultCache, result_cache_key
+
+
+def test_keys_ignore_dict_order_but_not_values():
+    assert result_cache_key('query', {'action': ['Read'], 'username': ['a']}) == \
+        result_cache_key('query', {'username': ['a'], 'action': ['Read']})
+    assert result_cache_key('query', {'action': ['Read']}) != result_cache_key('query', {'action': ['Write']})
+    assert result_cache_key('query', 1, 2) != result_cache_key('chart', 1, 2)
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes():
+    cache = ResultCache(max_bytes=40)
+    cache.put('a', b'x' * 10, 'application/json')
+    cache.put('b', b'x' * 10, 'application/json')
+    cache.put('c', b'x' * 10, 'application/json')
+    assert cache.get('a') == (b'x' * 10, 'application/json')
+
+    cache.put('d', b'x' * 10, 'application/json')
+    cache.put('e', b'x' * 10, 'application/json')
+    # 'a' was used after 'b', so 'b' is the least recently used entry
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (4, 40, 1)
+    assert (stats['hits'], stats['misses']) == (3, 1)
+
+
+def test_oversized_responses_are_not_cached():
+    cache = ResultCache(max_bytes=40)
+    cache.put('big', b'x' * 11, 'application/json')
+
+    assert cache.get('big') is None
+    assert cache.stats()['skipped'] == 1 and cache.stats()['bytes'] == 0
+
+
+def test_repeated_queries_are_served_from_the_cache(client, audit_app):
+    assert load_range(client)['status'] == 'completed'
+    payload = {'filters': {'action': ['Read'], 'username': []}, 'pageSize': 20}
+
+    first = client.post('/api/query', json=payload)
+    again = client.post('/api/query', json={'pageSize': 20, 'filters': {'username': [], 'action': ['Read']}})
+    assert (first.headers['X-Cache'], again.headers['X-Cache']) == ('MISS', 'HIT')
+    assert again.get_json() == first.get_json()
+
+    other_page = client.post('/api/query', json={**payload, 'page': 2})
+    assert other_page.headers['X-Cache'] == 'MISS'
+    assert client.get('/api/cache/stats').get_json()['resultCache']['hits'] == 1
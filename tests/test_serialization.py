@@ -0,0 +1,51 @@
+import json
+from datetime import datetime, timezone
+
+import duckdb
+import pyarrow as pa
+
+from serialization import arrow_to_json_records, format_epoch_ns, iter_json_records, table_to_iso_timestamps
+
+# Epoch nanoseconds around the epoch, a leap day and a sub-microsecond remainder
+TIMESTAMPS = [0, 1_709_164_800_123_456_789, 1_700_000_000_000_000_000, -1_000_000_000]
+
+
+def python_iso(timestamp_ns):
+    moment = datetime.fromtimestamp(timestamp_ns // 1000 / 1e6, timezone.utc)
+    return moment.replace(tzinfo=None).strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+
+def test_timestamps_are_formatted_in_utc_by_duckdb_and_python():
+    conn = duckdb.connect()
+    table = pa.table({'timestamp': pa.array(TIMESTAMPS + [None], pa.int64())})
+
+    formatted = table_to_iso_timestamps(conn, table).column('timestamp').to_pylist()
+    assert formatted == [python_iso(value) for value in TIMESTAMPS] + [None]
+    assert [format_epoch_ns(value) for value in TIMESTAMPS + [None]] == formatted
+    assert formatted[1] == '2024-02-29T00:00:00.123456'
+
+
+def test_json_records_match_the_rows():
+    conn = duckdb.connect()
+    table = pa.table({
+        'timestamp': pa.array(TIMESTAMPS, pa.int64()),
+        'action': ['Read', 'Write', None, 'say "hi"\n'],
+        'size': [1, 2, 3, None]
+    })
+
+    rows = json.loads(arrow_to_json_records(conn, table))
+    assert rows == [
+        {'timestamp': python_iso(timestamp), 'action': action, 'size': size}
+        for timestamp, action, size in zip(TIMESTAMPS, table.column('action').to_pylist(), [1, 2, 3, None])
+    ]
+
+
+def test_json_records_are_streamed_per_record_batch(monkeypatch):
+    monkeypatch.setattr('serialization.JSON_BATCH_ROWS', 100)
+    conn = duckdb.connect()
+
+    chunks = list(iter_json_records(conn, "SELECT i AS id FROM range(250) t(i)"))
+    assert len(chunks) == 5
+    assert [row['id'] for row in json.loads(''.join(chunks))] == list(range(250))
+
+    assert ''.join(iter_json_records(conn, "SELECT 1 AS id WHERE false")) == '[]'
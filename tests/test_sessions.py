@@ -0,0 +1,84 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import load_range
+from engine import EventEngine
+from sessions import SESSION_COOKIE, SessionRegistry
+
+
+@pytest.fixture
+def parquet_files(tmp_path):
+    paths = []
+    for idx in range(2):
+        path = str(tmp_path / f'events_{idx}.parquet')
+        pq.write_table(pa.table({'timestamp': [idx * 10 + 1, idx * 10 + 2], 'action': ['Read', 'Write']}), path)
+        paths.append(path)
+    return paths
+
+
+def test_sessions_of_the_same_range_share_one_dataset(parquet_files):
+    engine = EventEngine(ttl_seconds=0)
+    sessions = SessionRegistry(engine, state_dir=None)
+
+    first = sessions.open('a', '2024-01-01', '2024-01-01', parquet_files, 0, 100)
+    second = sessions.open('b', '2024-01-01', '2024-01-01', list(reversed(parquet_files)), 0, 100)
+    assert second.dataset is first.dataset and first.dataset.refs == 2
+    assert len(engine.datasets) == 1
+
+    # Loading another range releases the shared dataset only once
+    sessions.open('a', '2024-01-01', '2024-01-02', parquet_files[:1], 0, 100)
+    assert first.dataset.refs == 1 and first.dataset.table in engine.datasets
+
+    handle = sessions.checkout('b')
+    assert handle.dataset is first.dataset and first.dataset.refs == 2
+    sessions.checkin(handle)
+    assert first.dataset.refs == 1
+
+
+def test_idle_sessions_expire_and_release_their_dataset(parquet_files):
+    engine = EventEngine(ttl_seconds=0)
+    sessions = SessionRegistry(engine, ttl_seconds=3600, state_dir=None)
+    dataset = sessions.open('a', '2024-01-01', '2024-01-01', parquet_files, 0, 100).dataset
+
+    sessions.expire()
+    assert sessions.checkout('a') is not None
+    sessions.checkin(sessions.sessions['a'])
+
+    sessions.ttl_seconds = 0
+    sessions.expire()
+    assert sessions.checkout('a') is None
+    assert sessions.stats()['expired'] == 1
+    # Unreferenced and idle for the engine's ttl, the dataset is dropped
+    assert dataset.table not in engine.datasets
+
+
+def test_sessions_are_restored_by_other_workers(parquet_files, tmp_path):
+    state_dir = str(tmp_path / 'sessions')
+    database_dir = str(tmp_path / 'datasets')
+    worker = SessionRegistry(EventEngine(database_dir=database_dir), state_dir=state_dir)
+    other_engine = EventEngine(database_dir=database_dir)
+    other_worker = SessionRegistry(other_engine, state_dir=state_dir)
+
+    worker.open('a', '2024-01-01', '2024-01-01', parquet_files, 0, 100)
+    handle = other_worker.checkout('a')
+    assert (handle.start, handle.end) == ('2024-01-01', '2024-01-01')
+    with other_engine.cursor() as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {handle.dataset.table}").fetchone() == (4,)
+    other_worker.checkin(handle)
+    assert other_worker.stats()['restored'] == 1
+    assert set(parquet_files) <= other_worker.referenced_paths()
+
+
+def test_browser_sessions_loading_one_range_share_its_dataset(audit_app):
+    first, second = audit_app.app.test_client(), audit_app.app.test_client()
+    first.set_cookie(SESSION_COOKIE, 'first-browser')
+    second.set_cookie(SESSION_COOKIE, 'second-browser')
+
+    assert load_range(first)['status'] == 'completed'
+    assert load_range(second)['status'] == 'completed'
+
+    assert len(audit_app.engine.datasets) == 1
+    assert audit_app.sessions.stats()['sessions'] == 2
+    assert first.post('/api/query', json={'filters': {}}).get_json() == \
+        second.post('/api/query', json={'filters': {}}).get_json()
@@ -0,0 +1,140 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+import pytest
+
+from conftest import load_range
+from sessions import SESSION_COOKIE
+from single_flight import QueryCancelled, SingleFlight
+
+# Runs for minutes unless interrupted
+ENDLESS_QUERY = "SELECT SUM(a.i * b.i) FROM range(100000) a(i), range(100000) b(i)"
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'condition not reached in time'
+        time.sleep(0.01)
+
+
+def test_concurrent_requests_of_a_key_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def compute(flight):
+        executions.append(flight.key)
+        release.wait()
+        return {'rows': 42}
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(flights.run, 'page-1', compute)]
+        wait_until(lambda: flights.stats()['inFlight'] == 1)
+        futures += [pool.submit(flights.run, 'page-1', compute) for _ in range(5)]
+        wait_until(lambda: flights.stats()['coalesced'] == 5)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert executions == ['page-1']
+    assert results[0] == ({'rows': 42}, False)
+    assert all(result == ({'rows': 42}, True) for result in results[1:])
+    assert results[1][0] is results[0][0]
+
+    # Finished flights are not cached, the next request runs again
+    assert flights.run('page-1', compute) == ({'rows': 42}, False)
+    assert flights.stats()['executions'] == 2 and flights.stats()['inFlight'] == 0
+
+
+def test_errors_are_shared_with_the_waiting_requests():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def compute(flight):
+        release.wait()
+        raise ValueError('bad filter')
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.run, 'key', compute)
+        wait_until(lambda: flights.stats()['inFlight'] == 1)
+        follower = pool.submit(flights.run, 'key', compute)
+        wait_until(lambda: flights.stats()['coalesced'] == 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match='bad filter'):
+                future.result()
+
+
+def test_a_newer_request_of_the_client_interrupts_the_previous_query():
+    flights = SingleFlight()
+    conn = duckdb.connect()
+
+    def endless(flight):
+        cursor = conn.cursor()
+        flight.attach(cursor)
+        return cursor.execute(ENDLESS_QUERY).fetchone()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        previous = pool.submit(flights.run, 'page-1', endless, client='tab')
+        wait_until(lambda: flights.stats()['inFlight'] == 1)
+        time.sleep(0.1)
+        assert flights.run('page-2', lambda flight: 'page 2', client='tab') == ('page 2', False)
+        with pytest.raises(QueryCancelled):
+            previous.result(timeout=30)
+
+    stats = flights.stats()
+    assert (stats['superseded'], stats['cancelled'], stats['inFlight']) == (1, 1, 0)
+
+
+def test_superseded_requests_leave_flights_other_requests_wait_for():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def compute(flight):
+        release.wait()
+        return 'page 1'
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.run, 'page-1', compute, client='tab-1')
+        wait_until(lambda: flights.stats()['inFlight'] == 1)
+        other_tab = pool.submit(flights.run, 'page-1', compute, client='tab-2')
+        wait_until(lambda: flights.stats()['coalesced'] == 1)
+
+        # A waiting follower gives up its place, the flight keeps running for the leader
+        flights.run('page-2', lambda flight: 'page 2', client='tab-2')
+        with pytest.raises(QueryCancelled):
+            other_tab.result(timeout=10)
+        release.set()
+        assert leader.result(timeout=10) == ('page 1', False)
+
+    assert flights.stats()['cancelled'] == 0
+
+
+def test_identical_queries_are_coalesced_over_http(audit_app, monkeypatch):
+    first, second = audit_app.app.test_client(), audit_app.app.test_client()
+    for client in (first, second):
+        client.set_cookie(SESSION_COOKIE, 'one-browser')
+    assert load_range(first)['status'] == 'completed'
+
+    release = threading.Event()
+    rows_response = audit_app.rows_response
+
+    def held_rows_response(*args, **kwargs):
+        release.wait()
+        return rows_response(*args, **kwargs)
+
+    monkeypatch.setattr(audit_app, 'rows_response', held_rows_response)
+    payload = {'filters': {'action': ['Write']}, 'pageSize': 10}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(first.post, '/api/query', json=payload)
+        wait_until(lambda: audit_app.query_flights.stats()['inFlight'] == 1)
+        follower = pool.submit(second.post, '/api/query', json=payload)
+        wait_until(lambda: audit_app.query_flights.stats()['coalesced'] == 1)
+        release.set()
+        responses = [leader.result(timeout=30), follower.result(timeout=30)]
+
+    assert [response.headers['X-Cache'] for response in responses] == ['MISS', 'COALESCED']
+    assert responses[0].get_json() == responses[1].get_json()
+    assert audit_app.query_flights.stats()['executions'] == 1
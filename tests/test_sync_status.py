@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stub_server import StubAuditApi, create_app
+from conftest import serve
+from upstream import SyncStatusCache, sync_status_version
+
+
+class Upstream:
+    """Sync status API stand-in counting its calls"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.status = {'status': 'Completed', 'updatedAt': '2024-01-01T00:00:00Z'}
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def fetch(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            return False, None, 'upstream down', 502
+        return True, dict(self.status), None, 200
+
+
+def test_concurrent_polls_share_one_fetch():
+    cache = SyncStatusCache(ttl_seconds=60)
+    upstream = Upstream(delay=0.3)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.get('key', upstream.fetch), range(8)))
+
+    assert upstream.calls == 1
+    assert all(result[:4] == (True, upstream.status, None, 200) for result in results)
+    assert [result[4] for result in results].count(False) == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] + stats['hits'] == 7
+
+
+def test_statuses_expire_and_failures_are_not_cached():
+    cache = SyncStatusCache(ttl_seconds=0.1)
+    upstream = Upstream()
+
+    cache.get('key', upstream.fetch)
+    assert cache.get('key', upstream.fetch)[4] is True
+    time.sleep(0.15)
+    assert cache.get('key', upstream.fetch)[4] is False
+    assert upstream.calls == 2
+
+    cache.invalidate('key')
+    upstream.fail = True
+    assert cache.get('key', upstream.fetch)[:4] == (False, None, 'upstream down', 502)
+    upstream.fail = False
+    assert cache.get('key', upstream.fetch)[0] is True
+    assert upstream.calls == 4
+
+
+def test_long_polls_return_on_change_without_extra_fetches():
+    cache = SyncStatusCache(ttl_seconds=0.1)
+    upstream = Upstream()
+    since = sync_status_version(upstream.status)
+
+    started = time.monotonic()
+    assert cache.wait_for_change('key', upstream.fetch, since, 0.3)[1] == upstream.status
+    assert 0.3 <= time.monotonic() - started < 2
+
+    def change():
+        time.sleep(0.4)
+        upstream.status = {'status': 'InProgress', 'updatedAt': '2024-01-01T00:01:00Z'}
+
+    calls = upstream.calls
+    threading.Thread(target=change).start()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: cache.wait_for_change('key', upstream.fetch, since, 5), range(5)))
+
+    assert all(result[1]['status'] == 'InProgress' for result in results)
+    # One fetch per expired TTL, whatever the number of waiters
+    assert upstream.calls - calls <= 8
+
+
+@pytest.fixture
+def sync_api(audit_app, monkeypatch, tmp_path):
+    api = StubAuditApi(str(tmp_path), sync_seconds=3600, sync_rows=0)
+    base_url, server = serve(create_app(api))
+    monkeypatch.setattr(audit_app, 'AUDIT_API_BASE_URL', base_url)
+    monkeypatch.setattr(audit_app, 'sync_status_cache', SyncStatusCache(ttl_seconds=60))
+    yield api
+    server.shutdown()
+
+
+def test_sync_status_is_cached_until_a_sync_starts(client, audit_app, sync_api):
+    first = client.get('/api/sync/status')
+    again = client.get('/api/sync/status')
+    assert (first.headers['X-Cache'], again.headers['X-Cache']) == ('MISS', 'HIT')
+    assert first.get_json()['status'] == 'Completed'
+
+    assert client.post('/api/sync').get_json()['status'] == 'InProgress'
+    response = client.get('/api/sync/status')
+    assert response.headers['X-Cache'] == 'MISS' and response.get_json()['status'] == 'InProgress'
+    assert audit_app.sync_status_cache.stats()['misses'] == 2
+
+
+def test_sync_status_long_poll_waits_for_the_sync_to_complete(client, audit_app, sync_api, monkeypatch):
+    monkeypatch.setattr(audit_app, 'sync_status_cache', SyncStatusCache(ttl_seconds=0.1))
+    client.post('/api/sync')
+    version = client.get('/api/sync/status').headers['X-Sync-Version']
+    assert version.startswith('InProgress|')
+
+    started = time.monotonic()
+    assert client.get(f'/api/sync/status?since={version}&wait=0.3').headers['X-Sync-Version'] == version
+    assert time.monotonic() - started >= 0.3
+
+    threading.Timer(0.3, lambda: setattr(sync_api, 'sync_seconds', 0)).start()
+    response = client.get(f'/api/sync/status?since={version}&wait=10')
+    assert response.get_json()['status'] == 'Completed'
+    assert time.monotonic() - started < 10
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# UPSTREAM SETTINGS
+# ============================================================================
+
+# Keep-alive connections kept per upstream host (Domino API, object store)
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', '16'))
+
+# Seconds a sync status is served from the cache before the API is asked again
+SYNC_STATUS_TTL_SECONDS = float(os.environ.get('SYNC_STATUS_TTL_SECONDS', '10'))
+# Longest wait of a long-poll for a sync status change
+SYNC_STATUS_MAX_WAIT_SECONDS = float(os.environ.get('SYNC_STATUS_MAX_WAIT_SECONDS', '25'))
+
+
+# ============================================================================
+# POOLED HTTP CLIENT
+# ============================================================================
+
+def create_http_session(pool_size=UPSTREAM_POOL_SIZE):
+    """
+    Create the HTTP session shared by all upstream calls.
+
+    Connections are kept alive and pooled per host, so repeated calls to the Domino API
+    and the object store skip the TCP and TLS handshakes. Cookies are never stored:
+    the session serves every user, each call carries its own authorization header.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+http = create_http_session()
+
+
+# ============================================================================
+# SYNC STATUS CACHE
+# ============================================================================
+
+def sync_status_key(base_url, token):
+    """Cache key of the sync status seen with a token (tokens are hashed, never stored)"""
+    return hashlib.sha256(f"{base_url}\n{token}".encode('utf-8')).hexdigest()
+
+
+def sync_status_version(status):
+    """Identify a sync status, so long-polls can tell when it changed"""
+    if not isinstance(status, dict):
+        return ''
+    return f"{status.get('status')}|{status.get('updatedAt')}"
+
+
+class SyncStatusCache:
+    """
+    Latest sync status per API host and token, cached for ttl_seconds.
+
+    Every open tab polls the status; within the TTL they are answered from the cache,
+    and when it expires one request fetches it while concurrent ones wait for that
+    fetch, so N tabs cost one upstream call per TTL. Failed fetches are not cached.
+    Long-polls wait for the status to change, refreshing it through the same cache.
+    """
+
+    def __init__(self, ttl_seconds=SYNC_STATUS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.entries = {}
+        self.in_flight = set()
+        self.condition = threading.Condition()
+        self.metrics = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def get(self, key, fetch):
+        """
+        Return the cached status of a key, fetching it if it expired.
+
+        Args:
+            key: Cache key (see sync_status_key())
+            fetch: Function returning (success, status, error_msg, status_code), as
+                safe_api_request() does
+
+        Returns:
+            tuple: (success, status, error_msg, status_code, cached)
+        """
+        with self.condition:
+            while True:
+                entry = self.entries.get(key)
+                if entry is not None and time.monotonic() < entry['expires']:
+                    self.metrics['hits'] += 1
+                    return True, entry['status'], None, 200, True
+                if key not in self.in_flight:
+                    break
+                # Another request is fetching the status, wait for its result
+                self.metrics['coalesced'] += 1
+                self.condition.wait()
+                entry = self.entries.get(key)
+                if entry is not None and time.monotonic() < entry['expires']:
+                    return True, entry['status'], None, 200, True
+                # The other fetch failed, fetch again (unless yet another request does)
+            self.in_flight.add(key)
+            self.metrics['misses'] += 1
+
+        success, status, error_msg, status_code = False, None, 'Sync status fetch failed', 500
+        try:
+            success, status, error_msg, status_code = fetch()
+        finally:
+            with self.condition:
+                self.in_flight.discard(key)
+                if success:
+                    self.entries[key] = {'status': status, 'expires': time.monotonic() + self.ttl_seconds}
+                self.condition.notify_all()
+        return success, status, error_msg, status_code, False
+
+    def wait_for_change(self, key, fetch, since, timeout):
+        """
+        Long-poll: return the status once its version differs from since, or the current
+        status after timeout seconds.
+
+        The status is re-read through the cache whenever it expires, so any number of
+        waiters adds no upstream calls.
+        """
+        deadline = time.monotonic() + min(timeout, SYNC_STATUS_MAX_WAIT_SECONDS)
+        while True:
+            result = self.get(key, fetch)
+            success, status = result[0], result[1]
+            if not success or sync_status_version(status) != since:
+                return result
+            with self.condition:
+                entry = self.entries.get(key)
+                expires = entry['expires'] if entry else time.monotonic()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return result
+                # Woken early when another request refreshes the status
+                self.condition.wait(max(0.0, min(expires - time.monotonic(), remaining)))
+
+    def invalidate(self, key):
+        """Forget a key's status (e.g. after starting a sync)"""
+        with self.condition:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        with self.condition:
+            return {**self.metrics, 'entries': len(self.entries), 'ttlSeconds': self.ttl_seconds}